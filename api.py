@@ -1,9 +1,18 @@
-import requests
 from dotenv import load_dotenv
+import json
 import os
 import warnings
 from urllib3.exceptions import InsecureRequestWarning
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from credentials import get_credential_provider
+from http_client import get_client
+from endpoint_selector import EndpointSelector
+from local_transport import LocalDeliveryError, LocalTransport
+from privacy_cache import store_privacy_state
+from rate_limiter import get_rate_limiter, INTERACTIVE, NORMAL
+from single_flight import SingleFlight
+from models import DeviceDetails, MethodResponse, Preset, loads, parse_method_responses, to_method_responses
 
 warnings.simplefilter('ignore', InsecureRequestWarning)
 
@@ -22,389 +31,588 @@ def resource_path(relative_path):
 dotenv_path = resource_path(".env")
 load_dotenv(dotenv_path)
 
-authorization=os.getenv("Authorization")
-x_term_id=os.getenv("X-Term-Id")
 
+# Base URLs can be overridden from .env, e.g. to point at mock_cloud.py
+APP_SERVER_URL = os.getenv("TAPO_APP_SERVER_URL", "https://aps1-app-server.iot.i.tplinkcloud.com")
+EDGE_SERVER_URL = os.getenv("TAPO_EDGE_SERVER_URL", "https://ain1-edge-server.iot.i.tplinkcloud.com")
 
-default_url = "https://aps1-app-server.iot.i.tplinkcloud.com/v1/things/{device_id}/services-sync"
-initial_information_url = "https://aps1-app-server.iot.i.tplinkcloud.com/v1/families/default/thing-order"
-EDGE_BASE_URL = "https://ain1-edge-server.iot.i.tplinkcloud.com/v1/things/{device_id}/services-sync"
+default_url = f"{APP_SERVER_URL}/v1/things/{{device_id}}/services-sync"
+initial_information_url = f"{APP_SERVER_URL}/v1/families/default/thing-order"
+EDGE_BASE_URL = f"{EDGE_SERVER_URL}/v1/things/{{device_id}}/services-sync"
 
 
-headers = {
-    "Authorization": authorization,
-    "App-Cid": f"app:TP-Link_Tapo_Android:{x_term_id}",
-    "X-App-Name": "TP-Link_Tapo_Android",
-    "X-App-Version": "3.15.117",
-    "X-Term-Id": f"{x_term_id}",
-    "X-Ospf": "Android 11",
-    "X-Net-Type": "wifi",
-    "X-Strict": "0",
-    "X-Locale": "en_US",
-    "User-Agent": "TP-Link_Tapo_Android/3.15.117",
-    "Content-Type": "application/json; charset=UTF-8"
-}
+# Extra services-sync hosts (comma separated) to consider for latency-aware routing
+EXTRA_SERVER_URLS = [url.strip() for url in os.getenv("TAPO_EXTRA_SERVER_URLS", "").split(",") if url.strip()]
+# Route passthrough calls to the fastest healthy host instead of always the app server (opt-in)
+LATENCY_ROUTING = os.getenv("TAPO_LATENCY_ROUTING", "0") == "1"
+
+endpoint_selector = EndpointSelector([APP_SERVER_URL, EDGE_SERVER_URL] + EXTRA_SERVER_URLS)
+
+
+# Optional direct LAN control (see local_transport.py)
+local_transport = LocalTransport()
+
+# Concurrent identical reads (same function, device and priority) share one request
+read_flights = SingleFlight()
+
+
+def start_endpoint_selection():
+    """Start measuring services-sync hosts in the background (no-op if routing is disabled)"""
+    if LATENCY_ROUTING:
+        endpoint_selector.start()
+
+
+def set_base_urls(app_server_url=None, edge_server_url=None):
+    """Point the API at different servers at runtime (e.g. a local mock)"""
+    global APP_SERVER_URL, EDGE_SERVER_URL, default_url, initial_information_url, EDGE_BASE_URL
+    if app_server_url:
+        APP_SERVER_URL = app_server_url.rstrip("/")
+        default_url = f"{APP_SERVER_URL}/v1/things/{{device_id}}/services-sync"
+        initial_information_url = f"{APP_SERVER_URL}/v1/families/default/thing-order"
+    if edge_server_url:
+        EDGE_SERVER_URL = edge_server_url.rstrip("/")
+        EDGE_BASE_URL = f"{EDGE_SERVER_URL}/v1/things/{{device_id}}/services-sync"
+    endpoint_selector.set_candidates([APP_SERVER_URL, EDGE_SERVER_URL] + EXTRA_SERVER_URLS)
+
 
 def get_headers():
-    """Get headers with current credentials (reloads from env)"""
-    load_dotenv(override=True)
-    authorization = os.getenv("Authorization")
-    x_term_id = os.getenv("X-Term-Id")
-    
-    if not authorization or not x_term_id:
-        return None
-    
-    return {
-        "Authorization": authorization,
-        "App-Cid": f"app:TP-Link_Tapo_Android:{x_term_id}",
-        "X-App-Name": "TP-Link_Tapo_Android",
-        "X-App-Version": "3.15.117",
-        "X-Term-Id": f"{x_term_id}",
-        "X-Ospf": "Android 11",
-        "X-Net-Type": "wifi",
-        "X-Strict": "0",
-        "X-Locale": "en_US",
-        "User-Agent": "TP-Link_Tapo_Android/3.15.117",
-        "Content-Type": "application/json; charset=UTF-8"
-    }
+    """Get headers with current credentials (cached, re-read only when .env changes)"""
+    return get_credential_provider().get_headers()
 
-def get_all_devices():
-    headers = get_headers()
-    if not headers:
-        print("Error: Authorization and X-Term-Id must be configured")
-        return False
-    
+
+def _reset_http_client(authorization, x_term_id):
+    # Pooled connections and cookies belong to the previous account
+    get_client().reset()
+
+
+get_credential_provider().add_listener(_reset_http_client)
+
+DEVICE_PAGE_SIZE = 20
+DEVICE_PAGE_MAX_IN_FLIGHT = 4
+
+
+class DeviceListError(Exception):
+    """Raised when the device list cannot be fetched at all"""
+
+
+def fetch_device_page(headers, page, page_size=DEVICE_PAGE_SIZE):
+    """Fetch one page of the thing-order list, returns the 'data' entries or None"""
     params = {
-        "page": 0,
-        "pageSize": 20
+        "page": page,
+        "pageSize": page_size
     }
 
-    response = requests.get(initial_information_url, headers=headers, params=params, timeout=10, verify=False)
-    
+    response = get_client().get(initial_information_url, headers=headers, params=params, idempotent=True,
+                                before_send=lambda: get_rate_limiter().acquire(priority=NORMAL))
+
     if response.status_code != 200:
         print(f"Error, Status Code: {response.status_code}, Content Body: {response.content}")
+        return None
+
+    data = loads(response.content)
+    if not isinstance(data, dict) or 'data' not in data:
+        print(f"Response structure: {data}")
+        return None
+
+    return data
+
+
+def page_device_ids(entries):
+    """Extract device IDs from the entries of one thing-order page"""
+    device_ids = []
+    for entry in entries:
+        if 'thingOrders' in entry:
+            for item in entry['thingOrders']:
+                device_ids.append(item.replace("Device-", ""))
+    return device_ids
+
+
+def iter_device_ids(page_size=DEVICE_PAGE_SIZE, max_in_flight=DEVICE_PAGE_MAX_IN_FLIGHT):
+    """
+    Yield every device ID on the account, page by page.
+
+    When the first page reports a total, the remaining pages are fetched
+    concurrently; otherwise pages are walked until a short page comes back.
+    Raises DeviceListError if the first page cannot be fetched.
+    """
+    headers = get_headers()
+    if not headers:
+        raise DeviceListError("Authorization and X-Term-Id must be configured")
+
+    first_page = fetch_device_page(headers, 0, page_size)
+    if first_page is None:
+        raise DeviceListError("Failed to fetch the first page of devices")
+
+    seen = set()
+
+    def new_ids(data):
+        ids = []
+        for device_id in page_device_ids(data['data']):
+            if device_id not in seen:
+                seen.add(device_id)
+                ids.append(device_id)
+        return ids
+
+    def is_full(data):
+        return len(page_device_ids(data['data'])) >= page_size
+
+    def fetch(page):
+        # One bad page must not throw away the IDs of the others
+        try:
+            return fetch_device_page(headers, page, page_size)
+        except Exception as e:
+            print(f"[!] Device page {page} failed: {e}")
+            return None
+
+    yield from new_ids(first_page)
+
+    total = first_page.get("total")
+    if isinstance(total, int):
+        # Total is known, so the rest of the pages can be fetched at once
+        page_count = -(-total // page_size)
+        if page_count > 1:
+            with ThreadPoolExecutor(max_workers=max(1, min(max_in_flight, page_count - 1))) as executor:
+                pages = executor.map(fetch, range(1, page_count))
+                for data in pages:
+                    if data is None:
+                        print("[!] A device page failed, device list may be incomplete")
+                        continue
+                    yield from new_ids(data)
+        return
+
+    data = first_page
+    page = 0
+    while is_full(data):
+        page += 1
+        data = fetch(page)
+        if data is None:
+            print(f"[!] Device page {page} failed, device list may be incomplete")
+            return
+        ids = new_ids(data)
+        # Guard against servers that ignore the page parameter
+        if not ids:
+            return
+        yield from ids
+
+
+def get_all_devices():
+    headers = get_headers()
+    if not headers:
+        print("Error: Authorization and X-Term-Id must be configured")
         return False
     
     try:
-        data = response.json()
-
-        # print("Raw output\n\n", data, "\n\n")
-        print(f"API Response data keys: {data.keys() if isinstance(data, dict) else 'Not a dict'}")
-        
-        if 'data' not in data:
-            print(f"Response structure: {data}")
-            return False
-        
-        all_devices = []
-        for entry in data['data']:
-            if 'thingOrders' in entry:
-                for item in entry['thingOrders']:
-                    device_id = item.replace("Device-", "")
-                    if device_id not in all_devices:
-                        all_devices.append(device_id)
-        
+        all_devices = list(iter_device_ids())
         print(f"Extracted {len(all_devices)} device IDs: {all_devices}")
         return all_devices
+    except DeviceListError as e:
+        print(f"Error: {e}")
+        return False
     except Exception as e:
         print(f"Error parsing response: {e}")
         import traceback
         traceback.print_exc()
         return False
         
-def get_device_details(device_id):
-    if not device_id:
-        print("Please provide a device id")
-        return False
-    
-    headers = get_headers()
-    if not headers:
-        print("Error: Authorization and X-Term-Id must be configured")
-        return False
-    
-    url = default_url.replace("{device_id}", device_id)
+# Passthrough request building / response parsing
+# Shared by the sync functions below and by api_async so both stay consistent
+
+LENS_MASK_REQUESTS = [
+    {
+        "method": "getLensMaskConfig",
+        "params": {
+            "lens_mask": {
+                "name": ["lens_mask_info"]
+            }
+        }
+    }
+]
+
+# Privacy state rides along with details and presets so it never costs a round trip of its own
+DEVICE_DETAILS_REQUESTS = [
+    {
+        "method": "getDeviceInfo",
+        "params": {
+            "device_info": {
+                "name": ["basic_info"]
+            }
+        }
+    },
+    {
+        "method": "getUpnpStatus",
+        "params": {
+            "upnpc": {
+                "table": ["upnp_status"]
+            }
+        }
+    },
+    {
+        "method": "getPubIP",
+        "params": {
+            "upnpc": {
+                "name": ["pub_ip"]
+            }
+        }
+    }
+] + LENS_MASK_REQUESTS
+
+PRESET_REQUESTS = [
+    {
+        "method": "getPresetConfig",
+        "params": {
+            "preset": {
+                "name": ["preset"]
+            }
+        }
+    }
+] + LENS_MASK_REQUESTS
+
+
+def preset_move_requests(preset_id):
+    return [
+        {
+            "method": "motorMoveToPreset",
+            "params": {
+                "preset": {
+                    "goto_preset": {
+                        "id": str(preset_id)
+                    }
+                }
+            }
+        }
+    ]
 
-    payload = {
+
+def motor_move_requests(axis, value):
+    if axis == "x":
+        return motor_move_xy_requests(value, 0)
+    return motor_move_xy_requests(0, value)
+
+
+def motor_move_xy_requests(x, y):
+    # motorMove accepts both axes in one call
+    move_params = {"x_coord": str(x), "y_coord": str(y)}
+
+    return [
+        {
+            "method": "motorMove",
+            "params": {
+                "motor": {"move": move_params}
+            }
+        }
+    ]
+
+
+def lens_mask_requests(enabled):
+    enabled_value = "on" if enabled else "off"
+    return [{
+        "method": "setLensMaskConfig",
+        "params": {
+            "lens_mask": {
+                "lens_mask_info": {
+                    "enabled": enabled_value
+                }
+            }
+        }
+    }]
+
+
+def build_passthrough_payload(requests):
+    """Wrap a list of method requests in the multipleRequest passthrough envelope"""
+    return {
         "inputParams": {
             "requestData": {
                 "method": "multipleRequest",
                 "params": {
-                    "requests": [
-                        {
-                            "method": "getDeviceInfo",
-                            "params": {
-                                "device_info": {
-                                    "name": ["basic_info"]
-                                }
-                            }
-                        },
-                        {
-                            "method": "getUpnpStatus",
-                            "params": {
-                                "upnpc": {
-                                    "table": ["upnp_status"]
-                                }
-                            }
-                        },
-                        {
-                            "method": "getPubIP",
-                            "params": {
-                                "upnpc": {
-                                    "name": ["pub_ip"]
-                                }
-                            }
-                        }
-                    ]
+                    "requests": requests
                 }
             }
         },
         "serviceId": "passthrough"
     }
 
-    response = requests.post(
-        url,
-        headers=headers,
-        json=payload,
-        timeout=10,
-        verify=False
-    )
 
-    if response.status_code != 200:
-        print(f"[!] Failed for {device_id}: {response.status_code}")
-        return None
+def passthrough_url(device_id):
+    if LATENCY_ROUTING:
+        base_url = endpoint_selector.best() or APP_SERVER_URL
+        return f"{base_url}/v1/things/{device_id}/services-sync"
+    return default_url.replace("{device_id}", device_id)
 
-    resp = response.json()
-    responses = resp["outputParams"]["responseData"]["result"]["responses"]
 
-    result = {
-        "name": None,
-        "device_name": None,
-        "longitude": None,
-        "latitude": None,
-        "private_ip": None,
-        "public_ip": None
-    }
+def report_passthrough_status(url, status_code):
+    """Stop routing to a host that answers but rejects our passthrough calls"""
+    if LATENCY_ROUTING and 400 <= status_code < 500 and status_code != 429:
+        endpoint_selector.report_rejected(url)
 
-    for r in responses:
-        method = r["method"]
 
-        if method == "getDeviceInfo":
-            info = r["result"]["device_info"]["basic_info"]
-            result["name"] = info.get("device_alias")
-            result["device_name"] = info.get("device_name")
-            result["longitude"] = info.get("longitude")
-            result["latitude"] = info.get("latitude")
+class LocalResponse:
+    """Stand-in for a passthrough call answered over the LAN"""
 
-        elif method == "getUpnpStatus":
-            upnp = r["result"]["upnpc"]["upnp_status"]
-            if upnp and "vhttpd" in upnp[0]:
-                result["private_ip"] = upnp[0]["vhttpd"].get("ipaddr")
+    def __init__(self, responses, status_code=200):
+        self.responses = responses
+        self.status_code = status_code
 
-        elif method == "getPubIP":
-            result["public_ip"] = r["result"]["upnpc"]["pub_ip"].get("ip")
+    @property
+    def text(self):
+        return json.dumps(self.responses)
 
-    return result
 
-def get_presets(device_id):
-    if not device_id:
-        print("Please provide a device id")
-        return None
-    
-    headers = get_headers()
-    if not headers:
-        print("Error: Authorization and X-Term-Id must be configured")
-        return None
+def register_device_ip(device_id, private_ip):
+    """Let the LAN transport know where a camera lives"""
+    local_transport.register_device(device_id, private_ip)
 
-    url = default_url.replace("{device_id}", device_id)
 
-    payload = {
-        "inputParams": {
-            "requestData": {
-                "method": "multipleRequest",
-                "params": {
-                    "requests": [
-                        {
-                            "method": "getPresetConfig",
-                            "params": {
-                                "preset": {
-                                    "name": ["preset"]
-                                }
-                            }
-                        }
-                    ]
-                }
-            }
-        },
-        "serviceId": "passthrough"
-    }
+def send_passthrough(device_id, requests, headers, local=True, priority=NORMAL, **kwargs):
+    """
+    Send method requests to a device: straight to the camera when it is
+    reachable on the LAN, otherwise through the cloud passthrough.
+    Cloud requests (and their retries) wait for the rate limiter; priority
+    decides who goes first. Extra keyword arguments go to the cloud request
+    (timeout, deadline, idempotent).
+    """
+    if local:
+        try:
+            responses = local_transport.call(device_id, requests)
+        except LocalDeliveryError as e:
+            # The camera may already have run it; only reads are safe to send again
+            if not all(request["method"].startswith("get") for request in requests):
+                print(f"[!] {e}, not resending through the cloud")
+                return LocalResponse([], status_code=504)
+            responses = None
+        if responses is not None:
+            return LocalResponse(responses)
+
+    url = passthrough_url(device_id)
+    payload = build_passthrough_payload(requests)
+    response = get_client().post(url, headers=headers, json=payload,
+                                 before_send=lambda: get_rate_limiter().acquire(device_id, priority), **kwargs)
+    report_passthrough_status(url, response.status_code)
+    return response
+
+
+def read_method_responses(response):
+    """Decode the per-method responses of a cloud or LAN passthrough response"""
+    if isinstance(response, LocalResponse):
+        return to_method_responses(response.responses)
+    return parse_method_responses(response.content)
+
+
+def demultiplex_responses(requests, responses):
+    """
+    Pair every request of a batch with its own method response.
 
-    response = requests.post(
-        url,
-        headers=headers,
-        json=payload,
-        timeout=10,
-        verify=False
-    )
+    Responses normally come back in request order, but they are matched by
+    method name so a short or reordered answer never hands one method
+    another's result. Requests without an answer get error code -1.
+    """
+    by_method = {}
+    for response in responses:
+        by_method.setdefault(response.method, []).append(response)
 
-    if response.status_code != 200:
-        print(f"[!] Failed for {device_id}: {response.status_code}")
-        return None
+    results = []
+    for request in requests:
+        matches = by_method.get(request["method"])
+        results.append(matches.pop(0) if matches else MethodResponse(request["method"], -1, {}))
+    return results
 
-    resp = response.json()
-    responses = resp["outputParams"]["responseData"]["result"]["responses"]
 
-    presets = {}
+def parse_device_details(responses, device_id=None):
+    """Build DeviceDetails from getDeviceInfo / getUpnpStatus / getPubIP / getLensMaskConfig method responses"""
+    details = DeviceDetails(device_id=device_id)
 
     for r in responses:
-        if r["method"] == "getPresetConfig":
-            preset_data = r["result"]["preset"]["preset"]
+        if not r.ok:
+            continue
+
+        if r.method == "getDeviceInfo":
+            info = r.result.get("device_info", {}).get("basic_info", {})
+            details.name = info.get("device_alias")
+            details.device_name = info.get("device_name")
+            details.longitude = info.get("longitude")
+            details.latitude = info.get("latitude")
+
+        elif r.method == "getUpnpStatus":
+            upnp = r.result.get("upnpc", {}).get("upnp_status")
+            if upnp and "vhttpd" in upnp[0]:
+                details.private_ip = upnp[0]["vhttpd"].get("ipaddr")
+
+        elif r.method == "getPubIP":
+            details.public_ip = r.result.get("upnpc", {}).get("pub_ip", {}).get("ip")
+
+    details.privacy_enabled = parse_lens_mask(responses)
+    return details
+
+
+def parse_lens_mask(responses):
+    """Return True/False for the getLensMaskConfig response, None if it is missing or failed"""
+    for r in responses:
+        if r.method == "getLensMaskConfig" and r.ok:
+            enabled = r.result.get("lens_mask", {}).get("lens_mask_info", {}).get("enabled")
+            if enabled in ("on", "off"):
+                return enabled == "on"
+    return None
+
+
+def parse_preset_list(responses):
+    """Return the camera's presets as Preset objects"""
+    for r in responses:
+        if r.method == "getPresetConfig" and r.ok:
+            preset_data = r.result.get("preset", {}).get("preset", {})
             ids = preset_data.get("id", [])
             names = preset_data.get("name", [])
+            return [Preset(preset_id, name) for preset_id, name in zip(ids, names)]
+    return []
 
-            presets = dict(zip(ids, names))
 
-    return presets
+def parse_presets(responses):
+    """Return the camera's presets as {preset_id: name}"""
+    return {preset.id: preset.name for preset in parse_preset_list(responses)}
 
-def move_to_preset(device_id, preset_id):
-    if not device_id or not preset_id:
-        print("device_id and preset_id are required")
+
+def check_preset_move(responses, preset_id):
+    """Return the motorMoveToPreset method response, or None if it failed"""
+    # Grab the motorMoveToPreset method response
+    if not responses:
+        print("[!] Unexpected response format: no method responses")
         return None
-    
-    headers = get_headers()
-    if not headers:
-        print("Error: Authorization and X-Term-Id must be configured")
+
+    method_resp = responses[0]
+    if not method_resp.ok:
+        print(f"[!] Preset {preset_id} is invalid or cannot be used. Error code: {method_resp.error_code}")
         return None
+    else:
+        print(f"[+] Preset {preset_id} applied successfully.")
+        return method_resp
 
-    url = default_url.replace("{device_id}", device_id)
 
-    payload = {
-        "inputParams": {
-            "requestData": {
-                "method": "multipleRequest",
-                "params": {
-                    "requests": [
-                        {
-                            "method": "motorMoveToPreset",
-                            "params": {
-                                "preset": {
-                                    "goto_preset": {
-                                        "id": str(preset_id)
-                                    }
-                                }
-                            }
-                        }
-                    ]
-                }
-            }
-        },
-        "serviceId": "passthrough"
-    }
+def check_motor_move(responses, description):
+    """Return the motorMove method response, or None if it failed"""
+    if not responses:
+        print("[!] Unexpected response format: no method responses")
+        return None
 
-    response = requests.post(
-        url,
-        headers=headers,
-        json=payload,
-        timeout=10,
-        verify=False
-    )
+    method_resp = responses[0]
+    error_code = method_resp.error_code
 
-    if response.status_code != 200:
-        print(f"[!] HTTP Error: {response.status_code}")
+    if error_code == 0:
+        print(f"[+] Camera moved {description}")
+        return method_resp
+    elif error_code == -64304:
+        print(f"[!] Motor move failed: Camera cannot move further in this direction (error {error_code})")
         return None
-
-    resp = response.json()
-    
-    # Grab the motorMoveToPreset method response
-    try:
-        method_resp = resp["outputParams"]["responseData"]["result"]["responses"][0]
-        error_code = method_resp.get("error_code", -1)
-        
-        if error_code != 0:
-            print(f"[!] Preset {preset_id} is invalid or cannot be used. Error code: {error_code}")
-            return None
-        else:
-            print(f"[+] Preset {preset_id} applied successfully.")
-            return method_resp
-    except Exception as e:
-        print(f"[!] Unexpected response format: {e}")
+    else:
+        print(f"[!] Motor move failed. Error code: {error_code}")
         return None
-    
-def move_camera(device_id, axis, value):
+
+
+def check_lens_mask(responses, enabled):
+    """Return True if setLensMaskConfig succeeded"""
+    error_code = responses[0].error_code if responses else -1
+    if error_code == 0:
+        print(f"[+] Privacy mode {'enabled' if enabled else 'disabled'} successfully.")
+        return True
+    else:
+        print(f"[!] Failed to toggle privacy mode. Error code: {error_code}")
+        return False
+
+
+def validate_motor_move(device_id, axis, value):
+    """Return an error message for invalid motor move arguments, None if they are valid"""
     if not device_id:
-        print("device_id is required")
-        return None
+        return "device_id is required"
 
     if axis not in ("x", "y"):
-        print("axis must be 'x' or 'y'")
-        return None
+        return "axis must be 'x' or 'y'"
 
     if not isinstance(value, int):
-        print("value must be an integer (e.g. 10 or -10)")
+        return "value must be an integer (e.g. 10 or -10)"
+
+    return None
+
+
+def call_methods(device_id, requests, local=True, priority=NORMAL, **kwargs):
+    """
+    Run several methods on a device in one passthrough round trip
+    :param requests: list - method requests, e.g. DEVICE_DETAILS_REQUESTS + PRESET_REQUESTS
+    :param local: bool - allow sending over the LAN when the camera is reachable there
+    :param priority: int - rate limiter priority (INTERACTIVE, NORMAL or BACKGROUND)
+    :param kwargs: passed to the cloud request (timeout, idempotent)
+    :return: list of MethodResponse, one per request in the same order (a failed
+             method carries its own error code), or None if the call itself failed
+    """
+    if not device_id:
+        print("Please provide a device id")
         return None
-    
+
     headers = get_headers()
     if not headers:
         print("Error: Authorization and X-Term-Id must be configured")
         return None
 
-    url = default_url.replace("{device_id}", device_id)
+    response = send_passthrough(device_id, requests, headers, local=local, priority=priority, **kwargs)
 
-    # Build motor move params
-    move_params = {"x_coord": "0", "y_coord": "0"}
-    if axis == "x":
-        move_params["x_coord"] = str(value)
-    else:
-        move_params["y_coord"] = str(value)
+    if response.status_code != 200:
+        print(f"[!] Failed for {device_id}: {response.status_code}")
+        return None
 
-    payload = {
-        "inputParams": {
-            "requestData": {
-                "method": "multipleRequest",
-                "params": {
-                    "requests": [
-                        {
-                            "method": "motorMove",
-                            "params": {
-                                "motor": {"move": move_params}
-                            }
-                        }
-                    ]
-                }
-            }
-        },
-        "serviceId": "passthrough"
-    }
+    return demultiplex_responses(requests, read_method_responses(response))
 
-    response = requests.post(
-        url,
-        headers=headers,
-        json=payload,
-        timeout=10,
-        verify=False
-    )
 
-    if response.status_code != 200:
-        print(f"[!] HTTP Error: {response.status_code}")
+def get_device_details(device_id, timeout=None, priority=NORMAL):
+    if not device_id:
+        print("Please provide a device id")
+        return False
+
+    # Only identical reads share a flight: a user's read must not wait on a background one's queue slot
+    return read_flights.do(("get_device_details", device_id, priority, timeout),
+                           _fetch_device_details, device_id, timeout, priority)
+
+def _fetch_device_details(device_id, timeout, priority):
+    # Always ask the cloud here, it is how we find out the camera's current IP.
+    # A caller's timeout covers the retries too, so a dead camera can't hold a worker for longer
+    responses = call_methods(device_id, DEVICE_DETAILS_REQUESTS, local=False, priority=priority,
+                             timeout=timeout or 10, deadline=timeout, idempotent=True)
+    if responses is None:
         return None
 
-    resp = response.json()
+    details = parse_device_details(responses, device_id)
+    register_device_ip(device_id, details.private_ip)
+    store_privacy_state(device_id, details.privacy_enabled)
+    return details
 
-    try:
-        method_resp = resp["outputParams"]["responseData"]["result"]["responses"][0]
-        error_code = method_resp.get("error_code", -1)
-
-        if error_code == 0:
-            print(f"[+] Camera moved on {axis}-axis by {value}")
-            return method_resp
-        elif error_code == -64304:
-            print(f"[!] Motor move failed: Camera cannot move further in this direction (error {error_code})")
-            return None
-        else:
-            print(f"[!] Motor move failed. Error code: {error_code}")
-            return None
+def get_presets(device_id, priority=NORMAL):
+    return read_flights.do(("get_presets", device_id, priority), _fetch_presets, device_id, priority)
 
-    except Exception as e:
-        print(f"[!] Unexpected response format: {e}")
+def _fetch_presets(device_id, priority):
+    responses = call_methods(device_id, PRESET_REQUESTS, priority=priority, idempotent=True)
+    if responses is None:
+        return None
+
+    store_privacy_state(device_id, parse_lens_mask(responses))
+    return parse_presets(responses)
+
+def move_to_preset(device_id, preset_id):
+    if not device_id or not preset_id:
+        print("device_id and preset_id are required")
         return None
+
+    responses = call_methods(device_id, preset_move_requests(preset_id), priority=INTERACTIVE)
+    if responses is None:
+        return None
+
+    return check_preset_move(responses, preset_id)
+    
+def move_camera(device_id, axis, value):
+    error = validate_motor_move(device_id, axis, value)
+    if error:
+        print(error)
+        return None
+
+    responses = call_methods(device_id, motor_move_requests(axis, value), priority=INTERACTIVE)
+    if responses is None:
+        return None
+
+    return check_motor_move(responses, f"on {axis}-axis by {value}")
     
 
 def toggle_privacy_mode(device_id, enabled=True):
@@ -412,59 +620,34 @@ def toggle_privacy_mode(device_id, enabled=True):
     Toggle privacy mode (lens mask) on/off for a Tapo camera
     :param device_id: str - device ID
     :param enabled: bool - True = privacy ON (lens covered), False = privacy OFF
-    :return: response or None
+    :return: True on success, False otherwise
     """
-    if not device_id:
-        print("device_id is required")
-        return None
-
-    headers = get_headers()
-    if not headers:
-        print("Error: Authorization and X-Term-Id must be configured")
-        return None
-
-    url = default_url.replace("{device_id}", device_id)
-    enabled_value = "on" if enabled else "off"
-
-    payload = {
-        "inputParams": {
-            "requestData": {
-                "method": "multipleRequest",
-                "params": {
-                    "requests": [{
-                        "method": "setLensMaskConfig",
-                        "params": {
-                            "lens_mask": {
-                                "lens_mask_info": {
-                                    "enabled": enabled_value
-                                }
-                            }
-                        }
-                    }]
-                }
-            }
-        },
-        "serviceId": "passthrough"
-    }
-
     try:
-        response = requests.post(url, headers=headers, json=payload, timeout=10, verify=False)
-        if response.status_code == 200:
-            resp = response.json()
-            error_code = resp.get("outputParams", {}) \
-                             .get("responseData", {}) \
-                             .get("result", {}) \
-                             .get("responses", [{}])[0] \
-                             .get("error_code", -1)
-            if error_code == 0:
-                print(f"[+] Privacy mode {'enabled' if enabled else 'disabled'} successfully.")
-                return True
-            else:
-                print(f"[!] Failed to toggle privacy mode. Error code: {error_code}")
-                return False
-        else:
-            print(f"[!] HTTP Error: {response.status_code} - {response.text}")
+        responses = call_methods(device_id, lens_mask_requests(enabled), priority=INTERACTIVE)
+        if responses is None:
             return False
+        success = check_lens_mask(responses, enabled)
+        if success:
+            store_privacy_state(device_id, enabled)
+        return success
     except Exception as e:
         print(f"[!] Exception during privacy toggle: {e}")
         return False
+
+
+def move_camera_xy(device_id, x, y):
+    """
+    Move the camera on both axes with a single motorMove call
+    :param x: int - pan steps (negative = left)
+    :param y: int - tilt steps (negative = down)
+    :return: method response or None
+    """
+    if not isinstance(x, int) or not isinstance(y, int):
+        print("x and y must be integers (e.g. 10 or -10)")
+        return None
+
+    responses = call_methods(device_id, motor_move_xy_requests(x, y), priority=INTERACTIVE)
+    if responses is None:
+        return None
+
+    return check_motor_move(responses, f"by x={x}, y={y}")
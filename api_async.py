@@ -0,0 +1,308 @@
+"""
+Asyncio variant of api.py.
+
+Same operations as the sync module, built on aiohttp so one event loop can
+drive hundreds of concurrent passthrough calls without a thread per request.
+Payload building and response parsing are shared with api.py.
+
+Usage (headless):
+
+    async with AsyncTapoClient() as client:
+        device_ids = await client.get_all_devices()
+        details = await client.get_many_device_details(device_ids)
+"""
+import asyncio
+import time
+import aiohttp
+import api
+from http_client import (
+    CircuitOpenError, DEFAULT_RETRIES, RETRY_AFTER_MAX, get_circuit_breaker,
+    is_host_failure, is_retryable_status, retry_after, retry_delay,
+)
+from models import loads, parse_method_responses
+from privacy_cache import store_privacy_state
+from rate_limiter import get_rate_limiter, INTERACTIVE, NORMAL
+from api import (
+    DEVICE_PAGE_SIZE, DEVICE_DETAILS_REQUESTS, PRESET_REQUESTS,
+    build_passthrough_payload, passthrough_url, report_passthrough_status, demultiplex_responses,
+    parse_device_details, parse_presets, parse_lens_mask, page_device_ids,
+    preset_move_requests, motor_move_requests, motor_move_xy_requests, lens_mask_requests,
+    check_preset_move, check_motor_move, check_lens_mask, validate_motor_move,
+)
+
+DEFAULT_TIMEOUT = 10
+DEFAULT_LIMIT = 100  # total open connections
+DEFAULT_LIMIT_PER_HOST = 20
+DEFAULT_MAX_IN_FLIGHT = 50
+
+
+class AsyncTapoClient:
+    def __init__(self, limit=DEFAULT_LIMIT, limit_per_host=DEFAULT_LIMIT_PER_HOST, timeout=DEFAULT_TIMEOUT):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.timeout = timeout
+        self._session = None
+        self._inflight = {}  # (operation, device_id) -> task of a read in flight
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def open(self):
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host, ssl=False)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _single_flight(self, key, make_coro):
+        """Await the read already running for key, or start it"""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(make_coro())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # One caller being cancelled must not cancel the read for the others
+        return await asyncio.shield(task)
+
+    async def _wait_for_rate_limit(self, device_id, priority):
+        """Sleep until the shared rate limiter lets this request through"""
+        limiter = get_rate_limiter()
+        start = time.monotonic()
+        wait = limiter.try_acquire(device_id, priority)
+        while wait > 0:
+            await asyncio.sleep(wait)
+            wait = limiter.try_acquire(device_id, priority, waited=time.monotonic() - start)
+
+    async def _request(self, method, url, device_id=None, idempotent=False, priority=NORMAL, **kwargs):
+        """
+        Send a request through the shared session, returns (status, body).
+        Idempotent requests are retried with backoff on connection errors,
+        timeouts, 429 and 5xx; the per-host circuit breaker is shared with
+        the sync client.
+
+        :raises CircuitOpenError: if the host's circuit is open
+        """
+        await self.open()
+        breaker = get_circuit_breaker(url)
+        attempts = 1 + (DEFAULT_RETRIES if idempotent else 0)
+
+        for attempt in range(attempts):
+            wait = None
+            # Retries go back through the limiter too, so a throttled burst is not resent at once
+            await self._wait_for_rate_limit(device_id, priority)
+            if not breaker.allow():
+                raise CircuitOpenError(f"Circuit open for {url}, not sending request")
+            try:
+                async with self._session.request(method, url, **kwargs) as response:
+                    body = await response.read()
+                    if not is_retryable_status(response.status):
+                        breaker.record_success()
+                        return response.status, body
+                    if is_host_failure(response.status):
+                        breaker.record_failure()
+                    else:
+                        breaker.record_success()
+                    wait = retry_after(response.headers)
+                    if attempt + 1 >= attempts or (wait is not None and wait > RETRY_AFTER_MAX):
+                        return response.status, body
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                breaker.record_failure()
+                if attempt + 1 >= attempts:
+                    raise
+            except Exception:
+                # E.g. a payload error
+                breaker.record_error()
+                raise
+            except BaseException:
+                # Cancellation (wait_for, shutdown) says nothing about the host
+                breaker.release_probe()
+                raise
+            await asyncio.sleep(max(retry_delay(attempt), wait or 0))
+
+    async def _passthrough(self, device_id, requests, idempotent=False, priority=NORMAL):
+        """POST a passthrough request, returns the MethodResponse list or None on HTTP errors"""
+        headers = api.get_headers()
+        if not headers:
+            print("Error: Authorization and X-Term-Id must be configured")
+            return None
+
+        url = passthrough_url(device_id)
+        status, body = await self._request("POST", url, device_id, idempotent=idempotent, priority=priority,
+                                           headers=headers, json=build_passthrough_payload(requests))
+        report_passthrough_status(url, status)
+        if status != 200:
+            print(f"[!] Failed for {device_id}: {status}")
+            return None
+        return parse_method_responses(body)
+
+    async def _fetch_device_page(self, headers, page, page_size):
+        """Fetch one page of the thing-order list, returns the page or None (never raises)"""
+        params = {"page": page, "pageSize": page_size}
+        try:
+            status, body = await self._request("GET", api.initial_information_url, idempotent=True,
+                                               headers=headers, params=params)
+            if status != 200:
+                print(f"Error, Status Code: {status}, Content Body: {body}")
+                return None
+            data = loads(body)
+        except Exception as e:
+            # One bad page must not throw away the IDs of the others
+            print(f"[!] Device page {page} failed: {e}")
+            return None
+        if not isinstance(data, dict) or 'data' not in data:
+            print(f"Response structure: {data}")
+            return None
+        return data
+
+    async def get_all_devices(self, page_size=DEVICE_PAGE_SIZE):
+        """Return every device ID on the account, or False on error"""
+        headers = api.get_headers()
+        if not headers:
+            print("Error: Authorization and X-Term-Id must be configured")
+            return False
+
+        await self.open()
+        first_page = await self._fetch_device_page(headers, 0, page_size)
+        if first_page is None:
+            return False
+
+        pages = [first_page]
+        total = first_page.get("total")
+        if isinstance(total, int):
+            page_count = -(-total // page_size)
+            pages += await asyncio.gather(*(
+                self._fetch_device_page(headers, page, page_size) for page in range(1, page_count)
+            ))
+        else:
+            seen = set(page_device_ids(first_page['data']))
+            data = first_page
+            page = 0
+            while data and len(page_device_ids(data['data'])) >= page_size:
+                page += 1
+                data = await self._fetch_device_page(headers, page, page_size)
+                pages.append(data)
+                if data:
+                    ids = set(page_device_ids(data['data']))
+                    # Guard against servers that ignore the page parameter
+                    if ids <= seen:
+                        break
+                    seen |= ids
+
+        # dict keeps first-seen order while deduping
+        all_devices = {}
+        for data in pages:
+            if data is None:
+                print("[!] A device page failed, device list may be incomplete")
+                continue
+            for device_id in page_device_ids(data['data']):
+                all_devices.setdefault(device_id, None)
+        return list(all_devices)
+
+    async def call_methods(self, device_id, requests, idempotent=False, priority=NORMAL):
+        """
+        Run several methods on a device in one passthrough round trip.
+
+        :return: list of MethodResponse, one per request in the same order,
+                 or None if the call itself failed
+        """
+        if not device_id:
+            print("Please provide a device id")
+            return None
+        responses = await self._passthrough(device_id, requests, idempotent=idempotent, priority=priority)
+        if responses is None:
+            return None
+        return demultiplex_responses(requests, responses)
+
+    async def get_device_details(self, device_id):
+        if not device_id:
+            print("Please provide a device id")
+            return False
+        return await self._single_flight(("get_device_details", device_id),
+                                         lambda: self._fetch_device_details(device_id))
+
+    async def _fetch_device_details(self, device_id):
+        responses = await self.call_methods(device_id, DEVICE_DETAILS_REQUESTS, idempotent=True)
+        if responses is None:
+            return None
+        details = parse_device_details(responses, device_id)
+        store_privacy_state(device_id, details.privacy_enabled)
+        return details
+
+    async def get_many_device_details(self, device_ids, max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+        """
+        Fetch details for many devices with bounded concurrency.
+
+        :return: list of DeviceDetails in the order of device_ids,
+                 devices that failed are left out
+        """
+        semaphore = asyncio.Semaphore(max_in_flight)
+
+        async def fetch(device_id):
+            async with semaphore:
+                try:
+                    details = await self.get_device_details(device_id)
+                except Exception as e:
+                    print(f"Error getting details for {device_id}: {e}")
+                    return None
+            return details
+
+        results = await asyncio.gather(*(fetch(device_id) for device_id in device_ids))
+        return [details for details in results if details]
+
+    async def get_presets(self, device_id):
+        return await self._single_flight(("get_presets", device_id), lambda: self._fetch_presets(device_id))
+
+    async def _fetch_presets(self, device_id):
+        responses = await self.call_methods(device_id, PRESET_REQUESTS, idempotent=True)
+        if responses is None:
+            return None
+        store_privacy_state(device_id, parse_lens_mask(responses))
+        return parse_presets(responses)
+
+    async def move_to_preset(self, device_id, preset_id):
+        if not device_id or not preset_id:
+            print("device_id and preset_id are required")
+            return None
+        responses = await self.call_methods(device_id, preset_move_requests(preset_id), priority=INTERACTIVE)
+        if responses is None:
+            return None
+        return check_preset_move(responses, preset_id)
+
+    async def move_camera(self, device_id, axis, value):
+        error = validate_motor_move(device_id, axis, value)
+        if error:
+            print(error)
+            return None
+        responses = await self.call_methods(device_id, motor_move_requests(axis, value), priority=INTERACTIVE)
+        if responses is None:
+            return None
+        return check_motor_move(responses, f"on {axis}-axis by {value}")
+
+    async def move_camera_xy(self, device_id, x, y):
+        responses = await self.call_methods(device_id, motor_move_xy_requests(x, y), priority=INTERACTIVE)
+        if responses is None:
+            return None
+        return check_motor_move(responses, f"by x={x}, y={y}")
+
+    async def toggle_privacy_mode(self, device_id, enabled=True):
+        try:
+            responses = await self.call_methods(device_id, lens_mask_requests(enabled), priority=INTERACTIVE)
+            if responses is None:
+                return False
+            success = check_lens_mask(responses, enabled)
+            if success:
+                store_privacy_state(device_id, enabled)
+            return success
+        except Exception as e:
+            print(f"[!] Exception during privacy toggle: {e}")
+            return False
@@ -0,0 +1,148 @@
+"""
+Latency / throughput benchmark for the functions in api.py.
+
+Runs against a local MockTapoCloud by default, so no TP-Link account is
+needed:
+
+    python benchmark.py --fleet-size 40 --latency 0.08 --requests 200 --concurrency 8
+
+Pass --url to benchmark against an already running server instead.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+import api
+import jwt_helper
+from api_async import AsyncTapoClient
+from credentials import get_credential_provider
+from device_fetcher import fetch_all_device_details
+from mock_cloud import MockTapoCloud
+from rate_limiter import configure_rate_limiter, get_rate_limiter
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_case(func, args_list, concurrency):
+    """Call func(*args) for every entry of args_list, returns (latencies, failures, wall time)"""
+    def timed(args):
+        start = time.perf_counter()
+        try:
+            ok = func(*args) not in (None, False)
+        except Exception:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    start = time.perf_counter()
+    # Keep the per-call log lines of api.py out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(timed, args_list))
+    wall_time = time.perf_counter() - start
+
+    latencies = sorted(latency for latency, _ in results)
+    failures = sum(1 for _, ok in results if not ok)
+    return latencies, failures, wall_time
+
+
+def report(name, latencies, failures, wall_time):
+    count = len(latencies)
+    print(f"{name:<28} {count:>6} {failures:>6} "
+          f"{percentile(latencies, 0.50) * 1000:>9.1f} {percentile(latencies, 0.95) * 1000:>9.1f} "
+          f"{percentile(latencies, 0.99) * 1000:>9.1f} {count / wall_time if wall_time else 0:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark api.py against a (mock) Tapo cloud")
+    parser.add_argument("--url", help="base URL of a running server (default: start a local mock)")
+    parser.add_argument("--fleet-size", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--requests", type=int, default=100, help="calls per API function")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--authorization", default="mock-token", help="used when .env has no credentials")
+    parser.add_argument("--term-id", default="mock-term-id", help="used when .env has no credentials")
+    parser.add_argument("--rate-limit", action="store_true",
+                        help="keep the client-side rate limiter on (default: off, to measure raw latency)")
+    args = parser.parse_args()
+
+    if not args.rate_limit:
+        configure_rate_limiter(global_rate=0, device_rate=0)
+
+    mock = None
+    base_url = args.url
+    if not base_url:
+        mock = MockTapoCloud(fleet_size=args.fleet_size, latency=args.latency, jitter=args.jitter,
+                             error_rate=args.error_rate).start()
+        base_url = mock.base_url
+
+    api.set_base_urls(base_url, base_url)
+    jwt_helper.set_security_server_url(base_url)
+
+    # The mock accepts any credentials, fall back to dummy ones when .env is empty
+    if not api.get_headers():
+        get_credential_provider().set_credentials(args.authorization, args.term_id)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        device_ids = api.get_all_devices()
+    if not device_ids:
+        print("Could not list devices, is the server running?")
+        return
+
+    n = args.requests
+    ids = [device_ids[i % len(device_ids)] for i in range(n)]
+    cases = [
+        ("get_all_devices", api.get_all_devices, [()] * max(1, n // 10)),
+        ("get_device_details", api.get_device_details, [(device_id,) for device_id in ids]),
+        ("get_presets", api.get_presets, [(device_id,) for device_id in ids]),
+        ("move_to_preset", api.move_to_preset, [(device_id, "1") for device_id in ids]),
+        ("move_camera", api.move_camera, [(device_id, "x", 10 if i % 2 else -10) for i, device_id in enumerate(ids)]),
+        ("toggle_privacy_mode", api.toggle_privacy_mode, [(device_id, i % 2 == 0) for i, device_id in enumerate(ids)]),
+    ]
+
+    print(f"Server: {base_url}  devices: {len(device_ids)}  concurrency: {args.concurrency}")
+    print(f"{'function':<28} {'calls':>6} {'fails':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>10}")
+
+    for name, func, args_list in cases:
+        report(name, *run_case(func, args_list, args.concurrency))
+
+    # Whole-fleet loads, as done on startup
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        loaded = fetch_all_device_details(device_ids)
+    elapsed = time.perf_counter() - start
+    print(f"\nfetch_all_device_details: {len(loaded)}/{len(device_ids)} devices in {elapsed * 1000:.0f} ms")
+
+    async def load_async():
+        async with AsyncTapoClient() as client:
+            return await client.get_many_device_details(device_ids)
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        loaded = asyncio.run(load_async())
+    elapsed = time.perf_counter() - start
+    print(f"AsyncTapoClient.get_many_device_details: {len(loaded)}/{len(device_ids)} devices in {elapsed * 1000:.0f} ms")
+
+    if args.rate_limit:
+        print("\nRate limiter:")
+        metrics = get_rate_limiter().metrics()
+        for name, values in metrics.items():
+            if isinstance(values, dict):
+                print(f"  {name:<12} acquired {values['acquired']:>5}  delayed {values['delayed']:>5}  "
+                      f"total delay {values['total_delay']:.2f}s  max delay {values['max_delay'] * 1000:.0f} ms")
+
+    if mock:
+        print(f"Server handled {mock.request_count} requests")
+        mock.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+import tkinter as tk
+import threading
+from bulk_ops import bulk_set_privacy, bulk_move_to_preset, bulk_refresh_details
+
+
+class BulkActionsDialog:
+    """Popup to run privacy / preset / refresh actions on several cameras at once"""
+
+    def __init__(self, root, main_app):
+        self.root = root
+        self.main_app = main_app
+        self.devices = list(main_app.devices_data)
+        self.running = False
+
+        self.bg_card = main_app.bg_card
+        self.bg_header = main_app.bg_header
+        self.text_primary = main_app.text_primary
+        self.text_secondary = main_app.text_secondary
+        self.accent = main_app.accent
+        self.success = main_app.success
+        self.error = main_app.error
+
+        self.create_dialog()
+
+    def create_dialog(self):
+        self.popup = tk.Toplevel(self.root)
+        self.popup.title("Bulk actions")
+        self.popup.geometry("460x560")
+        self.popup.configure(bg=self.bg_card)
+        self.popup.transient(self.root)
+
+        tk.Label(
+            self.popup,
+            text="Cameras",
+            font=("Segoe UI", 12, "bold"),
+            bg=self.bg_card,
+            fg=self.text_primary
+        ).pack(anchor="w", padx=15, pady=(15, 5))
+
+        # Camera list, every camera selected by default
+        list_frame = tk.Frame(self.popup, bg=self.bg_card)
+        list_frame.pack(fill=tk.BOTH, expand=True, padx=15)
+        scrollbar = tk.Scrollbar(list_frame, orient="vertical")
+        self.device_list = tk.Listbox(
+            list_frame,
+            selectmode=tk.MULTIPLE,
+            font=("Segoe UI", 10),
+            bg=self.bg_header,
+            fg=self.text_primary,
+            selectbackground=self.accent,
+            selectforeground="#000000",
+            highlightthickness=0,
+            relief=tk.FLAT,
+            yscrollcommand=scrollbar.set
+        )
+        scrollbar.config(command=self.device_list.yview)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.device_list.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        for device in self.devices:
+            self.device_list.insert(tk.END, self.device_label(device))
+        self.device_list.select_set(0, tk.END)
+
+        select_frame = tk.Frame(self.popup, bg=self.bg_card)
+        select_frame.pack(fill=tk.X, padx=15, pady=5)
+        for text, command in (("Select all", lambda: self.device_list.select_set(0, tk.END)),
+                              ("Select none", lambda: self.device_list.select_clear(0, tk.END))):
+            tk.Button(
+                select_frame,
+                text=text,
+                font=("Segoe UI", 9),
+                bg=self.bg_header,
+                fg=self.text_primary,
+                relief=tk.FLAT,
+                cursor="hand2",
+                command=command
+            ).pack(side=tk.LEFT, padx=(0, 5))
+
+        # Action choice
+        tk.Label(
+            self.popup,
+            text="Action",
+            font=("Segoe UI", 12, "bold"),
+            bg=self.bg_card,
+            fg=self.text_primary
+        ).pack(anchor="w", padx=15, pady=(10, 5))
+
+        self.action_var = tk.StringVar(value="privacy_on")
+        actions = [
+            ("privacy_on", "Privacy on"),
+            ("privacy_off", "Privacy off"),
+            ("preset", "Go to preset ID"),
+            ("refresh", "Refresh details"),
+        ]
+        for value, text in actions:
+            row = tk.Frame(self.popup, bg=self.bg_card)
+            row.pack(fill=tk.X, padx=15)
+            tk.Radiobutton(
+                row,
+                text=text,
+                variable=self.action_var,
+                value=value,
+                font=("Segoe UI", 10),
+                bg=self.bg_card,
+                fg=self.text_primary,
+                selectcolor=self.bg_header,
+                activebackground=self.bg_card,
+                activeforeground=self.accent
+            ).pack(side=tk.LEFT)
+            if value == "preset":
+                self.preset_entry = tk.Entry(row, width=6, font=("Segoe UI", 10))
+                self.preset_entry.insert(0, "1")
+                self.preset_entry.pack(side=tk.LEFT, padx=5)
+
+        self.run_button = tk.Button(
+            self.popup,
+            text="Run",
+            font=("Segoe UI", 11, "bold"),
+            bg=self.accent,
+            fg="#000000",
+            relief=tk.FLAT,
+            cursor="hand2",
+            command=self.run_action
+        )
+        self.run_button.pack(fill=tk.X, padx=15, pady=(10, 5))
+
+        self.summary_label = tk.Label(
+            self.popup,
+            text="",
+            font=("Segoe UI", 10),
+            bg=self.bg_card,
+            fg=self.text_secondary
+        )
+        self.summary_label.pack(anchor="w", padx=15, pady=(0, 15))
+
+    def device_label(self, device, status=None):
+        name = device.name or device.device_id
+        return f"{name}  —  {status}" if status else name
+
+    def run_action(self):
+        if self.running:
+            return
+
+        indexes = {self.devices[i].device_id: i for i in self.device_list.curselection()}
+        if not indexes:
+            self.summary_label.config(text="Select at least one camera", fg=self.error)
+            return
+
+        action = self.action_var.get()
+        if action == "preset":
+            preset_id = self.preset_entry.get().strip()
+            if not preset_id:
+                self.summary_label.config(text="Enter a preset ID", fg=self.error)
+                return
+
+        device_ids = list(indexes)
+        for device_id, index in indexes.items():
+            self.set_status(index, "running...")
+
+        self.running = True
+        self.run_button.config(state=tk.DISABLED)
+        self.summary_label.config(text=f"Running on {len(device_ids)} cameras...", fg=self.text_secondary)
+
+        def on_result(result):
+            status = f"ok ({result.elapsed * 1000:.0f} ms)" if result.ok else f"failed: {result.error}"
+            self.root.after(0, lambda: self.set_status(indexes[result.device_id], status))
+
+        def worker():
+            try:
+                if action == "privacy_on":
+                    report = bulk_set_privacy(device_ids, True, on_result=on_result)
+                elif action == "privacy_off":
+                    report = bulk_set_privacy(device_ids, False, on_result=on_result)
+                elif action == "preset":
+                    report = bulk_move_to_preset(device_ids, preset_id, on_result=on_result)
+                else:
+                    report = bulk_refresh_details(device_ids, on_result=on_result)
+            except Exception as e:
+                print(f"Error running bulk action: {e}")
+                report = None
+            self.root.after(0, lambda: self.on_finished(action, report))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def set_status(self, index, status):
+        if not self.popup.winfo_exists():
+            return
+        selected = self.device_list.selection_includes(index)
+        self.device_list.delete(index)
+        self.device_list.insert(index, self.device_label(self.devices[index], status))
+        if selected:
+            self.device_list.select_set(index)
+
+    def on_finished(self, action, report):
+        self.running = False
+        if report and action == "refresh":
+            # Show the refreshed details in the main window too
+            self.main_app.apply_device_details([r.result for r in report.succeeded])
+        if report and action in ("privacy_on", "privacy_off"):
+            # Keep the streaming camera's lock button in step, or its next click toggles the wrong way
+            selected = self.main_app.selected_device
+            player = self.main_app.video_player
+            if (selected and player and player.current_device is selected
+                    and any(r.device_id == selected.device_id for r in report.succeeded)):
+                player.show_privacy_state(selected)
+        if not self.popup.winfo_exists():
+            return
+        self.run_button.config(state=tk.NORMAL)
+        if report is None:
+            self.summary_label.config(text="Bulk action failed", fg=self.error)
+            return
+        print(report.summary())
+        self.summary_label.config(
+            text=report.summary(),
+            fg=self.success if not report.failed else self.error
+        )
@@ -0,0 +1,101 @@
+"""
+Run one action on many cameras at once.
+
+Every operation fans out over the given devices with at most max_in_flight
+calls running, using the same api.py functions as the single-camera UI, and
+returns a BulkReport with a per-device result and the total wall time.
+"""
+import os
+import time
+from dataclasses import dataclass, field
+from api import toggle_privacy_mode, move_to_preset, get_device_details
+from device_fetcher import run_bounded, DEVICE_TIMEOUT
+
+BULK_MAX_IN_FLIGHT = int(os.getenv("BULK_MAX_IN_FLIGHT", "8"))
+
+
+@dataclass(slots=True)
+class BulkResult:
+    device_id: str
+    ok: bool
+    result: object = None
+    error: str = None
+    elapsed: float = 0.0
+
+
+@dataclass(slots=True)
+class BulkReport:
+    action: str
+    results: list = field(default_factory=list)  # BulkResult in the order of the device IDs
+    elapsed: float = 0.0
+
+    @property
+    def succeeded(self):
+        return [r for r in self.results if r.ok]
+
+    @property
+    def failed(self):
+        return [r for r in self.results if not r.ok]
+
+    def summary(self):
+        return (f"{self.action}: {len(self.succeeded)}/{len(self.results)} succeeded "
+                f"in {self.elapsed:.1f}s")
+
+
+def run_bulk(action, func, device_ids, max_in_flight=BULK_MAX_IN_FLIGHT, on_result=None):
+    """
+    Call func(device_id) for every device with bounded concurrency.
+
+    A call counts as successful when it returns something other than None/False.
+
+    :param action: str - label used in the report
+    :param on_result: callable(BulkResult) - called as each device finishes (completion order)
+    :return: BulkReport
+    """
+    def run_one(device_id):
+        start = time.perf_counter()
+        try:
+            result = func(device_id)
+            error = None
+        except Exception as e:
+            result = None
+            error = str(e)
+        ok = result is not None and result is not False
+        if not ok and error is None:
+            error = "request failed"
+        return BulkResult(device_id, ok, result, error, time.perf_counter() - start)
+
+    def report_result(index, device_id, result):
+        if on_result:
+            on_result(result)
+
+    start = time.perf_counter()
+    results = run_bounded(run_one, device_ids, max_in_flight, report_result)
+    return BulkReport(action, results, time.perf_counter() - start)
+
+
+def bulk_set_privacy(device_ids, enabled, max_in_flight=BULK_MAX_IN_FLIGHT, on_result=None):
+    """Turn privacy mode on or off on every device"""
+    return run_bulk(
+        f"Privacy {'on' if enabled else 'off'}",
+        lambda device_id: toggle_privacy_mode(device_id, enabled),
+        device_ids, max_in_flight, on_result
+    )
+
+
+def bulk_move_to_preset(device_ids, preset_id, max_in_flight=BULK_MAX_IN_FLIGHT, on_result=None):
+    """Move every device to the preset with the given ID"""
+    return run_bulk(
+        f"Go to preset {preset_id}",
+        lambda device_id: move_to_preset(device_id, preset_id),
+        device_ids, max_in_flight, on_result
+    )
+
+
+def bulk_refresh_details(device_ids, max_in_flight=BULK_MAX_IN_FLIGHT, on_result=None):
+    """Fetch fresh details for every device, results carry DeviceDetails"""
+    return run_bulk(
+        "Refresh details",
+        lambda device_id: get_device_details(device_id, timeout=DEVICE_TIMEOUT),
+        device_ids, max_in_flight, on_result
+    )
@@ -0,0 +1,157 @@
+import os
+import sys
+import threading
+import time
+from dotenv import load_dotenv, set_key
+
+# How often the .env file is checked for changes, in seconds
+ENV_CHECK_INTERVAL = 1.0
+
+
+def resource_path(relative_path):
+    """Get absolute path to resource, works for dev and PyInstaller."""
+    try:
+        # PyInstaller creates a temp folder and stores path in _MEIPASS
+        base_path = sys._MEIPASS
+    except Exception:
+        base_path = os.path.abspath(".")
+
+    return os.path.join(base_path, relative_path)
+
+
+def build_headers(authorization, x_term_id):
+    """Build the request headers the Tapo Android app sends"""
+    return {
+        "Authorization": authorization,
+        "App-Cid": f"app:TP-Link_Tapo_Android:{x_term_id}",
+        "X-App-Name": "TP-Link_Tapo_Android",
+        "X-App-Version": "3.15.117",
+        "X-Term-Id": f"{x_term_id}",
+        "X-Ospf": "Android 11",
+        "X-Net-Type": "wifi",
+        "X-Strict": "0",
+        "X-Locale": "en_US",
+        "User-Agent": "TP-Link_Tapo_Android/3.15.117",
+        "Content-Type": "application/json; charset=UTF-8"
+    }
+
+
+class CredentialProvider:
+    """
+    The account credentials (Authorization / X-Term-Id) and the headers built from them.
+
+    Values are read from .env once and kept in memory; the file is only
+    re-read when its mtime or size changes (checked at most every
+    ENV_CHECK_INTERVAL seconds). Listeners are called whenever the
+    credentials actually change, so clients holding state tied to the old
+    account (connections, tokens) can reset together.
+    """
+
+    def __init__(self, env_path):
+        self.env_path = env_path
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._stamp = None  # (mtime_ns, size) of .env when last read
+        self._checked_at = 0.0
+        self._loaded = False
+        self._authorization = None
+        self._x_term_id = None
+        self._headers = None
+
+    def _env_stamp(self):
+        try:
+            stat = os.stat(self.env_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _refresh(self):
+        """Re-read .env if it changed, returns True if the credentials changed"""
+        now = time.monotonic()
+        with self._lock:
+            if self._loaded and now - self._checked_at < ENV_CHECK_INTERVAL:
+                return False
+            self._checked_at = now
+            stamp = self._env_stamp()
+            if self._loaded and stamp == self._stamp:
+                return False
+            self._stamp = stamp
+            first_load = not self._loaded
+            self._loaded = True
+
+            load_dotenv(self.env_path, override=True)
+            changed = self._set(os.getenv("Authorization"), os.getenv("X-Term-Id"))
+        return changed and not first_load
+
+    def _set(self, authorization, x_term_id):
+        """Store new values (call with _lock held), returns True if they differ"""
+        if (authorization, x_term_id) == (self._authorization, self._x_term_id):
+            return False
+        self._authorization = authorization
+        self._x_term_id = x_term_id
+        self._headers = build_headers(authorization, x_term_id) if authorization and x_term_id else None
+        return True
+
+    def _notify(self):
+        for listener in list(self._listeners):
+            try:
+                listener(self._authorization, self._x_term_id)
+            except Exception as e:
+                print(f"Error in credentials listener: {e}")
+
+    def get_credentials(self):
+        """Return (authorization, x_term_id), either may be None"""
+        if self._refresh():
+            self._notify()
+        return self._authorization, self._x_term_id
+
+    def get_headers(self):
+        """Return the request headers, or None if the credentials are not configured"""
+        if self._refresh():
+            self._notify()
+        headers = self._headers
+        return dict(headers) if headers else None
+
+    def set_credentials(self, authorization, x_term_id):
+        """Use these credentials in memory only, until .env changes (e.g. for benchmarks)"""
+        with self._lock:
+            self._loaded = True
+            self._stamp = self._env_stamp()
+            changed = self._set(authorization, x_term_id)
+        if changed:
+            self._notify()
+
+    def save_credentials(self, authorization, x_term_id):
+        """Write the credentials to .env and switch to them straight away"""
+        with self._lock:
+            if not os.path.exists(self.env_path):
+                with open(self.env_path, "w") as f:
+                    f.write("")
+            set_key(self.env_path, "Authorization", authorization)
+            set_key(self.env_path, "X-Term-Id", x_term_id)
+            os.environ["Authorization"] = authorization
+            os.environ["X-Term-Id"] = x_term_id
+            self._loaded = True
+            self._stamp = self._env_stamp()
+            self._checked_at = time.monotonic()
+            changed = self._set(authorization, x_term_id)
+        if changed:
+            self._notify()
+
+    def add_listener(self, listener):
+        """Call listener(authorization, x_term_id) whenever the credentials change"""
+        self._listeners.append(listener)
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_credential_provider():
+    """Return the process-wide CredentialProvider for the app's .env file"""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                _provider = CredentialProvider(resource_path(".env"))
+    return _provider
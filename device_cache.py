@@ -0,0 +1,50 @@
+import os
+import time
+from models import DeviceDetails
+from state_db import get_state_db
+
+# Entries younger than this are trusted without asking the cloud again
+DEVICE_CACHE_TTL = int(os.getenv("DEVICE_CACHE_TTL", "300"))
+# Entries older than this are too stale to even paint while revalidating
+DEVICE_CACHE_MAX_AGE = int(os.getenv("DEVICE_CACHE_MAX_AGE", str(7 * 24 * 3600)))
+
+
+def get_cached_devices(max_age=DEVICE_CACHE_MAX_AGE):
+    """Return cached DeviceDetails in account order, skipping entries older than max_age"""
+    now = time.time()
+
+    cached = []
+    for device_id, stored, fetched_at in get_state_db().get_devices():
+        if now - fetched_at > max_age:
+            continue
+        details = DeviceDetails.from_dict(stored)
+        details.device_id = device_id
+        cached.append(details)
+    return cached
+
+
+def get_fresh_device_ids(ttl=DEVICE_CACHE_TTL):
+    """Return the set of device IDs whose cached details are younger than ttl"""
+    now = time.time()
+    return {
+        device_id for device_id, _, fetched_at in get_state_db().get_devices()
+        if now - fetched_at <= ttl
+    }
+
+
+def update_device_cache(device_ids, fetched_devices):
+    """
+    Store freshly fetched details and drop devices that left the account.
+
+    :param device_ids: list - every device ID on the account, in order
+    :param fetched_devices: list - DeviceDetails fetched just now
+    """
+    details_by_id = {}
+    for details in fetched_devices:
+        device_id = details.device_id
+        if device_id:
+            entry = details.to_dict()
+            del entry['device_id']
+            details_by_id[device_id] = entry
+
+    get_state_db().update_devices(device_ids, details_by_id, time.time())
@@ -0,0 +1,54 @@
+import os
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from api import get_device_details
+
+# Tunable from .env
+MAX_IN_FLIGHT = int(os.getenv("FETCH_MAX_IN_FLIGHT", "8"))
+DEVICE_TIMEOUT = float(os.getenv("FETCH_DEVICE_TIMEOUT", "10"))
+
+
+def run_bounded(func, items, max_in_flight=MAX_IN_FLIGHT, on_result=None):
+    """
+    Run func(item) for every item with at most max_in_flight calls running at once.
+
+    :param func: callable - called once per item from a worker thread
+    :param items: list - inputs, results are returned in the same order
+    :param max_in_flight: int - maximum number of concurrent calls
+    :param on_result: callable(index, item, result) - called as each call finishes (completion order)
+    :return: list of results in input order (None where the call raised)
+    """
+    items = list(items)
+    results = [None] * len(items)
+    if not items:
+        return results
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_in_flight, len(items)))) as executor:
+        futures = {executor.submit(func, item): index for index, item in enumerate(items)}
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                results[index] = future.result()
+            except Exception as e:
+                # One failing item must not take the rest down with it
+                print(f"Error processing {items[index]}: {e}")
+                traceback.print_exc()
+            if on_result:
+                on_result(index, items[index], results[index])
+
+    return results
+
+
+def fetch_all_device_details(device_ids, max_in_flight=MAX_IN_FLIGHT, timeout=DEVICE_TIMEOUT, on_result=None):
+    """
+    Fetch details for all devices in parallel.
+
+    :param timeout: float - seconds allowed per device, retries included
+    :return: list of DeviceDetails in the order of device_ids,
+             devices whose details could not be fetched are left out
+    """
+    def fetch(device_id):
+        return get_device_details(device_id, timeout=timeout) or None
+
+    results = run_bounded(fetch, device_ids, max_in_flight, on_result)
+    return [details for details in results if details]
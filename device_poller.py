@@ -0,0 +1,188 @@
+import heapq
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from api import get_device_details
+from rate_limiter import BACKGROUND
+
+# Seconds between refreshes of a device's details, tunable from .env
+SELECTED_INTERVAL = float(os.getenv("POLL_SELECTED_INTERVAL", "15"))
+IDLE_INTERVAL = float(os.getenv("POLL_IDLE_INTERVAL", "120"))
+OFFLINE_INTERVAL = float(os.getenv("POLL_OFFLINE_INTERVAL", "300"))
+# Failed polls back off exponentially up to this
+MAX_BACKOFF = float(os.getenv("POLL_MAX_BACKOFF", "900"))
+# Consecutive failures before a device is reported offline
+OFFLINE_AFTER = int(os.getenv("POLL_OFFLINE_AFTER", "2"))
+# Hard cap on poll requests, whatever the fleet size
+BUDGET_PER_MINUTE = float(os.getenv("POLL_BUDGET_PER_MINUTE", "20"))
+POLL_TIMEOUT = 10
+
+
+@dataclass(slots=True)
+class _DeviceState:
+    snapshot: dict = None  # fields of the last DeviceDetails seen
+    failures: int = 0
+    online: bool = True
+    due: float = 0.0
+
+
+class DevicePoller:
+    """
+    Keeps device details fresh in the background.
+
+    One thread polls one device at a time, always the one that is due
+    soonest: the selected camera every SELECTED_INTERVAL seconds, others
+    every IDLE_INTERVAL, offline ones every OFFLINE_INTERVAL, with
+    exponential backoff on failures. Polls are spaced so no more than
+    BUDGET_PER_MINUTE requests are sent per minute. Only changes are
+    reported: on_change gets the fields that differ from the last snapshot.
+    """
+
+    def __init__(self, on_change=None, on_status=None, fetch=None, budget_per_minute=BUDGET_PER_MINUTE):
+        """
+        :param on_change: callable(device_id, details, changed) - changed is {field: new value}
+        :param on_status: callable(device_id, online) - called when a device goes offline / comes back
+        :param fetch: callable(device_id) -> DeviceDetails or None, defaults to get_device_details
+        :param budget_per_minute: float - maximum polls per minute
+        """
+        self.on_change = on_change
+        self.on_status = on_status
+        self.fetch = fetch or (lambda device_id: get_device_details(device_id, timeout=POLL_TIMEOUT, priority=BACKGROUND))
+        self.min_spacing = 60.0 / budget_per_minute if budget_per_minute > 0 else 0.0
+        self.selected_id = None
+        self._states = {}  # device_id -> _DeviceState
+        self._queue = []  # heap of (due, device_id), stale entries are skipped
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_poll = 0.0
+
+    def interval_for(self, device_id, state):
+        if not state.online:
+            base = OFFLINE_INTERVAL
+        elif device_id == self.selected_id:
+            base = SELECTED_INTERVAL
+        else:
+            base = IDLE_INTERVAL
+        if state.failures:
+            base = min(MAX_BACKOFF, base * (2 ** state.failures))
+        # Spread devices out so they don't all come due together
+        return base * random.uniform(0.9, 1.1)
+
+    def _schedule(self, device_id, due):
+        state = self._states[device_id]
+        state.due = due
+        heapq.heappush(self._queue, (due, device_id))
+        self._wakeup.set()
+
+    def set_devices(self, devices):
+        """
+        Poll exactly these devices from now on.
+
+        :param devices: list of DeviceDetails - their current details become the baseline snapshot
+        """
+        now = time.monotonic()
+        with self._lock:
+            wanted = {device.device_id: device for device in devices if device.device_id}
+            for device_id in list(self._states):
+                if device_id not in wanted:
+                    del self._states[device_id]
+            for device_id, details in wanted.items():
+                state = self._states.get(device_id)
+                if state is None:
+                    self._states[device_id] = _DeviceState(details.to_dict())
+                    self._schedule(device_id, now + self.interval_for(device_id, self._states[device_id]))
+                else:
+                    state.snapshot = details.to_dict()
+
+    def set_selected(self, device_id):
+        """Poll this device more often (None to stop favouring any device)"""
+        with self._lock:
+            self.selected_id = device_id
+            state = self._states.get(device_id)
+            if state is not None:
+                due = time.monotonic() + self.interval_for(device_id, state)
+                if due < state.due:
+                    self._schedule(device_id, due)
+
+    def _next_due(self):
+        """Peek at the device due soonest, returns (due, device_id) or None"""
+        while self._queue:
+            due, device_id = self._queue[0]
+            state = self._states.get(device_id)
+            if state is None or state.due != due:
+                heapq.heappop(self._queue)  # removed or rescheduled since
+                continue
+            return due, device_id
+        return None
+
+    def poll(self, device_id):
+        """Refresh one device now and report what changed"""
+        try:
+            details = self.fetch(device_id)
+        except Exception as e:
+            print(f"Error polling {device_id}: {e}")
+            details = None
+
+        with self._lock:
+            state = self._states.get(device_id)
+            if state is None:
+                return
+            went_offline = came_online = False
+            changed = {}
+            if details:
+                came_online = not state.online
+                state.online = True
+                state.failures = 0
+                snapshot = details.to_dict()
+                if state.snapshot is not None:
+                    changed = {
+                        key: value for key, value in snapshot.items()
+                        if key != "device_id" and state.snapshot.get(key) != value
+                    }
+                state.snapshot = snapshot
+            else:
+                state.failures += 1
+                if state.online and state.failures >= OFFLINE_AFTER:
+                    state.online = False
+                    went_offline = True
+            self._schedule(device_id, time.monotonic() + self.interval_for(device_id, state))
+
+        if (went_offline or came_online) and self.on_status:
+            self.on_status(device_id, came_online)
+        if changed and self.on_change:
+            self.on_change(device_id, details, changed)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+
+        def run():
+            while not self._stop.is_set():
+                with self._lock:
+                    entry = self._next_due()
+                    self._wakeup.clear()
+                if entry is None:
+                    self._wakeup.wait()
+                    continue
+
+                due, device_id = entry
+                wait = max(due, self._last_poll + self.min_spacing) - time.monotonic()
+                if wait > 0:
+                    # Woken early when the schedule changes (e.g. a new camera is selected)
+                    self._wakeup.wait(wait)
+                    continue
+
+                self._last_poll = time.monotonic()
+                self.poll(device_id)
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
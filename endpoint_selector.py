@@ -0,0 +1,141 @@
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http_client import CircuitBreaker, get_client, get_circuit_breaker
+
+# How often to re-measure every endpoint, in seconds
+REEVALUATE_INTERVAL = float(os.getenv("ENDPOINT_REEVALUATE_INTERVAL", "300"))
+PROBES_PER_ENDPOINT = 3
+PROBE_TIMEOUT = 3
+# Only switch when the new endpoint is clearly faster, so we don't flap between similar ones
+SWITCH_MARGIN = 0.8
+# A host that rejects our passthrough calls (4xx) is avoided for this long
+REJECTED_FOR = float(os.getenv("ENDPOINT_REJECTED_FOR", "1800"))
+
+
+class EndpointSelector:
+    """
+    Picks the fastest healthy services-sync host.
+
+    Round-trip time to each candidate base URL is measured with a few
+    lightweight requests over the shared keep-alive client; any answer below
+    500 counts as reachable. Reachable is not the same as usable, so callers
+    report hosts that reject real passthrough calls (report_rejected) and
+    those are avoided for REJECTED_FOR seconds. Hosts whose circuit breaker
+    is not closed are skipped.
+    """
+
+    def __init__(self, candidates, interval=REEVALUATE_INTERVAL):
+        """
+        :param candidates: list - base URLs, the first one is the default
+        :param interval: float - seconds between background re-evaluations
+        """
+        self.interval = interval
+        self.latencies = {}  # base URL -> median RTT in seconds, None if unreachable
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self.set_candidates(candidates)
+
+    def set_candidates(self, candidates):
+        with self._lock:
+            self.candidates = list(dict.fromkeys(url.rstrip("/") for url in candidates if url))
+            self.current = self.candidates[0] if self.candidates else None
+            self.latencies = {}
+            self._rejected_until = {}  # base URL -> monotonic time
+
+    def measure_endpoint(self, base_url):
+        """Median RTT of a few probe requests, None if the endpoint did not answer"""
+        samples = []
+        for _ in range(PROBES_PER_ENDPOINT):
+            start = time.perf_counter()
+            try:
+                response = get_client().request("HEAD", base_url, timeout=PROBE_TIMEOUT, allow_redirects=False)
+            except Exception:
+                return None
+            if response.status_code >= 500:
+                return None
+            samples.append(time.perf_counter() - start)
+        return statistics.median(samples)
+
+    def evaluate(self):
+        """Measure every candidate concurrently and switch to the fastest healthy one"""
+        with self._lock:
+            candidates = list(self.candidates)
+        if not candidates:
+            return None
+
+        with ThreadPoolExecutor(max_workers=len(candidates)) as executor:
+            latencies = dict(zip(candidates, executor.map(self.measure_endpoint, candidates)))
+
+        with self._lock:
+            if candidates != self.candidates:
+                return self.current  # candidates changed while measuring
+            self.latencies = latencies
+            reachable = {url: rtt for url, rtt in latencies.items() if rtt is not None and not self._is_rejected(url)}
+            if reachable:
+                fastest = min(reachable, key=reachable.get)
+                current_rtt = reachable.get(self.current)
+                if current_rtt is None or reachable[fastest] < current_rtt * SWITCH_MARGIN:
+                    if fastest != self.current:
+                        print(f"Routing passthrough calls to {fastest} ({reachable[fastest] * 1000:.0f} ms)")
+                    self.current = fastest
+            return self.current
+
+    def _is_rejected(self, base_url):
+        """Call with _lock held"""
+        return time.monotonic() < self._rejected_until.get(base_url, 0)
+
+    def report_rejected(self, url):
+        """
+        A passthrough call to url got a client error (e.g. 401/403/404) from its host.
+
+        The host answers but will not serve this account, so stop routing to it.
+        """
+        with self._lock:
+            base_url = next((c for c in self.candidates if url.startswith(c)), None)
+            if base_url is None or self._is_rejected(base_url):
+                return
+            self._rejected_until[base_url] = time.monotonic() + REJECTED_FOR
+            if base_url == self.current:
+                self.current = self.candidates[0]
+        print(f"[!] {base_url} rejected a passthrough call, not routing to it for {REJECTED_FOR:.0f}s")
+
+    def best(self):
+        """Base URL to use right now: the chosen endpoint unless it is rejected or its circuit is not closed"""
+        with self._lock:
+            current = self.current
+            ranked = sorted(
+                (url for url in self.candidates if url != current),
+                key=lambda url: self.latencies.get(url) if self.latencies.get(url) is not None else float("inf")
+            )
+            usable = [url for url in [current] + ranked if url and not self._is_rejected(url)]
+            default = self.candidates[0] if self.candidates else current
+
+        # A half-open host only takes its single probe, anything else routed there fails fast
+        for url in usable:
+            if get_circuit_breaker(url).state == CircuitBreaker.CLOSED:
+                return url
+        return default
+
+    def start(self):
+        """Evaluate now and then every interval seconds in a background thread"""
+        if self._thread and self._thread.is_alive():
+            return
+
+        def run():
+            while not self._stop.is_set():
+                try:
+                    self.evaluate()
+                except Exception as e:
+                    print(f"Error evaluating endpoints: {e}")
+                self._stop.wait(self.interval)
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
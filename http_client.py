@@ -0,0 +1,287 @@
+import os
+import random
+from email.utils import parsedate_to_datetime
+import threading
+import time
+import warnings
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import InsecureRequestWarning
+
+warnings.simplefilter('ignore', InsecureRequestWarning)
+
+# Pool settings can be tuned from .env without touching code
+DEFAULT_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "4"))  # number of hosts kept pooled
+DEFAULT_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "10"))  # keep-alive connections per host
+DEFAULT_TIMEOUT = 10
+# Unreachable hosts fail on connect well before the read timeout
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05"))
+
+# Retries for idempotent reads (jittered exponential backoff)
+DEFAULT_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.3"))
+BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "3"))
+# Longest Retry-After we wait out; a server asking for more gets its response handed back
+RETRY_AFTER_MAX = float(os.getenv("HTTP_RETRY_AFTER_MAX", "10"))
+
+# Per-host circuit breaker
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of sending a request while the host's circuit is open"""
+
+
+class CircuitBreaker:
+    """
+    Fails fast while a host keeps failing.
+
+    closed -> open after failure_threshold consecutive failures; after
+    reset_timeout one probe request is let through (half-open) and its
+    outcome closes or re-opens the circuit.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Return True if a request may be sent now"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                # Let exactly one probe through
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    print(f"[!] Circuit opened after {self.failures} failures")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def record_error(self):
+        """A non-network error says nothing about the host, but still settles a half-open probe"""
+        if self.state == self.HALF_OPEN:
+            self.record_failure()
+
+    def release_probe(self):
+        """The half-open probe was abandoned (cancelled); let the next request probe instead"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(url):
+    """Return the circuit breaker shared by every request to url's host"""
+    host = urlparse(url).netloc
+    with _breakers_lock:
+        breaker = _breakers.get(host)
+        if breaker is None:
+            breaker = CircuitBreaker()
+            _breakers[host] = breaker
+        return breaker
+
+
+def retry_delay(attempt):
+    """Full-jitter exponential backoff delay before retry number attempt (0-based)"""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+def is_retryable_status(status_code):
+    return status_code == 429 or status_code >= 500
+
+
+def is_host_failure(status_code):
+    """Statuses that count against the host's circuit breaker (429 means busy, not down)"""
+    return status_code >= 500
+
+
+def retry_after(headers):
+    """Seconds a Retry-After header asks us to wait, None if there is none"""
+    value = headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _past(expires, delay):
+    """True if a retry after delay seconds would start after the deadline"""
+    return expires is not None and time.monotonic() + delay >= expires
+
+
+class HttpClient:
+    """
+    Shared keep-alive HTTP client for all cloud calls.
+
+    Wraps a single requests.Session so DNS lookups, TCP connects and TLS
+    handshakes are reused between requests. The underlying urllib3 pools are
+    thread-safe, so one instance can be used from any worker thread.
+    """
+
+    def __init__(self, pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                 host_limits=None, timeout=DEFAULT_TIMEOUT):
+        """
+        :param pool_connections: int - number of per-host pools to keep
+        :param pool_maxsize: int - keep-alive connections kept per host
+        :param host_limits: dict - {"https://host": max_connections} hard caps for specific hosts
+        :param timeout: int - default timeout in seconds for every request
+        """
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._session = None
+        self.configure(pool_connections, pool_maxsize, host_limits)
+
+    def configure(self, pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                  host_limits=None):
+        """Rebuild the session with new pool settings (closes old connections)"""
+        self._pool_settings = (pool_connections, pool_maxsize, host_limits)
+        session = requests.Session()
+        session.verify = False
+
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+
+        # Per-host caps block callers until a connection frees up instead of opening more
+        for prefix, limit in (host_limits or {}).items():
+            session.mount(prefix, HTTPAdapter(pool_connections=1, pool_maxsize=limit, pool_block=True))
+
+        with self._lock:
+            old_session = self._session
+            self._session = session
+
+        if old_session:
+            old_session.close()
+
+    def reset(self):
+        """Drop pooled connections and cookies, keeping the pool settings"""
+        self.configure(*self._pool_settings)
+
+    def request(self, method, url, idempotent=False, retries=DEFAULT_RETRIES, before_send=None, deadline=None,
+                **kwargs):
+        """
+        Send a request through the shared session.
+
+        :param idempotent: bool - safe to resend, enables retries on timeouts,
+                           connection errors, 429 and 5xx responses
+        :param retries: int - extra attempts for idempotent requests
+        :param before_send: callable - run before every attempt, e.g. to wait for the rate limiter
+        :param deadline: float - seconds for all attempts together; each attempt's
+                         timeout is cut to what is left and no retry starts after it
+        :raises CircuitOpenError: if the host's circuit is open
+        """
+        timeout = kwargs.get("timeout") or self.timeout
+        if isinstance(timeout, (int, float)):
+            timeout = (min(CONNECT_TIMEOUT, timeout), timeout)
+        kwargs["timeout"] = timeout
+        expires = time.monotonic() + deadline if deadline else None
+        breaker = get_circuit_breaker(url)
+        attempts = 1 + (retries if idempotent else 0)
+
+        for attempt in range(attempts):
+            wait = None
+            delay = retry_delay(attempt)
+            if before_send:
+                before_send()
+            if not breaker.allow():
+                raise CircuitOpenError(f"Circuit open for {urlparse(url).netloc}, not sending request")
+            if expires is not None:
+                remaining = max(0.001, expires - time.monotonic())
+                kwargs["timeout"] = tuple(min(part, remaining) for part in timeout)
+
+            with self._lock:
+                session = self._session
+
+            try:
+                response = session.request(method, url, **kwargs)
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+                breaker.record_failure()
+                if attempt + 1 >= attempts or _past(expires, delay):
+                    raise
+            except Exception:
+                # E.g. a broken chunked body
+                breaker.record_error()
+                raise
+            except BaseException:
+                # KeyboardInterrupt etc. say nothing about the host
+                breaker.release_probe()
+                raise
+            else:
+                if not is_retryable_status(response.status_code):
+                    breaker.record_success()
+                    return response
+                if is_host_failure(response.status_code):
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                wait = retry_after(response.headers)
+                delay = max(delay, wait or 0)
+                if (attempt + 1 >= attempts or (wait is not None and wait > RETRY_AFTER_MAX)
+                        or _past(expires, delay)):
+                    return response
+
+            time.sleep(delay)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def close(self):
+        with self._lock:
+            session = self._session
+        if session:
+            session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the process-wide HttpClient, creating it on first use"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = HttpClient()
+    return _client
+
+
+def configure_client(pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                     host_limits=None):
+    """Change pool size / per-host limits of the shared client"""
+    get_client().configure(pool_connections, pool_maxsize, host_limits)
@@ -1,42 +1,50 @@
-import json
 import os
+import threading
 import time
-import requests
 from dotenv import load_dotenv
-
-JWT_FILE = "device_jwts.json"
+from credentials import get_credential_provider
+from http_client import get_client
+from single_flight import SingleFlight
+from state_db import get_state_db
 
 load_dotenv()
-APS_TOKEN = os.getenv("Authorization")
-X_TERM_ID = os.getenv("X-Term-Id")
-APP_CID = f"app:TP-Link_Tapo_Android:{X_TERM_ID}"
 
+# Can be overridden from .env, e.g. to point at mock_cloud.py
+SECURITY_SERVER_URL = os.getenv("TAPO_SECURITY_SERVER_URL", "https://aps1-security.iot.i.tplinknbu.com")
+
+
+# Tokens are refreshed this long before they expire, so callers never wait on one
+REFRESH_AHEAD = 300
+# A token this close to expiry is treated as expired
+EXPIRY_MARGIN = 10
+REFRESH_RETRY = 30
+REFRESH_CHECK_MAX = 3600
 
-def load_jwt_file():
-    if not os.path.exists(JWT_FILE):
-        return {}
-    with open(JWT_FILE, "r") as f:
-        try:
-            return json.load(f)
-        except:
-            return {}
+_tokens = {}  # device_id -> {"jwt": str, "expires_at": int, "refresh_at": float}, mirrors the tokens table
+_tokens_loaded = False
+_lock = threading.Lock()
+_refresh_flights = SingleFlight()
+_refresh_thread = None
+_refresh_wakeup = threading.Event()
 
 
-def save_jwt_file(data):
-    with open(JWT_FILE, "w") as f:
-        json.dump(data, f, indent=2)
+def set_security_server_url(url):
+    """Point JWT requests at a different server at runtime (e.g. a local mock)"""
+    global SECURITY_SERVER_URL
+    SECURITY_SERVER_URL = url.rstrip("/")
 
 
 def fetch_jwt_from_server():
     """
     Calls /v2/auth/app to get a new JWT for this device
     """
-    url = "https://aps1-security.iot.i.tplinknbu.com/v2/auth/app"
+    aps_token, x_term_id = get_credential_provider().get_credentials()
+    url = f"{SECURITY_SERVER_URL}/v2/auth/app"
     headers = {
-        "App-Cid": APP_CID,
+        "App-Cid": f"app:TP-Link_Tapo_Android:{x_term_id}",
         "X-App-Name": "TP-Link_Tapo_Android",
         "X-App-Version": "3.15.117",
-        "X-Term-Id": X_TERM_ID,
+        "X-Term-Id": x_term_id,
         "X-Ospf": "Android 11",
         "X-Net-Type": "wifi",
         "X-Strict": "0",
@@ -47,12 +55,12 @@ def fetch_jwt_from_server():
 
     payload = {
         "appType": "TP-Link_Tapo_Android",
-        "terminalUUID": X_TERM_ID,
-        "token": APS_TOKEN
+        "terminalUUID": x_term_id,
+        "token": aps_token
     }
 
     try:
-        response = requests.post(url, json=payload, headers=headers, timeout=10, verify=False)
+        response = get_client().post(url, json=payload, headers=headers)
         response.raise_for_status()
         data = response.json()
         jwt = data.get("jwt")
@@ -65,24 +73,107 @@ def fetch_jwt_from_server():
     return None, None
 
 
+def _fetch_and_store(device_id):
+    """Fetch a fresh JWT for device_id and keep it, returns the token or None"""
+    # The token comes from the app credentials, so concurrent refreshes for any devices share one request
+    jwt, expires_at = _refresh_flights.do("fetch_jwt", fetch_jwt_from_server)
+    if not jwt:
+        return None
+
+    with _lock:
+        _load_tokens()
+        changed = _tokens.get(device_id, {}).get("jwt") != jwt
+        now = time.time()
+        # Short-lived tokens are refreshed halfway through their life instead
+        refresh_at = max(expires_at - REFRESH_AHEAD, now + (expires_at - now) / 2)
+        _tokens[device_id] = {"jwt": jwt, "expires_at": expires_at, "refresh_at": refresh_at}
+        if changed:
+            get_state_db().set_token(device_id, jwt, expires_at, refresh_at)
+    _refresh_wakeup.set()
+    return jwt
+
+
 def get_valid_jwt(device_id):
     """
     Returns a valid JWT for the given device_id.
-    Automatically fetches a new one if missing or expired.
+    Served from memory; a token close to expiry is refreshed in the background
+    while the current one is still returned. Only a missing or expired token
+    is fetched on the caller's thread.
     """
-    jwts = load_jwt_file()
-    entry = jwts.get(device_id)
+    with _lock:
+        _load_tokens()
+        entry = _tokens.get(device_id)
 
-    # check if JWT exists and is still valid
-    if entry:
-        if time.time() < entry.get("expires_at", 0) - 10:
-            return entry["jwt"]
+    now = time.time()
+    if entry and now < entry.get("expires_at", 0) - EXPIRY_MARGIN:
+        if now >= _refresh_at(entry):
+            start_jwt_refresher()
+            _refresh_wakeup.set()
+        return entry["jwt"]
 
     # missing or expired → fetch new JWT
-    jwt, expires_at = fetch_jwt_from_server(device_id)
-    if jwt:
-        jwts[device_id] = {"jwt": jwt, "expires_at": expires_at}
-        save_jwt_file(jwts)
-        return jwt
+    return _fetch_and_store(device_id)
+
+
+def _load_tokens():
+    """Load stored tokens into memory once (call with _lock held)"""
+    global _tokens_loaded
+    if not _tokens_loaded:
+        _tokens.update(get_state_db().get_all_tokens())
+        _tokens_loaded = True
+
+
+def _forget_tokens(authorization, x_term_id):
+    """Tokens were issued for the previous credentials, drop them all"""
+    global _tokens_loaded
+    with _lock:
+        _tokens.clear()
+        _tokens_loaded = True
+        get_state_db().delete_tokens()
+
+
+get_credential_provider().add_listener(_forget_tokens)
+
+
+def _refresh_at(entry):
+    return entry.get("refresh_at", entry.get("expires_at", 0) - REFRESH_AHEAD)
+
+
+def _refresh_due_tokens():
+    """Refresh tokens entering the refresh window, returns seconds until the next one does"""
+    with _lock:
+        _load_tokens()
+        entries = list(_tokens.items())
+
+    now = time.time()
+    next_due = REFRESH_CHECK_MAX
+    for device_id, entry in entries:
+        due_in = _refresh_at(entry) - now
+        if due_in <= 0:
+            if not _fetch_and_store(device_id):
+                due_in = REFRESH_RETRY  # server unreachable, try again later
+            else:
+                continue
+        next_due = min(next_due, due_in)
+    return max(1.0, next_due)
+
+
+def start_jwt_refresher():
+    """Keep cached JWTs refreshed ahead of expiry from a background thread"""
+    global _refresh_thread
+    with _lock:
+        if _refresh_thread and _refresh_thread.is_alive():
+            return
+
+        def run():
+            while True:
+                try:
+                    wait = _refresh_due_tokens()
+                except Exception as e:
+                    print(f"[!] JWT refresh failed: {e}")
+                    wait = REFRESH_RETRY
+                _refresh_wakeup.wait(wait)
+                _refresh_wakeup.clear()
 
-    return None
+        _refresh_thread = threading.Thread(target=run, daemon=True)
+        _refresh_thread.start()
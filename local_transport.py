@@ -0,0 +1,146 @@
+import hashlib
+import os
+import threading
+import time
+import requests
+from urllib3.exceptions import NewConnectionError
+from http_client import CircuitOpenError, get_client
+
+# Direct LAN control is opt-in: it needs the camera's local admin password
+LOCAL_CONTROL = os.getenv("TAPO_LOCAL_CONTROL", "0") == "1"
+LOCAL_USERNAME = os.getenv("TAPO_LOCAL_USERNAME", "admin")
+LOCAL_PASSWORD = os.getenv("TAPO_LOCAL_PASSWORD", "")
+LOCAL_SCHEME = os.getenv("TAPO_LOCAL_SCHEME", "https")
+LOCAL_PORT = int(os.getenv("TAPO_LOCAL_PORT", "443"))
+# A camera on the LAN answers fast; don't let an unreachable one delay the cloud fallback
+LOCAL_TIMEOUT = float(os.getenv("TAPO_LOCAL_TIMEOUT", "1.5"))
+# After a failure, go straight to the cloud for this long before trying the LAN again
+RETRY_LOCAL_AFTER = float(os.getenv("TAPO_LOCAL_RETRY_AFTER", "60"))
+
+ERROR_INVALID_STOK = -40401
+
+
+class LocalDeliveryError(Exception):
+    """A LAN request was sent but not answered, the camera may have run it"""
+
+
+class _LoginError(Exception):
+    """Login was refused, nothing else was sent"""
+
+
+def _never_sent(error):
+    """True if the request cannot have reached the camera (failed logging in or connecting)"""
+    if isinstance(error, (_LoginError, requests.exceptions.ConnectTimeout, CircuitOpenError)):
+        return True
+    if isinstance(error, requests.exceptions.ConnectionError):
+        reason = getattr(error.args[0], "reason", None) if error.args else None
+        return isinstance(reason, NewConnectionError)
+    return False
+
+
+class LocalTransport:
+    """
+    Sends multipleRequest calls straight to a camera's local API.
+
+    Logs in with the camera's local credentials, keeps the session token
+    (stok) per device, and reports failure by returning None so the caller
+    can fall back to the cloud passthrough. A request that was sent but not
+    answered raises LocalDeliveryError instead, since resending it could run
+    a command twice. Cameras that fail are skipped for RETRY_LOCAL_AFTER
+    seconds.
+    """
+
+    def __init__(self, username=LOCAL_USERNAME, password=LOCAL_PASSWORD, scheme=LOCAL_SCHEME,
+                 port=LOCAL_PORT, timeout=LOCAL_TIMEOUT, enabled=LOCAL_CONTROL):
+        self.username = username
+        self.password = password
+        self.scheme = scheme
+        self.port = port
+        self.timeout = timeout
+        self.enabled = enabled and bool(password)
+        self._ips = {}  # device_id -> private IP
+        self._stoks = {}  # device_id -> session token
+        self._skip_until = {}  # device_id -> monotonic time
+        self._lock = threading.Lock()
+
+    def register_device(self, device_id, ip):
+        """Remember a device's private IP (drops the session if the IP changed)"""
+        if not device_id or not ip:
+            return
+        with self._lock:
+            if self._ips.get(device_id) != ip:
+                self._ips[device_id] = ip
+                self._stoks.pop(device_id, None)
+                self._skip_until.pop(device_id, None)
+
+    def base_url(self, ip):
+        return f"{self.scheme}://{ip}:{self.port}"
+
+    def _mark_failed(self, device_id, reason):
+        print(f"[!] LAN control unavailable for {device_id} ({reason}), using cloud")
+        with self._lock:
+            self._stoks.pop(device_id, None)
+            self._skip_until[device_id] = time.monotonic() + RETRY_LOCAL_AFTER
+
+    def _login(self, ip):
+        payload = {
+            "method": "login",
+            "params": {
+                "hashed": True,
+                "password": hashlib.md5(self.password.encode()).hexdigest().upper(),
+                "username": self.username
+            }
+        }
+        try:
+            response = get_client().post(self.base_url(ip), json=payload, timeout=self.timeout)
+            data = response.json()
+        except Exception as e:
+            raise _LoginError(f"login failed: {e}") from e
+        if data.get("error_code", -1) != 0:
+            raise _LoginError(f"login failed with error {data.get('error_code')}")
+        return data["result"]["stok"]
+
+    def _send(self, ip, stok, requests):
+        payload = {"method": "multipleRequest", "params": {"requests": requests}}
+        response = get_client().post(f"{self.base_url(ip)}/stok={stok}/ds", json=payload, timeout=self.timeout)
+        return response.json()
+
+    def call(self, device_id, requests):
+        """
+        Run requests on the camera over the LAN.
+
+        :return: list of per-method responses (same shape as the cloud's), or
+                 None if the request never reached the camera (safe to resend via the cloud)
+        :raises LocalDeliveryError: if the request was sent but no answer came
+                 back, so the camera may or may not have run it
+        """
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            ip = self._ips.get(device_id)
+            stok = self._stoks.get(device_id)
+            if not ip or time.monotonic() < self._skip_until.get(device_id, 0):
+                return None
+
+        try:
+            if not stok:
+                stok = self._login(ip)
+            data = self._send(ip, stok, requests)
+            if data.get("error_code") == ERROR_INVALID_STOK:
+                # Session expired (the camera rejected the call unrun), log in again once
+                stok = self._login(ip)
+                data = self._send(ip, stok, requests)
+            if data.get("error_code", -1) != 0:
+                self._mark_failed(device_id, f"error {data.get('error_code')}")
+                return None
+            responses = data["result"]["responses"]
+        except Exception as e:
+            self._mark_failed(device_id, e)
+            if _never_sent(e):
+                return None
+            raise LocalDeliveryError(f"no answer from {device_id} over the LAN ({e})") from e
+
+        with self._lock:
+            self._stoks[device_id] = stok
+        return responses
@@ -4,7 +4,15 @@ import os
 import threading
 from dotenv import load_dotenv
 from settings_page import SettingsPage
-from api import get_all_devices, get_device_details, get_presets, move_to_preset, move_camera
+from bulk_dialog import BulkActionsDialog
+from credentials import get_credential_provider
+from api import get_all_devices, move_to_preset, start_endpoint_selection, register_device_ip
+from ptz_queue import get_ptz_queue
+from device_fetcher import fetch_all_device_details
+from device_poller import DevicePoller
+from device_cache import get_cached_devices, get_fresh_device_ids, update_device_cache
+from models import DeviceDetails
+from preset_cache import get_cached_presets, fetch_presets, prefetch_presets
 from video_player import VideoPlayer
 from PIL import Image, ImageTk
 import sys
@@ -51,6 +59,9 @@ class MainApp:
         self.video_player = None
         self.current_presets = {}  # Store current camera presets
         self.right_sidebar = None  # Right sidebar for presets
+        self.camera_items = {}  # device_id -> camera item frame
+        self.pending_selection_id = None  # Device to re-select once it reappears in the list
+        self.load_generation = 0  # Bumped on every load so stale results are ignored
         
         # Create main frame
         self.main_frame = tk.Frame(self.root, bg=self.bg_dark)
@@ -67,6 +78,18 @@ class MainApp:
         # Settings page (initially hidden)
         self.settings_page = None
         
+        # Start picking the fastest cloud endpoint in the background
+        start_endpoint_selection()
+        
+        # Keep device details fresh in the background, only changes reach the UI
+        self.device_poller = DevicePoller(
+            on_change=lambda device_id, details, changed: self.root.after(
+                0, lambda: self.on_device_changed(device_id, details, changed)),
+            on_status=lambda device_id, online: self.root.after(
+                0, lambda: self.on_device_status(device_id, online))
+        )
+        self.device_poller.start()
+        
         # Load devices on startup
         self.load_devices()
         
@@ -122,6 +145,24 @@ class MainApp:
         settings_btn.bind("<Enter>", on_enter_settings)
         settings_btn.bind("<Leave>", on_leave_settings)
 
+        # Bulk actions button
+        bulk_btn = tk.Button(
+            header_frame,
+            text="☰",  # Act on many cameras at once
+            font=("Segoe UI", 18),
+            bg=self.bg_header,
+            fg=self.text_primary,
+            activebackground=self.accent_hover,
+            activeforeground=self.bg_dark,
+            relief=tk.FLAT,
+            bd=0,
+            cursor="hand2",
+            command=self.open_bulk_actions
+        )
+        bulk_btn.pack(side=tk.RIGHT, pady=15)
+        bulk_btn.bind("<Enter>", lambda e: bulk_btn.config(fg=self.accent))
+        bulk_btn.bind("<Leave>", lambda e: bulk_btn.config(fg=self.text_primary))
+
     def create_footer(self):
         """Create a full-width footer strip with centered clickable name"""
         footer_frame = tk.Frame(self.root, bg=self.bg_header, height=40)
@@ -487,21 +528,10 @@ class MainApp:
         if not self.selected_device:
             return
         
-        device_id = self.selected_device.get('device_id')
-        
-        # Send request in separate thread
-        def send_request():
-            try:
-                result = move_camera(device_id, axis, value)
-                if result:
-                    print(f"Successfully moved camera on {axis}-axis by {value}")
-                else:
-                    print(f"Failed to move camera on {axis}-axis")
-            except Exception as e:
-                print(f"Error moving camera: {e}")
+        device_id = self.selected_device.device_id
         
-        thread = threading.Thread(target=send_request, daemon=True)
-        thread.start()
+        # Rapid clicks are merged into one motorMove per round trip
+        get_ptz_queue(device_id).move(axis, value)
         
     def create_preset_button(self, preset_id, preset_name):
         """Create a preset button"""
@@ -538,40 +568,64 @@ class MainApp:
         if not self.selected_device:
             return
         
-        device_id = self.selected_device.get('device_id')
-        
-        # Clear existing presets
-        for widget in self.presets_frame.winfo_children():
-            widget.destroy()
+        device_id = self.selected_device.device_id
         
-        # Show loading message
-        loading_label = tk.Label(
-            self.presets_frame,
-            text="Loading presets...",
-            font=("Segoe UI", 11),
-            bg=self.bg_card,
-            fg=self.text_secondary
-        )
-        loading_label.pack(pady=20)
+        # Show cached presets straight away, only hit the network when they are stale
+        cached_presets, is_fresh = get_cached_presets(device_id)
+        if cached_presets is not None:
+            self.current_presets = cached_presets
+            self.update_presets_display()
+            if is_fresh:
+                return
+        else:
+            self.current_presets = None
+            
+            # Clear existing presets
+            for widget in self.presets_frame.winfo_children():
+                widget.destroy()
+            
+            # Show loading message
+            loading_label = tk.Label(
+                self.presets_frame,
+                text="Loading presets...",
+                font=("Segoe UI", 11),
+                bg=self.bg_card,
+                fg=self.text_secondary
+            )
+            loading_label.pack(pady=20)
         
         # Load presets in separate thread
-        def fetch_presets():
+        def load_in_background():
             try:
-                presets = get_presets(device_id)
-                self.current_presets = presets or {}
+                presets = fetch_presets(device_id)
+                if presets is None and cached_presets is not None:
+                    return
                 
                 # Update UI in main thread
-                self.root.after(0, lambda: self.update_presets_display())
+                self.root.after(0, lambda: self.on_presets_loaded(device_id, presets or {}))
             except Exception as e:
                 print(f"Error loading presets: {e}")
-                self.root.after(0, lambda: loading_label.config(
-                    text="Error loading presets",
-                    fg=self.error
-                ))
+                if cached_presets is None:
+                    self.root.after(0, lambda: loading_label.winfo_exists() and loading_label.config(
+                        text="Error loading presets",
+                        fg=self.error
+                    ))
         
-        thread = threading.Thread(target=fetch_presets, daemon=True)
+        thread = threading.Thread(target=load_in_background, daemon=True)
         thread.start()
     
+    def on_presets_loaded(self, device_id, presets):
+        """Show freshly loaded presets if their camera is still selected"""
+        if not self.selected_device or self.selected_device.device_id != device_id:
+            return
+        # The presets batch also refreshed the lens mask state
+        if self.video_player and self.video_player.current_device is self.selected_device:
+            self.video_player.show_privacy_state(self.selected_device)
+        if presets == self.current_presets:
+            return
+        self.current_presets = presets
+        self.update_presets_display()
+    
     def update_presets_display(self):
         """Update the presets display"""
         # Clear existing widgets
@@ -598,7 +652,7 @@ class MainApp:
         if not self.selected_device:
             return
         
-        device_id = self.selected_device.get('device_id')
+        device_id = self.selected_device.device_id
         
         # Send request in separate thread
         def send_request():
@@ -626,24 +680,80 @@ class MainApp:
         else:
             self.settings_page.show()
     
+    def open_bulk_actions(self):
+        """Open the bulk actions popup for the loaded cameras"""
+        if not self.devices_data:
+            return
+        BulkActionsDialog(self.root, self)
+    
+    def apply_device_details(self, devices):
+        """Show freshly fetched details (e.g. from a bulk refresh) and cache them"""
+        for details in devices:
+            self.update_camera_item(details.device_id, details, self.load_generation)
+        update_device_cache(list(self.camera_items), devices)
+        self.device_poller.set_devices(self.devices_data)
+    
+    def on_device_changed(self, device_id, details, changed):
+        """Apply details the background poller found to have changed"""
+        item_frame = self.camera_items.get(device_id)
+        if not item_frame or not item_frame.winfo_exists() or not item_frame.loaded:
+            return
+        
+        print(f"Device {device_id} changed: {', '.join(changed)}")
+        item_frame.device = details
+        if 'name' in changed:
+            item_frame.name_label.config(text=details.name or 'Unknown Camera')
+        if 'device_name' in changed:
+            item_frame.device_label.config(text=details.device_name or 'Unknown Device')
+        self.refresh_devices_data()
+        update_device_cache(list(self.camera_items), [details])
+        
+        if not self.selected_device or self.selected_device.device_id != device_id:
+            return
+        self.update_selected_device(details, item_frame, changed)
+    
+    def update_selected_device(self, details, item_frame, changed):
+        """Hand new details to the playing camera, restarting the stream only if its IPs changed"""
+        if 'private_ip' in changed or 'public_ip' in changed:
+            # The stream URL depends on the IP, restart the stream with the new details
+            self.select_camera(details, item_frame)
+            return
+        if self.video_player and self.video_player.current_device is self.selected_device:
+            self.video_player.current_device = details
+            if 'privacy_enabled' in changed:
+                self.video_player.show_privacy_state(details)
+        self.selected_device = details
+    
+    def on_device_status(self, device_id, online):
+        """Mark a camera offline / back online in the list"""
+        item_frame = self.camera_items.get(device_id)
+        if not item_frame or not item_frame.winfo_exists() or not item_frame.loaded:
+            return
+        
+        if online:
+            item_frame.device_label.config(text=item_frame.device.device_name or 'Unknown Device', fg=self.text_secondary)
+        else:
+            item_frame.device_label.config(text="Offline", fg=self.error)
+    
     def load_devices(self):
         """Load all devices and their details"""
         # Check if credentials are configured
-        authorization = os.getenv("Authorization")
-        x_term_id = os.getenv("X-Term-Id")
-        
-        if not authorization or not x_term_id:
-            self.loading_label.config(
-                text="⚠ Configure settings first",
-                fg=self.error
-            )
+        if not get_credential_provider().get_headers():
+            self.show_list_message("⚠ Configure settings first", self.error)
             return
         
-        # Update loading status
-        self.loading_label.config(
-            text="Loading cameras...",
-            fg=self.text_secondary
-        )
+        # Results from an older load must not land in the new list
+        self.load_generation += 1
+        generation = self.load_generation
+        
+        # Paint the last known fleet straight away and revalidate it in the background
+        if not self.camera_items:
+            cached_devices = get_cached_devices()
+            if cached_devices:
+                self.update_camera_list(cached_devices)
+            else:
+                self.show_list_message("Loading cameras...", self.text_secondary)
+        shown_ids = {device_id for device_id, item_frame in self.camera_items.items() if item_frame.loaded}
         
         # Load devices in a separate thread to avoid blocking UI
         def fetch_devices():
@@ -653,77 +763,76 @@ class MainApp:
                 device_ids = get_all_devices()
                 print(f"get_all_devices returned: {device_ids}")
                 
-                if not device_ids or device_ids == False:
+                if device_ids == False:
                     print("No device IDs returned")
-                    self.root.after(0, lambda: self.loading_label.config(
-                        text="No devices found",
-                        fg=self.error
-                    ))
+                    self.root.after(0, lambda: self.show_load_error("No devices found", generation))
                     return
                 
                 if not isinstance(device_ids, list) or len(device_ids) == 0:
                     print(f"Device IDs is not a valid list: {type(device_ids)}, length: {len(device_ids) if isinstance(device_ids, list) else 'N/A'}")
-                    self.root.after(0, lambda: self.loading_label.config(
-                        text="No devices found",
-                        fg=self.error
-                    ))
+                    update_device_cache([], [])
+                    self.root.after(0, lambda: self.show_list_message("No devices found", self.error))
                     return
                 
                 print(f"Found {len(device_ids)} device IDs: {device_ids}")
                 
-                # Get details for each device
-                devices_data = []
-                for device_id in device_ids:
-                    try:
-                        print(f"Getting details for device: {device_id}")
-                        device_details = get_device_details(device_id)
-                        print(f"Device details for {device_id}: {device_details}")
-                        if device_details and device_details != False:
-                            device_details['device_id'] = device_id
-                            devices_data.append(device_details)
-                            print(f"Added device {device_id} to list")
-                    except Exception as e:
-                        # Continue with other devices if one fails
-                        print(f"Error getting details for {device_id}: {e}")
-                        import traceback
-                        traceback.print_exc()
-                        continue
+                # Show a placeholder row per new device straight away
+                self.root.after(0, lambda ids=list(device_ids): self.show_camera_placeholders(ids, generation))
+                
+                # Rows painted from a recent enough cache entry need no request at all
+                fresh_ids = get_fresh_device_ids() & shown_ids
+                stale_ids = [device_id for device_id in device_ids if device_id not in fresh_ids]
+                print(f"Refreshing {len(stale_ids)} devices, {len(device_ids) - len(stale_ids)} served from cache")
+                
+                # Fill in each row as soon as its details arrive
+                def on_device_loaded(index, device_id, details):
+                    self.root.after(0, lambda: self.update_camera_item(device_id, details, generation))
+                
+                # Get details for all devices in parallel
+                devices_data = fetch_all_device_details(stale_ids, on_result=on_device_loaded)
                 
                 print(f"Total devices with details: {len(devices_data)}")
+                update_device_cache(device_ids, devices_data)
                 
-                # Update UI in main thread - fix closure issue
-                devices_data_copy = devices_data.copy()
-                if devices_data_copy:
-                    self.root.after(0, lambda data=devices_data_copy: self.update_camera_list(data))
-                else:
-                    self.root.after(0, lambda: self.loading_label.config(
-                        text="No device details retrieved",
-                        fg=self.error
-                    ))
+                # Update UI in main thread
+                self.root.after(0, lambda: self.finish_camera_list(generation))
                 
             except Exception as e:
                 import traceback
                 error_msg = str(e)
                 print(f"Exception in fetch_devices: {error_msg}")
                 traceback.print_exc()
-                self.root.after(0, lambda msg=error_msg: self.loading_label.config(
-                    text=f"Error: {msg}",
-                    fg=self.error
-                ))
+                self.root.after(0, lambda msg=error_msg: self.show_load_error(f"Error: {msg}", generation))
         
         # Start thread
         thread = threading.Thread(target=fetch_devices, daemon=True)
         thread.start()
     
-    def update_camera_list(self, devices_data):
-        """Update the camera list in the sidebar"""
-        print(f"update_camera_list called with {len(devices_data) if devices_data else 0} devices")
-        
-        # Store previously selected device ID
-        previously_selected_id = None
-        if self.selected_device:
-            previously_selected_id = self.selected_device.get('device_id')
+    def show_list_message(self, text, fg):
+        """Replace the camera list with a single status message"""
+        # The loading label is destroyed whenever the list is rebuilt
+        if not self.loading_label.winfo_exists():
+            self.reset_camera_list()
+            self.loading_label = tk.Label(
+                self.camera_list_frame,
+                font=("Segoe UI", 11),
+                bg=self.bg_card
+            )
+            self.loading_label.pack(pady=20)
+        self.loading_label.config(text=text, fg=fg)
+    
+    def show_load_error(self, text, generation):
+        """Show a load error unless cached cameras are already on screen"""
+        if generation != self.load_generation:
+            return
         
+        if any(item_frame.loaded for item_frame in self.camera_items.values()):
+            print(f"Keeping cached camera list: {text}")
+            return
+        self.show_list_message(text, self.error)
+    
+    def clear_selection(self):
+        """Stop the stream and go back to the "No camera selected" view"""
         # Stop video stream if playing
         if self.video_player:
             self.video_player.stop_stream()
@@ -736,44 +845,150 @@ class MainApp:
         # Hide presets sidebar
         self.right_sidebar.pack_forget()
         
-        self.devices_data = devices_data
+        # Reset selection
+        self.selected_device = None
+        self.selected_camera_frame = None
+        self.device_poller.set_selected(None)
+    
+    def reset_camera_list(self):
+        """Stop the stream, clear the selection and empty the camera list"""
+        # Remember the selected device so it can be re-selected once it reappears
+        if self.selected_device:
+            self.pending_selection_id = self.selected_device.device_id
+        
+        self.clear_selection()
         
         # Clear existing items (including loading label)
         for widget in self.camera_list_frame.winfo_children():
             widget.destroy()
+        self.camera_items = {}
+    
+    def refresh_devices_data(self):
+        """Rebuild devices_data from the loaded rows, in list order"""
+        self.devices_data = [item_frame.device for item_frame in self.camera_items.values() if item_frame.loaded]
+    
+    def show_camera_placeholders(self, device_ids, generation):
+        """Make the list hold one row per device ID, adding placeholders for new ones"""
+        if generation != self.load_generation:
+            return
         
-        # Reset selection
-        self.selected_device = None
-        self.selected_camera_frame = None
+        # Only a status message is showing, start from an empty list
+        if self.loading_label.winfo_exists():
+            self.reset_camera_list()
+        
+        # Drop rows for devices that left the account
+        wanted_ids = set(device_ids)
+        for device_id in list(self.camera_items):
+            if device_id in wanted_ids:
+                continue
+            if self.selected_device and self.selected_device.device_id == device_id:
+                self.clear_selection()
+            self.camera_items.pop(device_id).destroy()
+        
+        # Keep existing rows and re-pack everything in account order
+        camera_items = {}
+        for device_id in device_ids:
+            item_frame = self.camera_items.get(device_id)
+            if item_frame is None:
+                item_frame = self.create_camera_item(DeviceDetails(device_id=device_id), placeholder=True)
+            else:
+                item_frame.pack_forget()
+                item_frame.pack(fill=tk.X, pady=5)
+            camera_items[device_id] = item_frame
+        self.camera_items = camera_items
+        self.refresh_devices_data()
+    
+    def update_camera_item(self, device_id, details, generation):
+        """Fill in or refresh a row once its device details arrive"""
+        if generation != self.load_generation:
+            return
+        
+        item_frame = self.camera_items.get(device_id)
+        if not item_frame or not item_frame.winfo_exists():
+            return
+        
+        if not details:
+            # Keep showing the cached details if we have them
+            if not item_frame.loaded:
+                item_frame.device_label.config(text="Unavailable", fg=self.error)
+            return
+        
+        # Only repaint rows whose details actually changed
+        if item_frame.loaded and item_frame.device == details:
+            return
+        
+        item_frame.device = details
+        item_frame.loaded = True
+        item_frame.name_label.config(text=details.name or 'Unknown Camera', fg=self.text_primary)
+        item_frame.device_label.config(text=details.device_name or 'Unknown Device', fg=self.text_secondary)
+        self.refresh_devices_data()
+        
+        # Re-select the camera that was selected before the reload, or hand it its new details
+        if device_id == self.pending_selection_id:
+            self.pending_selection_id = None
+            self.select_camera(details, item_frame)
+        elif self.selected_device and self.selected_device.device_id == device_id:
+            changed = [field for field in ('private_ip', 'public_ip', 'privacy_enabled')
+                       if getattr(self.selected_device, field) != getattr(details, field)]
+            self.update_selected_device(details, item_frame, changed)
+    
+    def finish_camera_list(self, generation):
+        """Drop rows that never loaded once every fetch has finished"""
+        if generation != self.load_generation:
+            return
+        
+        for device_id, item_frame in list(self.camera_items.items()):
+            if not item_frame.loaded:
+                item_frame.destroy()
+                del self.camera_items[device_id]
+        
+        self.refresh_devices_data()
+        self.pending_selection_id = None
+        
+        if not self.devices_data:
+            self.show_list_message("No device details retrieved", self.error)
+            return
+        
+        self.device_poller.set_devices(self.devices_data)
+        
+        # Warm the preset cache so switching cameras never waits on the network
+        device_ids = [device.device_id for device in self.devices_data]
+        prefetch_presets(
+            device_ids,
+            on_update=lambda device_id, presets: self.root.after(0, lambda: self.on_presets_loaded(device_id, presets))
+        )
+    
+    def update_camera_list(self, devices_data):
+        """Update the camera list in the sidebar"""
+        print(f"update_camera_list called with {len(devices_data) if devices_data else 0} devices")
+        
+        self.reset_camera_list()
+        previously_selected_id = self.pending_selection_id
+        self.pending_selection_id = None
+        
+        self.devices_data = devices_data
         
         if not devices_data or len(devices_data) == 0:
             print("No devices data, showing 'No cameras found'")
-            no_devices_label = tk.Label(
-                self.camera_list_frame,
-                text="No cameras found",
-                font=("Segoe UI", 11),
-                bg=self.bg_card,
-                fg=self.text_secondary
-            )
-            no_devices_label.pack(pady=20)
+            self.show_list_message("No cameras found", self.text_secondary)
             return
         
         print(f"Creating camera items for {len(devices_data)} devices")
         
         # Create camera items
-        item_frames = {}
-        for idx, device in enumerate(devices_data):
-            item_frame = self.create_camera_item(device, idx)
-            device_id = device.get('device_id')
+        for device in devices_data:
+            device_id = device.device_id
+            register_device_ip(device_id, device.private_ip)
+            item_frame = self.create_camera_item(device)
             if device_id:
-                item_frames[device_id] = (device, item_frame)
+                self.camera_items[device_id] = item_frame
         
         # Auto-select if this was the previously selected device
-        if previously_selected_id and previously_selected_id in item_frames:
-            device, item_frame = item_frames[previously_selected_id]
-            self.select_camera(device, item_frame)
+        if previously_selected_id and previously_selected_id in self.camera_items:
+            item_frame = self.camera_items[previously_selected_id]
+            self.select_camera(item_frame.device, item_frame)
     
-    def create_camera_item(self, device, index):
+    def create_camera_item(self, device, placeholder=False):
         """Create a camera item in the sidebar"""
         # Camera item frame
         item_frame = tk.Frame(
@@ -785,22 +1000,23 @@ class MainApp:
         
         # Store device reference in frame
         item_frame.device = device
-        item_frame.device_id = device.get('device_id')
+        item_frame.device_id = device.device_id
+        item_frame.loaded = not placeholder
         
         # Camera name
-        name = device.get('name', 'Unknown Camera')
+        name = "Loading..." if placeholder else device.name or 'Unknown Camera'
         name_label = tk.Label(
             item_frame,
             text=name,
             font=("Segoe UI", 12, "bold"),
             bg=self.bg_card,
-            fg=self.text_primary,
+            fg=self.text_secondary if placeholder else self.text_primary,
             anchor="w"
         )
         name_label.pack(fill=tk.X, padx=25, pady=(12, 4))  # Increased padx to compensate for removed frame padding
         
         # Device name
-        device_name = device.get('device_name', 'Unknown Device')
+        device_name = item_frame.device_id if placeholder else device.device_name or 'Unknown Device'
         device_label = tk.Label(
             item_frame,
             text=device_name,
@@ -811,9 +1027,13 @@ class MainApp:
         )
         device_label.pack(fill=tk.X, padx=25, pady=(0, 12))  # Increased padx to compensate for removed frame padding
         
-        # Make clickable
+        item_frame.name_label = name_label
+        item_frame.device_label = device_label
+        
+        # Make clickable (placeholders become clickable once their details arrive)
         def on_click(e):
-            self.select_camera(device, item_frame)
+            if item_frame.loaded:
+                self.select_camera(item_frame.device, item_frame)
         
         # Bind click to frame and labels
         item_frame.bind("<Button-1>", on_click)
@@ -856,6 +1076,7 @@ class MainApp:
         
         self.selected_device = device
         self.selected_camera_frame = item_frame
+        self.device_poller.set_selected(device.device_id)
         
         # Show video player and hide "No camera selected" message
         self.no_camera_label.grid_remove()
@@ -0,0 +1,460 @@
+"""
+Local stand-in for the Tapo cloud, for benchmarking and testing api.py
+without a TP-Link account.
+
+    python mock_cloud.py --port 8080 --fleet-size 40 --latency 0.08 --error-rate 0.01
+
+Then set TAPO_APP_SERVER_URL / TAPO_EDGE_SERVER_URL / TAPO_SECURITY_SERVER_URL
+in .env to http://127.0.0.1:8080 (or call api.set_base_urls()).
+
+MockLocalCamera and MockRtspCamera stand in for a camera's local API and
+RTSP server.
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import socketserver
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+THING_ORDER_PATH = "/v1/families/default/thing-order"
+SERVICES_SYNC_RE = re.compile(r"^/v1/things/([^/]+)/services-sync$")
+AUTH_PATH = "/v2/auth/app"
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 stalls bursts of new connections for a second
+    request_queue_size = 256
+
+
+class MockCamera:
+    """State of one simulated camera"""
+
+    def __init__(self, index):
+        self.device_id = f"{index:040X}"
+        self.alias = f"Camera {index + 1}"
+        self.model = "C200"
+        self.private_ip = f"192.168.1.{10 + index % 240}"
+        self.public_ip = "203.0.113.10"
+        self.presets = {str(i): f"Preset {i}" for i in range(1, 4)}
+        self.lens_mask = "off"
+        self.x = 0
+        self.y = 0
+        self.lock = threading.Lock()
+
+    def handle(self, method, params):
+        """Run one passthrough method, returns (error_code, result)"""
+        with self.lock:
+            if method == "getDeviceInfo":
+                return 0, {"device_info": {"basic_info": {
+                    "device_alias": self.alias,
+                    "device_name": self.model,
+                    "longitude": 0,
+                    "latitude": 0,
+                }}}
+            if method == "getUpnpStatus":
+                return 0, {"upnpc": {"upnp_status": [{"vhttpd": {"ipaddr": self.private_ip}}]}}
+            if method == "getPubIP":
+                return 0, {"upnpc": {"pub_ip": {"ip": self.public_ip}}}
+            if method == "getPresetConfig":
+                return 0, {"preset": {"preset": {
+                    "id": list(self.presets.keys()),
+                    "name": list(self.presets.values()),
+                }}}
+            if method == "getLensMaskConfig":
+                return 0, {"lens_mask": {"lens_mask_info": {"enabled": self.lens_mask}}}
+            if method == "setLensMaskConfig":
+                self.lens_mask = params["lens_mask"]["lens_mask_info"]["enabled"]
+                return 0, {}
+            if method == "motorMoveToPreset":
+                preset_id = params["preset"]["goto_preset"]["id"]
+                return (0, {}) if preset_id in self.presets else (-64321, {})
+            if method == "motorMove":
+                move = params["motor"]["move"]
+                x = self.x + int(move.get("x_coord", 0))
+                y = self.y + int(move.get("y_coord", 0))
+                # Same error the real camera gives at the end of its range
+                if abs(x) > 170 or abs(y) > 35:
+                    return -64304, {}
+                self.x, self.y = x, y
+                return 0, {}
+        return -40106, {}
+
+
+class MockTapoCloud:
+    """
+    Threaded HTTP server implementing the cloud endpoints api.py and jwt_helper.py use.
+
+    :param fleet_size: int - number of simulated cameras
+    :param latency: float - seconds added to every response
+    :param jitter: float - extra random delay of up to this many seconds
+    :param error_rate: float - fraction of requests answered with HTTP 500
+    :param include_total: bool - report 'total' in thing-order pages
+    :param ignore_page: bool - always serve the first thing-order page, like a server ignoring 'page'
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, fleet_size=10, latency=0.0, jitter=0.0,
+                 error_rate=0.0, include_total=True, ignore_page=False):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.include_total = include_total
+        self.ignore_page = ignore_page
+        self.throttled = 0  # answer this many upcoming requests with 429
+        self.retry_after = "1"  # Retry-After sent with those 429s
+        self.cameras = {}
+        self.request_count = 0
+        self._count_lock = threading.Lock()
+        self.set_fleet_size(fleet_size)
+
+        cloud = self
+
+        class Handler(_MockHandler):
+            mock = cloud
+
+        self.server = _Server((host, port), Handler)
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def set_fleet_size(self, fleet_size):
+        cameras = [MockCamera(index) for index in range(fleet_size)]
+        self.cameras = {camera.device_id: camera for camera in cameras}
+
+    def start(self):
+        """Serve in a background thread, returns self"""
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so connection pooling is exercised
+    mock = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _simulate_network(self):
+        """Apply latency and maybe fail, returns False if an error was sent"""
+        mock = self.mock
+        with mock._count_lock:
+            mock.request_count += 1
+            throttled = mock.throttled > 0
+            if throttled:
+                mock.throttled -= 1
+        delay = mock.latency + random.uniform(0, mock.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        if throttled:
+            self._send_json(429, {"error_code": -1, "msg": "Too many requests"}, {"Retry-After": mock.retry_after})
+            return False
+        if mock.error_rate and random.random() < mock.error_rate:
+            self._send_json(500, {"error_code": -1, "msg": "Simulated server error"})
+            return False
+        return True
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json;charset=UTF-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            return json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return None
+
+    def do_HEAD(self):
+        # Used by endpoint latency probes, only the round trip matters
+        delay = self.mock.latency + random.uniform(0, self.mock.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        self.send_response(404)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != THING_ORDER_PATH:
+            self._send_json(404, {"error_code": -1, "msg": "Not found"})
+            return
+        if not self._simulate_network():
+            return
+
+        query = parse_qs(url.query)
+        page = 0 if self.mock.ignore_page else int(query.get("page", ["0"])[0])
+        page_size = int(query.get("pageSize", ["20"])[0])
+        device_ids = list(self.mock.cameras)
+        page_ids = device_ids[page * page_size:(page + 1) * page_size]
+
+        body = {"data": [{"thingOrders": [f"Device-{device_id}" for device_id in page_ids]}]}
+        if self.mock.include_total:
+            body["total"] = len(device_ids)
+        self._send_json(200, body)
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        body = self._read_json()
+
+        if path == AUTH_PATH:
+            if not self._simulate_network():
+                return
+            self._send_json(200, {"jwt": uuid.uuid4().hex, "jwtExpiresIn": 3600})
+            return
+
+        match = SERVICES_SYNC_RE.match(path)
+        if not match:
+            self._send_json(404, {"error_code": -1, "msg": "Not found"})
+            return
+        if not self._simulate_network():
+            return
+
+        camera = self.mock.cameras.get(match.group(1))
+        if camera is None:
+            self._send_json(404, {"error_code": -20571, "msg": "Device does not exist"})
+            return
+
+        try:
+            requests = body["inputParams"]["requestData"]["params"]["requests"]
+        except (KeyError, TypeError):
+            self._send_json(400, {"error_code": -1, "msg": "Malformed passthrough request"})
+            return
+
+        self._send_json(200, {"outputParams": {"responseData": {
+            "error_code": 0,
+            "result": {"responses": [run_method(camera, request) for request in requests]},
+        }}})
+
+
+class MockLocalCamera:
+    """
+    Stand-in for a camera's local API, for testing LAN control.
+
+    Speaks the login / stok=<token>/ds multipleRequest protocol over plain
+    HTTP; point local_transport at it with scheme "http" and its port.
+    """
+
+    def __init__(self, camera=None, host="127.0.0.1", port=0, username="admin", password="password", latency=0.0):
+        self.camera = camera or MockCamera(0)
+        self.username = username
+        self.password_hash = hashlib.md5(password.encode()).hexdigest().upper()
+        self.latency = latency
+        self.tokens = set()
+        self.request_count = 0
+
+        local = self
+
+        class Handler(_LocalHandler):
+            mock = local
+
+        self.server = _Server((host, port), Handler)
+
+    @property
+    def ip(self):
+        return self.server.server_address[0]
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class _LocalHandler(_MockHandler):
+    def do_POST(self):
+        mock = self.mock
+        mock.request_count += 1
+        body = self._read_json() or {}
+        if mock.latency:
+            time.sleep(mock.latency)
+
+        path = urlparse(self.path).path
+        if path == "/" and body.get("method") == "login":
+            params = body.get("params", {})
+            if params.get("username") != mock.username or params.get("password") != mock.password_hash:
+                self._send_json(200, {"error_code": -40401})
+                return
+            token = uuid.uuid4().hex
+            mock.tokens.add(token)
+            self._send_json(200, {"error_code": 0, "result": {"stok": token}})
+            return
+
+        match = re.match(r"^/stok=([^/]+)/ds$", path)
+        if not match or match.group(1) not in mock.tokens:
+            self._send_json(200, {"error_code": -40401})
+            return
+
+        requests = body.get("params", {}).get("requests", [])
+        self._send_json(200, {"error_code": 0, "result": {
+            "responses": [run_method(mock.camera, request) for request in requests]
+        }})
+
+
+class MockRtspCamera:
+    """
+    Stand-in for a camera's RTSP server, for testing stream probing.
+
+    Answers OPTIONS, and DESCRIBE with Digest auth: 200 with a small SDP
+    for the paths it serves, 404 for others, 401 for bad credentials.
+    Point an RtspProber at it with its port.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, username="admin", password="password",
+                 paths=("/stream1", "/stream2"), latency=0.0):
+        self.username = username
+        self.password = password
+        self.paths = set(paths)
+        self.latency = latency
+        self.realm = "Mock Tapo Camera"
+        self.nonce = uuid.uuid4().hex
+        self.request_count = 0
+
+        rtsp = self
+
+        class Handler(_RtspHandler):
+            mock = rtsp
+
+        self.server = _RtspServer((host, port), Handler)
+
+    @property
+    def ip(self):
+        return self.server.server_address[0]
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def check_authorization(self, header, method, uri):
+        if not header.startswith("Digest "):
+            return False
+        fields = dict(re.findall(r'(\w+)="([^"]*)"', header))
+        md5 = lambda text: hashlib.md5(text.encode()).hexdigest()
+        ha1 = md5(f"{self.username}:{self.realm}:{self.password}")
+        expected = md5(f"{ha1}:{self.nonce}:{md5(f'{method}:{uri}')}")
+        return fields.get("username") == self.username and fields.get("response") == expected
+
+
+class _RtspServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 256
+
+
+class _RtspHandler(socketserver.StreamRequestHandler):
+    mock = None  # MockRtspCamera, set by subclasses
+
+    def _reply(self, status, reason, cseq, headers=None, body=""):
+        lines = [f"RTSP/1.0 {status} {reason}", f"CSeq: {cseq}"]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        if body:
+            lines.append(f"Content-Length: {len(body)}")
+        self.wfile.write(("\r\n".join(lines) + "\r\n\r\n" + body).encode())
+
+    def handle(self):
+        mock = self.mock
+        while True:
+            request_line = self.rfile.readline().decode("latin-1").strip()
+            if not request_line:
+                return
+            headers = {}
+            while True:
+                line = self.rfile.readline().decode("latin-1").strip()
+                if not line:
+                    break
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            mock.request_count += 1
+            if mock.latency:
+                time.sleep(mock.latency)
+            method, uri = (request_line.split(" ") + [""])[:2]
+            cseq = headers.get("cseq", "0")
+
+            if method == "OPTIONS":
+                self._reply(200, "OK", cseq, {"Public": "OPTIONS, DESCRIBE, SETUP, PLAY, TEARDOWN"})
+            elif method != "DESCRIBE":
+                self._reply(405, "Method Not Allowed", cseq)
+            elif not mock.check_authorization(headers.get("authorization", ""), method, uri):
+                self._reply(401, "Unauthorized", cseq, {
+                    "WWW-Authenticate": f'Digest realm="{mock.realm}", nonce="{mock.nonce}"'
+                })
+            elif urlparse(uri).path not in mock.paths:
+                self._reply(404, "Stream Not Found", cseq)
+            else:
+                sdp = "v=0\r\no=- 0 0 IN IP4 0.0.0.0\r\ns=Mock\r\nm=video 0 RTP/AVP 96\r\n"
+                self._reply(200, "OK", cseq, {"Content-Type": "application/sdp"}, sdp)
+
+
+def run_method(camera, request):
+    method = request.get("method")
+    try:
+        error_code, result = camera.handle(method, request.get("params", {}))
+    except (KeyError, TypeError, ValueError):
+        error_code, result = -40209, {}
+    return {"method": method, "result": result, "error_code": error_code}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Tapo cloud API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--fleet-size", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random delay in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests failing with 500")
+    parser.add_argument("--no-total", action="store_true", help="omit 'total' from thing-order pages")
+    args = parser.parse_args()
+
+    mock = MockTapoCloud(args.host, args.port, args.fleet_size, args.latency, args.jitter,
+                         args.error_rate, include_total=not args.no_total)
+    print(f"Mock Tapo cloud with {args.fleet_size} cameras listening on {mock.base_url}")
+    try:
+        mock.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        mock.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
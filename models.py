@@ -0,0 +1,77 @@
+import json
+from dataclasses import dataclass, fields
+
+# Use orjson when it is installed, it decodes cloud responses several times faster
+try:
+    import orjson
+
+    def loads(data):
+        return orjson.loads(data)
+except ImportError:
+    def loads(data):
+        return json.loads(data)
+
+
+@dataclass(slots=True)
+class MethodResponse:
+    """Result of one method inside a multipleRequest passthrough call"""
+    method: str
+    error_code: int
+    result: dict
+
+    @property
+    def ok(self):
+        return self.error_code == 0
+
+
+@dataclass(slots=True)
+class Preset:
+    id: str
+    name: str
+
+
+@dataclass(slots=True)
+class DeviceDetails:
+    device_id: str = None
+    name: str = None
+    device_name: str = None
+    longitude: float = None
+    latitude: float = None
+    private_ip: str = None
+    public_ip: str = None
+    privacy_enabled: bool = None  # lens mask on, None if unknown
+
+    def to_dict(self):
+        return {f.name: getattr(self, f.name) for f in fields(self)}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build from a dict, ignoring unknown keys (e.g. from an older cache file)"""
+        known = {f.name for f in fields(cls)}
+        return cls(**{key: value for key, value in data.items() if key in known})
+
+
+def parse_method_responses(body):
+    """
+    Decode a passthrough response body into MethodResponse objects.
+
+    :param body: bytes/str JSON or an already decoded dict
+    :return: list of MethodResponse in request order, empty if the body is malformed
+    """
+    if isinstance(body, (bytes, str)):
+        body = loads(body)
+
+    try:
+        responses = body["outputParams"]["responseData"]["result"]["responses"]
+    except (KeyError, TypeError):
+        return []
+
+    return to_method_responses(responses)
+
+
+def to_method_responses(responses):
+    """Wrap raw per-method response dicts (cloud or LAN) in MethodResponse objects"""
+    return [
+        MethodResponse(r.get("method"), r.get("error_code", -1), r.get("result") or {})
+        for r in responses
+    ]
@@ -0,0 +1,86 @@
+import os
+import threading
+import time
+from api import get_presets
+from rate_limiter import NORMAL, BACKGROUND
+from state_db import get_state_db
+
+# Cached presets younger than this are shown without asking the cloud again
+PRESET_CACHE_TTL = int(os.getenv("PRESET_CACHE_TTL", "600"))
+# Keep presets across restarts when enabled in .env
+PRESET_CACHE_PERSIST = os.getenv("PRESET_CACHE_PERSIST", "0") == "1"
+# Pause between background prefetch requests so interactive calls go first
+PREFETCH_DELAY = 0.5
+
+_cache = {}  # device_id -> {"presets": {...}, "fetched_at": float}
+_lock = threading.Lock()
+
+
+def get_cached_presets(device_id):
+    """
+    Return (presets, is_fresh) for a device, or (None, False) if nothing is cached.
+    Stale entries are still returned so the UI can show them while refreshing.
+    """
+    with _lock:
+        entry = _cache.get(device_id)
+        if entry is None and PRESET_CACHE_PERSIST:
+            stored = get_state_db().get_presets(device_id)
+            if stored:
+                entry = {"presets": stored[0], "fetched_at": stored[1]}
+                _cache[device_id] = entry
+    if not entry:
+        return None, False
+    return entry["presets"], time.time() - entry["fetched_at"] <= PRESET_CACHE_TTL
+
+
+def store_presets(device_id, presets):
+    fetched_at = time.time()
+    with _lock:
+        _cache[device_id] = {"presets": presets, "fetched_at": fetched_at}
+    if PRESET_CACHE_PERSIST:
+        get_state_db().set_presets(device_id, presets, fetched_at)
+
+
+def invalidate_presets(device_id=None):
+    """Forget cached presets for one device, or for all devices if device_id is None"""
+    with _lock:
+        if device_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(device_id, None)
+    if PRESET_CACHE_PERSIST:
+        get_state_db().delete_presets(device_id)
+
+
+def fetch_presets(device_id, priority=NORMAL):
+    """Fetch presets from the cloud and cache them, returns None on failure"""
+    presets = get_presets(device_id, priority=priority)
+    if presets is not None:
+        store_presets(device_id, presets)
+    return presets
+
+
+def prefetch_presets(device_ids, on_update=None):
+    """
+    Fetch presets for every device without a fresh cache entry, one at a time in
+    a background thread.
+
+    :param on_update: callable(device_id, presets) - called after each successful fetch
+    """
+    def worker():
+        for device_id in list(device_ids):
+            _, is_fresh = get_cached_presets(device_id)
+            if is_fresh:
+                continue
+            try:
+                presets = fetch_presets(device_id, priority=BACKGROUND)
+            except Exception as e:
+                print(f"Error prefetching presets for {device_id}: {e}")
+                continue
+            if presets is not None and on_update:
+                on_update(device_id, presets)
+            time.sleep(PREFETCH_DELAY)
+
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+    return thread
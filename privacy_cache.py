@@ -0,0 +1,29 @@
+import threading
+import time
+
+_states = {}  # device_id -> {"enabled": bool, "updated_at": float}
+_lock = threading.Lock()
+
+
+def get_privacy_state(device_id):
+    """Return the last known privacy (lens mask) state of a device, or None if unknown"""
+    with _lock:
+        entry = _states.get(device_id)
+    return entry["enabled"] if entry else None
+
+
+def store_privacy_state(device_id, enabled):
+    """Remember a device's privacy state, ignores None (state not reported)"""
+    if not device_id or enabled is None:
+        return
+    with _lock:
+        _states[device_id] = {"enabled": enabled, "updated_at": time.time()}
+
+
+def invalidate_privacy_state(device_id=None):
+    """Forget the state of one device, or of all devices if device_id is None"""
+    with _lock:
+        if device_id is None:
+            _states.clear()
+        else:
+            _states.pop(device_id, None)
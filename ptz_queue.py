@@ -0,0 +1,92 @@
+import threading
+from api import move_camera_xy
+
+
+class PtzCommandQueue:
+    """
+    Coalescing motor-move queue for one camera.
+
+    Joystick clicks are summed into a pending (x, y) offset. Only one
+    motorMove is in flight at a time; whatever accumulates while it runs is
+    sent as a single combined move afterwards, so a burst of clicks costs at
+    most two cloud calls and can never arrive out of order.
+
+    Near the end of the camera's range a combined move can overshoot and be
+    refused as a whole; it is then resent one click-sized step at a time,
+    so the camera still moves as far as the clicks alone would have.
+    """
+
+    def __init__(self, device_id, send=move_camera_xy):
+        self.device_id = device_id
+        self.send = send
+        self.pending_x = 0
+        self.pending_y = 0
+        self.step_x = 0  # size of the last click on each axis
+        self.step_y = 0
+        self.in_flight = False
+        self._lock = threading.Lock()
+
+    def move(self, axis, value):
+        """Queue a move of value steps on axis ('x' or 'y')"""
+        with self._lock:
+            if axis == "x":
+                self.pending_x += value
+                self.step_x = abs(value)
+            else:
+                self.pending_y += value
+                self.step_y = abs(value)
+
+            if self.in_flight:
+                return
+            self.in_flight = True
+
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                x, y = self.pending_x, self.pending_y
+                step_x, step_y = self.step_x, self.step_y
+                self.pending_x = self.pending_y = 0
+                # Opposite clicks cancel out, nothing left to send
+                if x == 0 and y == 0:
+                    self.in_flight = False
+                    return
+
+            try:
+                result = self.send(self.device_id, x, y)
+                if result:
+                    print(f"Successfully moved camera by x={x}, y={y}")
+                elif abs(x) > step_x or abs(y) > step_y:
+                    # Possibly past the end of the range, go as far as single clicks would
+                    self._step(x, step_x, lambda value: (value, 0))
+                    self._step(y, step_y, lambda value: (0, value))
+                else:
+                    print(f"Failed to move camera by x={x}, y={y}")
+            except Exception as e:
+                print(f"Error moving camera: {e}")
+
+    def _step(self, total, step, offset):
+        """Send total as single steps until one fails; offset maps a step to (x, y)"""
+        sign = 1 if total > 0 else -1
+        remaining = abs(total)
+        while remaining > 0:
+            value = min(step, remaining)
+            if not self.send(self.device_id, *offset(sign * value)):
+                print(f"Camera stopped with {remaining} steps left")
+                return
+            remaining -= value
+
+
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+def get_ptz_queue(device_id):
+    """Return the shared PTZ queue for a device"""
+    with _queues_lock:
+        queue = _queues.get(device_id)
+        if queue is None:
+            queue = PtzCommandQueue(device_id)
+            _queues[device_id] = queue
+        return queue
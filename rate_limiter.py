@@ -0,0 +1,210 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+
+# Request priorities, lower goes first
+INTERACTIVE = 0  # PTZ, presets, privacy toggles the user is waiting on
+NORMAL = 1
+BACKGROUND = 2  # polling and prefetching
+
+PRIORITY_NAMES = {INTERACTIVE: "interactive", NORMAL: "normal", BACKGROUND: "background"}
+
+# Cloud request budget, tunable from .env (a rate of 0 disables that bucket)
+GLOBAL_RATE = float(os.getenv("RATE_LIMIT_GLOBAL", "10"))  # requests per second
+GLOBAL_BURST = float(os.getenv("RATE_LIMIT_GLOBAL_BURST", "20"))
+DEVICE_RATE = float(os.getenv("RATE_LIMIT_DEVICE", "4"))
+DEVICE_BURST = float(os.getenv("RATE_LIMIT_DEVICE_BURST", "8"))
+# Global tokens background requests must leave untouched, so a burst of
+# interactive commands never has to wait behind a refresh
+BACKGROUND_RESERVE = float(os.getenv("RATE_LIMIT_BACKGROUND_RESERVE", "5"))
+
+
+class TokenBucket:
+    """Classic token bucket: rate tokens per second, holding at most burst tokens"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def time_until(self, amount, now):
+        """Seconds until amount tokens are available (0 if they are now)"""
+        if self.rate <= 0:
+            return 0.0
+        self._refill(now)
+        amount = min(amount, self.burst)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, now):
+        if self.rate > 0:
+            self._refill(now)
+            self.tokens -= 1
+
+
+class RateLimiter:
+    """
+    Global + per-device token buckets shared by every cloud request.
+
+    Each request first waits for its own device bucket, so one throttled
+    camera never holds up the others. Requests whose device bucket is ready
+    are then served from the global bucket strictly by priority, then arrival
+    order, so an interactive command queued behind background refreshes goes
+    next. Background requests additionally leave BACKGROUND_RESERVE global
+    tokens for interactive ones.
+    """
+
+    def __init__(self, global_rate=GLOBAL_RATE, global_burst=GLOBAL_BURST, device_rate=DEVICE_RATE,
+                 device_burst=DEVICE_BURST, background_reserve=BACKGROUND_RESERVE):
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.device_rate = device_rate
+        self.device_burst = device_burst
+        self.background_reserve = background_reserve
+        self._device_buckets = {}
+        self._cond = threading.Condition()
+        self._waiters = []  # heap of (priority, sequence, device_id)
+        self._sequence = itertools.count()
+        self._metrics = {
+            name: {"acquired": 0, "delayed": 0, "timed_out": 0, "total_delay": 0.0, "max_delay": 0.0}
+            for name in PRIORITY_NAMES.values()
+        }
+
+    def _device_bucket(self, device_id):
+        bucket = self._device_buckets.get(device_id)
+        if bucket is None:
+            bucket = TokenBucket(self.device_rate, self.device_burst)
+            self._device_buckets[device_id] = bucket
+        return bucket
+
+    def _global_wait(self, priority, now):
+        needed = 1 + (self.background_reserve if priority >= BACKGROUND else 0)
+        return self.global_bucket.time_until(needed, now)
+
+    def _device_wait(self, device_id, now):
+        if device_id is None or self.device_rate <= 0:
+            return 0.0
+        return self._device_bucket(device_id).time_until(1, now)
+
+    def _first_ready(self, now):
+        """The first waiter, by priority then arrival, not held back by its own device bucket"""
+        for ticket in sorted(self._waiters):
+            if self._device_wait(ticket[2], now) <= 0:
+                return ticket
+        return None
+
+    def _take(self, device_id, now):
+        self.global_bucket.take(now)
+        if device_id is not None and self.device_rate > 0:
+            self._device_bucket(device_id).take(now)
+
+    def _record(self, priority, delay, timed_out=False):
+        metrics = self._metrics[PRIORITY_NAMES.get(priority, "normal")]
+        if timed_out:
+            metrics["timed_out"] += 1
+            return
+        metrics["acquired"] += 1
+        if delay > 0.001:
+            metrics["delayed"] += 1
+            metrics["total_delay"] += delay
+            metrics["max_delay"] = max(metrics["max_delay"], delay)
+
+    def acquire(self, device_id=None, priority=NORMAL, timeout=None):
+        """
+        Block until a request for device_id may be sent.
+
+        :param device_id: str - device the request targets, None for account-wide calls
+        :param priority: int - INTERACTIVE, NORMAL or BACKGROUND
+        :param timeout: float - give up after this many seconds
+        :return: bool - False if timeout expired first
+        """
+        start = time.monotonic()
+        with self._cond:
+            ticket = (priority, next(self._sequence), device_id)
+            heapq.heappush(self._waiters, ticket)
+            self._cond.notify_all()  # a higher priority waiter may now be first
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = self._device_wait(device_id, now)
+                    if wait <= 0:
+                        # Only the global bucket is served in priority order
+                        wait = None
+                        if self._first_ready(now) == ticket:
+                            wait = self._global_wait(priority, now)
+                            if wait <= 0:
+                                self._take(device_id, now)
+                                self._record(priority, now - start)
+                                return True
+
+                    if timeout is not None:
+                        remaining = start + timeout - now
+                        if remaining <= 0:
+                            self._record(priority, 0, timed_out=True)
+                            return False
+                        wait = remaining if wait is None else min(wait, remaining)
+                    self._cond.wait(wait)
+            finally:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+    def try_acquire(self, device_id=None, priority=NORMAL, waited=0.0):
+        """
+        Non-blocking acquire for callers that wait on their own (e.g. asyncio).
+
+        :param waited: float - seconds the caller already spent retrying, for the metrics
+        :return: float - 0 if the request may be sent now, otherwise seconds to wait before retrying
+        """
+        with self._cond:
+            now = time.monotonic()
+            wait = self._device_wait(device_id, now)
+            if wait > 0:
+                return wait
+            first = self._first_ready(now)
+            if first is not None and first[0] <= priority:
+                # Blocked callers of the same or higher priority go first
+                return max(0.01, self._global_wait(priority, now))
+            wait = self._global_wait(priority, now)
+            if wait <= 0:
+                self._take(device_id, now)
+                self._record(priority, waited)
+            return wait
+
+    def metrics(self):
+        """Per-priority counters plus the number of requests waiting right now"""
+        with self._cond:
+            snapshot = {name: dict(values) for name, values in self._metrics.items()}
+            snapshot["queued"] = len(self._waiters)
+        return snapshot
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """Return the process-wide RateLimiter, creating it on first use"""
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = RateLimiter()
+    return _limiter
+
+
+def configure_rate_limiter(global_rate=GLOBAL_RATE, global_burst=GLOBAL_BURST, device_rate=DEVICE_RATE,
+                           device_burst=DEVICE_BURST, background_reserve=BACKGROUND_RESERVE):
+    """Replace the shared limiter with one using new limits (rate 0 disables a bucket)"""
+    global _limiter
+    with _limiter_lock:
+        _limiter = RateLimiter(global_rate, global_burst, device_rate, device_burst, background_reserve)
+    return _limiter
@@ -1,69 +1,43 @@
-import json
-import os
-
-RTSP_CONFIG_FILE = "rtsp_config.json"
+from urllib.parse import urlparse
+from rtsp_probe import get_rtsp_prober, DEFAULT_RTSP_PATH
+from state_db import get_state_db, DEFAULT_RTSP_CONFIG
 
 def load_rtsp_config():
-    """Load RTSP configuration from JSON file"""
-    if os.path.exists(RTSP_CONFIG_FILE):
-        try:
-            with open(RTSP_CONFIG_FILE, 'r') as f:
-                return json.load(f)
-        except:
-            return {}
-    return {}
+    """Load every device's RTSP configuration"""
+    return get_state_db().get_all_rtsp_configs()
 
 def save_rtsp_config(config):
-    """Save RTSP configuration to JSON file"""
-    with open(RTSP_CONFIG_FILE, 'w') as f:
-        json.dump(config, f, indent=2)
+    """Replace all RTSP configurations"""
+    db = get_state_db()
+    with db.transaction():
+        db.delete_rtsp_configs_except([])
+        for device_id, device_config in config.items():
+            db.set_rtsp_config(device_id, device_config)
+
+def rtsp_config_transaction():
+    """Group several RTSP config changes into a single commit"""
+    return get_state_db().transaction()
 
 def get_rtsp_config(device_id):
     """Get RTSP configuration for a specific device"""
-    config = load_rtsp_config()
-    return config.get(device_id, {
-        "username": "",
-        "password": "",
-        "ip_type": "private",  # private, public, or custom
-        "custom_ip": ""
-    })
+    return get_state_db().get_rtsp_config(device_id) or dict(DEFAULT_RTSP_CONFIG)
 
 def set_rtsp_config(device_id, username, password, ip_type, custom_ip=""):
     """Set RTSP configuration for a specific device"""
-    config = load_rtsp_config()
-    config[device_id] = {
+    get_state_db().set_rtsp_config(device_id, {
         "username": username,
         "password": password,
         "ip_type": ip_type,
         "custom_ip": custom_ip
-    }
-    save_rtsp_config(config)
+    })
 
 def cleanup_rtsp_config(valid_device_ids):
     """Remove RTSP configs for devices that are no longer in the device list"""
-    config = load_rtsp_config()
-    if not config:
-        return
-    
-    # Get list of device IDs to remove
-    config_device_ids = set(config.keys())
-    valid_device_ids_set = set(valid_device_ids)
-    removed_device_ids = config_device_ids - valid_device_ids_set
-    
-    # Remove configs for devices that no longer exist
-    if removed_device_ids:
-        for device_id in removed_device_ids:
-            del config[device_id]
-        save_rtsp_config(config)
+    get_state_db().delete_rtsp_configs_except(valid_device_ids)
 
 def delete_rtsp_config(device_id):
     """Delete RTSP configuration for a specific device"""
-    config = load_rtsp_config()
-    if device_id in config:
-        del config[device_id]
-        save_rtsp_config(config)
-        return True
-    return False
+    return get_state_db().delete_rtsp_config(device_id)
 
 def build_rtsp_url(device_id, device_details, rtsp_config):
     """Build RTSP URL from device details and RTSP config"""
@@ -85,35 +59,48 @@ def build_rtsp_url(device_id, device_details, rtsp_config):
     ip_type = rtsp_config.get("ip_type", "private")
     custom_ip = rtsp_config.get("custom_ip", "").strip()
     
-    # Determine IP address
+    # Determine candidate IP addresses, the configured one first
     if ip_type == "private":
-        ip = device_details.get("private_ip")
-        print(f"Using private IP: {ip}")
+        ips = [device_details.private_ip]
     elif ip_type == "public":
-        ip = device_details.get("public_ip")
-        print(f"Using public IP: {ip}")
+        ips = [device_details.public_ip]
+    elif ip_type == "auto":
+        # LAN addresses first, so they win a tie with the route over the internet
+        ips = [device_details.private_ip, custom_ip, device_details.public_ip]
     else:  # custom
-        ip = custom_ip
-        print(f"Using custom IP: {ip}")
-        # If custom IP is empty, fall back to private IP
-        if not ip:
-            print("Custom IP is empty, falling back to private IP")
-            ip = device_details.get("private_ip")
+        # If the custom IP does not answer (or is empty), fall back to the private IP
+        ips = [custom_ip, device_details.private_ip]
+    ips = [ip for ip in ips if ip]
+    print(f"Candidate IPs ({ip_type}): {ips}")
     
-    if not ip:
+    if not ips:
         print(f"No IP address found for type: {ip_type}")
         return None
     
-    # Standard RTSP URL format for Tapo cameras
-    # Try different common RTSP paths
-    # Most Tapo cameras use /stream1 or /stream2
-    rtsp_paths = ["/stream1", "/stream2", "/stream", "/h264"]
+    prober = get_rtsp_prober()
+    if ip_type == "auto":
+        # Whichever address accepts a connection first, remembered per network
+        ip = prober.select_ip(device_id, ips)
+        print(f"Auto selected IP: {ip}")
+        if ip:
+            ips = [ip]
     
-    # For now, use /stream1 as default (most common for Tapo)
-    # You can extend this to try multiple paths if needed
-    rtsp_path = "/stream1"
+    # Find which IP and stream path answer (cached per device after the first probe)
+    found = prober.find_stream(device_id, ips, username, password)
+    if found:
+        ip, rtsp_path = found
+    else:
+        # Nothing answered, let the player report the error for the preferred endpoint
+        print("No RTSP endpoint answered the probe, using the default path")
+        ip, rtsp_path = ips[0], DEFAULT_RTSP_PATH
     
-    rtsp_url = f"rtsp://{username}:{password}@{ip}:554{rtsp_path}"
-    print(f"Built RTSP URL: rtsp://{username}:***@{ip}:554{rtsp_path}")
+    rtsp_url = prober.url(ip, rtsp_path, username, password)
+    print(f"Built RTSP URL: rtsp://{username}:***@{ip}:{prober.port}{rtsp_path}")
     return rtsp_url
 
+
+def invalidate_rtsp_url(device_id, rtsp_url):
+    """Forget the probed endpoint behind rtsp_url after it failed to play"""
+    ip = urlparse(rtsp_url).hostname
+    if ip:
+        get_rtsp_prober().invalidate(device_id, ip)
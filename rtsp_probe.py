@@ -0,0 +1,311 @@
+import base64
+import errno
+import hashlib
+import os
+import re
+import selectors
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from single_flight import SingleFlight
+from state_db import get_state_db
+
+RTSP_PORT = int(os.getenv("RTSP_PORT", "554"))
+# Candidate stream paths, most preferred first (Tapo: stream1 is HD, stream2 SD)
+RTSP_PATHS = ["/stream1", "/stream2", "/stream", "/h264"]
+DEFAULT_RTSP_PATH = RTSP_PATHS[0]
+PROBE_TIMEOUT = float(os.getenv("RTSP_PROBE_TIMEOUT", "2"))
+USER_AGENT = "TapoControl"
+# Auto IP selection: head start each address gets before the next one is tried (RFC 8305)
+CONNECT_ATTEMPT_DELAY = float(os.getenv("RTSP_CONNECT_ATTEMPT_DELAY", "0.25"))
+CONNECT_TIMEOUT = float(os.getenv("RTSP_CONNECT_TIMEOUT", "2"))
+# Re-race after this long even if the remembered address still works
+AUTO_IP_MAX_AGE = float(os.getenv("RTSP_AUTO_IP_MAX_AGE", "86400"))
+
+_UNDECIDED = object()
+
+_AUTH_PARAM_RE = re.compile(r'(\w+)="?([^",]*)"?')
+
+
+def current_network():
+    """
+    Identify the network we are on by the local address used to reach the internet.
+
+    No packet is sent: connecting a UDP socket only picks a route.
+    """
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.connect(("8.8.8.8", 80))
+            return sock.getsockname()[0]
+    except OSError:
+        return "offline"
+
+
+def _start_connect(ip, port):
+    """Begin a non-blocking TCP connect, returns the socket or None if it failed outright"""
+    try:
+        family, socktype, proto, _, address = socket.getaddrinfo(ip, port, type=socket.SOCK_STREAM)[0]
+        sock = socket.socket(family, socktype, proto)
+    except OSError:
+        return None
+    sock.setblocking(False)
+    if sock.connect_ex(address) not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK, getattr(errno, "WSAEWOULDBLOCK", -1)):
+        sock.close()
+        return None
+    return sock
+
+
+def race_connect(ips, port, delay=CONNECT_ATTEMPT_DELAY, timeout=CONNECT_TIMEOUT):
+    """
+    Happy-eyeballs TCP connect (RFC 8305).
+
+    Connects to the first address, and to the next one whenever delay
+    seconds pass or an attempt fails, keeping earlier attempts running.
+    Returns the first address that accepts the connection, None if none do.
+    """
+    pending = list(dict.fromkeys(ip for ip in ips if ip))
+    selector = selectors.DefaultSelector()
+    next_start = time.monotonic()
+    try:
+        while pending or selector.get_map():
+            now = time.monotonic()
+            if pending and (now >= next_start or not selector.get_map()):
+                ip = pending.pop(0)
+                sock = _start_connect(ip, port)
+                if sock:
+                    selector.register(sock, selectors.EVENT_WRITE, (ip, now + timeout))
+                    next_start = now + delay
+                continue
+
+            deadlines = [key.data[1] for key in selector.get_map().values()]
+            wake = min(deadlines + ([next_start] if pending else []))
+            for key, _ in selector.select(max(0.0, wake - now)):
+                sock = key.fileobj
+                selector.unregister(sock)
+                if sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0:
+                    sock.close()
+                    return key.data[0]
+                sock.close()
+                next_start = time.monotonic()  # failed, start the next address now
+
+            now = time.monotonic()
+            for key in list(selector.get_map().values()):
+                if now >= key.data[1]:
+                    selector.unregister(key.fileobj)
+                    key.fileobj.close()
+        return None
+    finally:
+        for key in list(selector.get_map().values()):
+            key.fileobj.close()
+        selector.close()
+
+
+def _md5(text):
+    return hashlib.md5(text.encode()).hexdigest()
+
+
+def _read_response(sock):
+    """Read one RTSP response, returns (status code, {lower-case header: value})"""
+    data = b""
+    while b"\r\n\r\n" not in data:
+        chunk = sock.recv(4096)
+        if not chunk:
+            break
+        data += chunk
+    head, _, body = data.partition(b"\r\n\r\n")
+    head = head.decode("latin-1")
+    lines = head.split("\r\n")
+    parts = lines[0].split(" ", 2)
+    if len(parts) < 2 or not parts[0].startswith("RTSP/"):
+        raise ValueError(f"Not an RTSP response: {lines[0]!r}")
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    # Drain the body so the next request on this connection starts clean
+    remaining = int(headers.get("content-length") or 0) - len(body)
+    while remaining > 0:
+        chunk = sock.recv(min(remaining, 65536))
+        if not chunk:
+            break
+        remaining -= len(chunk)
+    return int(parts[1]), headers
+
+
+def _authorization(challenge, method, uri, username, password):
+    """Authorization header answering a WWW-Authenticate challenge (Digest or Basic)"""
+    scheme, _, params = challenge.partition(" ")
+    if scheme.lower() == "basic":
+        token = base64.b64encode(f"{username}:{password}".encode()).decode()
+        return f"Basic {token}"
+    fields = dict(_AUTH_PARAM_RE.findall(params))
+    realm = fields.get("realm", "")
+    nonce = fields.get("nonce", "")
+    response = _md5(f"{_md5(f'{username}:{realm}:{password}')}:{nonce}:{_md5(f'{method}:{uri}')}")
+    return (f'Digest username="{username}", realm="{realm}", nonce="{nonce}", '
+            f'uri="{uri}", response="{response}"')
+
+
+class RtspProber:
+    """
+    Finds a working RTSP endpoint (IP + stream path) for a camera.
+
+    Sends DESCRIBE for every candidate IP/path pair at once (OPTIONS is
+    answered for any path, DESCRIBE tells whether the stream exists and the
+    credentials work). The most preferred IP with a working stream wins,
+    using its most preferred path. Winners are cached per device in the state DB
+    until invalidate() reports that playback through them failed.
+    """
+
+    def __init__(self, port=RTSP_PORT, paths=RTSP_PATHS, timeout=PROBE_TIMEOUT):
+        self.port = port
+        self.paths = list(paths)
+        self.timeout = timeout
+        self._flights = SingleFlight()
+
+    def url(self, ip, path, username, password):
+        return f"rtsp://{username}:{password}@{ip}:{self.port}{path}"
+
+    def describe(self, ip, path, username, password):
+        """
+        DESCRIBE one stream, answering an auth challenge if there is one.
+
+        :return: int - final RTSP status code (200 means the stream is usable)
+        """
+        uri = f"rtsp://{ip}:{self.port}{path}"
+        with socket.create_connection((ip, self.port), timeout=self.timeout) as sock:
+            authorization = None
+            for cseq in (1, 2):
+                request = f"DESCRIBE {uri} RTSP/1.0\r\nCSeq: {cseq}\r\nAccept: application/sdp\r\nUser-Agent: {USER_AGENT}\r\n"
+                if authorization:
+                    request += f"Authorization: {authorization}\r\n"
+                sock.sendall((request + "\r\n").encode())
+                status, headers = _read_response(sock)
+                challenge = headers.get("www-authenticate")
+                if status != 401 or authorization or not challenge:
+                    return status
+                authorization = _authorization(challenge, "DESCRIBE", uri, username, password)
+        return status
+
+    def _try(self, ip, path, username, password):
+        try:
+            return self.describe(ip, path, username, password) == 200
+        except (OSError, ValueError):
+            return False
+
+    def probe(self, ips, username, password):
+        """
+        Probe every candidate concurrently.
+
+        Candidates are ranked: an IP only wins once every IP before it has
+        failed on all paths, however fast it answers, and on the winning IP
+        the most preferred working path is used.
+
+        :param ips: list - candidate IPs, most preferred first; duplicates and empty values are ignored
+        :return: (ip, path) of the winner, or None if nothing answered
+        """
+        ips = list(dict.fromkeys(ip for ip in ips if ip))
+        if not ips:
+            return None
+
+        results = {}  # (ip, path) -> True / False once probed
+
+        def decide():
+            """The winner, None if nothing works, or _UNDECIDED while a better candidate is pending"""
+            for ip in ips:
+                for path in self.paths:
+                    ok = results.get((ip, path))
+                    if ok is None:
+                        return _UNDECIDED
+                    if ok:
+                        return ip, path
+            return None
+
+        executor = ThreadPoolExecutor(max_workers=len(ips) * len(self.paths))
+        try:
+            futures = {
+                executor.submit(self._try, ip, path, username, password): (ip, path)
+                for ip in ips for path in self.paths
+            }
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+                winner = decide()
+                if winner is not _UNDECIDED:
+                    return winner
+            return None
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def cached(self, device_id, ips):
+        """Most recently found (ip, path) for device_id among ips, or None"""
+        paths = get_state_db().get_stream_paths(device_id)
+        known = [(discovered_at, ip, path) for ip, (path, discovered_at) in paths.items() if ip in ips]
+        if not known:
+            return None
+        _, ip, path = max(known)
+        return ip, path
+
+    def find_stream(self, device_id, ips, username, password):
+        """
+        Cached endpoint for device_id, probing for one on a cache miss.
+
+        Concurrent calls for the same device wait for a single probe.
+
+        :return: (ip, path) or None if no candidate answered
+        """
+        ips = [ip for ip in ips if ip]
+        hit = self.cached(device_id, ips)
+        if hit:
+            return hit
+        return self._flights.do((device_id, tuple(ips)), self._probe_and_store, device_id, ips, username, password)
+
+    def _probe_and_store(self, device_id, ips, username, password):
+        winner = self.probe(ips, username, password)
+        if winner:
+            get_state_db().set_stream_path(device_id, winner[0], winner[1], time.time())
+        return winner
+
+    def select_ip(self, device_id, ips):
+        """
+        Pick the address to stream device_id from on the current network.
+
+        Races TCP connects to the RTSP port (see race_connect), and remembers
+        the winner per network so the race runs again only after moving to
+        another network, after AUTO_IP_MAX_AGE, or after invalidate().
+
+        :param ips: list - candidate IPs, most preferred first
+        :return: str - the chosen IP, or None if none accepted a connection
+        """
+        ips = [ip for ip in ips if ip]
+        network = current_network()
+        db = get_state_db()
+        remembered = db.get_ip_choice(network, device_id)
+        if remembered and remembered[0] in ips and time.time() - remembered[1] < AUTO_IP_MAX_AGE:
+            return remembered[0]
+
+        ip = self._flights.do(("race", device_id, tuple(ips)), race_connect, ips, self.port)
+        if ip:
+            db.set_ip_choice(network, device_id, ip, time.time())
+        return ip
+
+    def invalidate(self, device_id, ip=None):
+        """Forget the cached endpoint(s) of device_id, e.g. after playback failed"""
+        db = get_state_db()
+        with db.transaction():
+            db.delete_stream_paths(device_id, ip)
+            db.delete_ip_choice(current_network(), device_id)
+
+
+_prober = None
+_prober_lock = threading.Lock()
+
+
+def get_rtsp_prober():
+    """Return the process-wide RtspProber, creating it on first use"""
+    global _prober
+    if _prober is None:
+        with _prober_lock:
+            if _prober is None:
+                _prober = RtspProber()
+    return _prober
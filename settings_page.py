@@ -1,8 +1,8 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 import os
-from dotenv import load_dotenv, set_key, find_dotenv
-from rtsp_config import load_rtsp_config, set_rtsp_config, get_rtsp_config, cleanup_rtsp_config, delete_rtsp_config
+from credentials import get_credential_provider
+from rtsp_config import load_rtsp_config, set_rtsp_config, get_rtsp_config, cleanup_rtsp_config, delete_rtsp_config, rtsp_config_transaction
 import sys
 
 def resource_path(relative_path):
@@ -174,11 +174,10 @@ class SettingsPage:
         input_container = tk.Frame(api_card, bg=self.bg_card)
         input_container.pack(fill=tk.X, padx=40, pady=(0, 30))
         
-        # Load .env file
-        dotenv_path = resource_path(".env")
-        load_dotenv(dotenv_path)
-        current_auth = os.getenv("Authorization", "")
-        current_x_term = os.getenv("X-Term-Id", "")
+        # Current credentials from .env
+        current_auth, current_x_term = get_credential_provider().get_credentials()
+        current_auth = current_auth or ""
+        current_x_term = current_x_term or ""
         
         # Authorization field
         auth_label = tk.Label(
@@ -265,8 +264,7 @@ class SettingsPage:
         # Filter devices to only include those with valid device_id
         valid_devices = []
         for device in devices:
-            device_id = device.get('device_id')
-            if device_id and isinstance(device, dict):
+            if device.device_id:
                 valid_devices.append(device)
         
         if not valid_devices:
@@ -290,11 +288,11 @@ class SettingsPage:
     
     def create_device_rtsp_config(self, parent, device):
         """Create RTSP configuration UI for a single device"""
-        device_id = device.get('device_id')
-        device_name = device.get('name', 'Unknown Camera')
-        device_model = device.get('device_name', 'Unknown Device')
-        private_ip = device.get('private_ip', 'N/A')
-        public_ip = device.get('public_ip', 'N/A')
+        device_id = device.device_id
+        device_name = device.name or 'Unknown Camera'
+        device_model = device.device_name or 'Unknown Device'
+        private_ip = device.private_ip or 'N/A'
+        public_ip = device.public_ip or 'N/A'
         
         # Device card
         device_card = tk.Frame(parent, bg="#252525", relief=tk.FLAT)
@@ -400,7 +398,7 @@ class SettingsPage:
         ip_type_combo = ttk.Combobox(
             input_container,
             textvariable=ip_type_var,
-            values=["private", "public", "custom"],
+            values=["private", "public", "custom", "auto"],
             state="readonly",
             font=("Segoe UI", 10),
             width=20
@@ -423,7 +421,7 @@ class SettingsPage:
                  selectforeground=[("readonly", self.text_primary)],
                  background=[("readonly", self.bg_input)])
         
-        # Custom IP field (only shown when custom is selected)
+        # Custom IP field (only shown for custom, and optional extra candidate for auto)
         custom_ip_label = tk.Label(
             input_container,
             text="Custom IP Address",
@@ -448,7 +446,7 @@ class SettingsPage:
         custom_ip_entry.insert(0, rtsp_config.get("custom_ip", ""))
         
         def toggle_custom_ip(*args):
-            if ip_type_var.get() == "custom":
+            if ip_type_var.get() in ("custom", "auto"):
                 custom_ip_label.pack(fill=tk.X, pady=(0, 5), after=ip_type_combo)
                 custom_ip_entry.pack(fill=tk.X, pady=(0, 15), ipady=10, ipadx=12, after=custom_ip_label)
             else:
@@ -506,7 +504,7 @@ class SettingsPage:
             return
         
         device = device_widgets.get('device')
-        device_name = device.get('name', 'Unknown Camera') if device else 'Unknown Camera'
+        device_name = (device.name if device else None) or 'Unknown Camera'
         
         result = messagebox.askyesno(
             "Confirm Deletion",
@@ -587,7 +585,7 @@ class SettingsPage:
         # Info label
         info_label = tk.Label(
             button_container,
-            text="Note: API credentials saved to .env, RTSP config saved to rtsp_config.json",
+            text="Note: API credentials saved to .env, RTSP config saved to tapo_state.db",
             font=("Segoe UI", 10),
             bg=self.bg_dark,
             fg=self.text_secondary
@@ -639,79 +637,73 @@ class SettingsPage:
             return
         
         try:
-            # Save API credentials
-            env_path = find_dotenv()
-            if not env_path:
-                env_path = os.path.join(os.getcwd(), ".env")
-                with open(env_path, "w") as f:
-                    f.write("")
-            
-            set_key(env_path, "Authorization", authorization)
-            set_key(env_path, "X-Term-Id", x_term_id)
-            load_dotenv(override=True)
+            # Save API credentials, clients holding state for the old ones are notified
+            get_credential_provider().save_credentials(authorization, x_term_id)
             
             # Get list of valid device IDs from current devices_data
             valid_device_ids = []
             if hasattr(self.main_app, 'devices_data') and self.main_app.devices_data:
                 for device in self.main_app.devices_data:
-                    device_id = device.get('device_id')
+                    device_id = device.device_id
                     if device_id:
                         valid_device_ids.append(device_id)
             
-            # Clean up RTSP configs for devices that no longer exist
-            cleanup_rtsp_config(valid_device_ids)
-            
-            # Save RTSP configurations only for valid devices
+            # Clean up and save every RTSP config in one commit
             rtsp_configs_saved = 0
-            for device_id, widgets in list(self.rtsp_widgets.items()):
-                # Only process devices that are in the current devices_data
-                if device_id not in valid_device_ids:
-                    continue
-                
-                try:
-                    # Check if widgets exist and are valid
-                    if not isinstance(widgets, dict):
+            with rtsp_config_transaction():
+                cleanup_rtsp_config(valid_device_ids)
+            
+                # Save RTSP configurations only for valid devices
+                for device_id, widgets in list(self.rtsp_widgets.items()):
+                    # Only process devices that are in the current devices_data
+                    if device_id not in valid_device_ids:
                         continue
+                
+                    try:
+                        # Check if widgets exist and are valid
+                        if not isinstance(widgets, dict):
+                            continue
                     
-                    if 'username' not in widgets or 'password' not in widgets:
-                        continue
+                        if 'username' not in widgets or 'password' not in widgets:
+                            continue
                     
-                    # Get widget references
-                    username_widget = widgets.get('username')
-                    password_widget = widgets.get('password')
-                    ip_type_var = widgets.get('ip_type')
-                    custom_ip_widget = widgets.get('custom_ip')
+                        # Get widget references
+                        username_widget = widgets.get('username')
+                        password_widget = widgets.get('password')
+                        ip_type_var = widgets.get('ip_type')
+                        custom_ip_widget = widgets.get('custom_ip')
                     
-                    # Check if widgets are valid before accessing
-                    if not self.is_widget_valid(username_widget):
-                        continue
-                    if not self.is_widget_valid(password_widget):
-                        continue
-                    if ip_type_var is None:
-                        continue
+                        # Check if widgets are valid before accessing
+                        if not self.is_widget_valid(username_widget):
+                            continue
+                        if not self.is_widget_valid(password_widget):
+                            continue
+                        if ip_type_var is None:
+                            continue
                     
-                    # Try to get widget values
-                    try:
-                        username = str(username_widget.get()).strip()
-                        password = str(password_widget.get()).strip()
-                        ip_type = str(ip_type_var.get())
-                        custom_ip = ""
+                        # Try to get widget values
+                        try:
+                            username = str(username_widget.get()).strip()
+                            password = str(password_widget.get()).strip()
+                            ip_type = str(ip_type_var.get())
+                            custom_ip = ""
                         
-                        if ip_type == "custom" and custom_ip_widget and self.is_widget_valid(custom_ip_widget):
-                            try:
-                                custom_ip = str(custom_ip_widget.get()).strip()
-                            except (tk.TclError, AttributeError):
-                                custom_ip = ""
+                            if ip_type in ("custom", "auto") and custom_ip_widget and self.is_widget_valid(custom_ip_widget):
+                                try:
+                                    custom_ip = str(custom_ip_widget.get()).strip()
+                                except (tk.TclError, AttributeError):
+                                    custom_ip = ""
                         
-                        set_rtsp_config(device_id, username, password, ip_type, custom_ip)
-                        rtsp_configs_saved += 1
-                    except (tk.TclError, AttributeError, KeyError, RuntimeError) as e:
-                        # Skip if widget was destroyed or invalid
+                            set_rtsp_config(device_id, username, password, ip_type, custom_ip)
+                            rtsp_configs_saved += 1
+                        except (tk.TclError, AttributeError, KeyError, RuntimeError) as e:
+                            # Skip if widget was destroyed or invalid
+                            continue
+                    except Exception as e:
+                        # Skip this device if there's any error
                         continue
-                except Exception as e:
-                    # Skip this device if there's any error
-                    continue
             
+
             messagebox.showinfo(
                 "Success",
                 f"Settings saved successfully!\nAPI credentials saved.\nRTSP configs saved: {rtsp_configs_saved}"
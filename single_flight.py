@@ -0,0 +1,52 @@
+import threading
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapses concurrent identical calls into one.
+
+    While a call for a key is running, other callers with the same key wait
+    for it and get the same result (or exception) instead of repeating the
+    request. Nothing is cached: the next call after it finishes runs again.
+    """
+
+    def __init__(self):
+        self._calls = {}  # key -> _Call in flight
+        self._lock = threading.Lock()
+        self.shared = 0  # calls answered by another caller's request
+
+    def do(self, key, func, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
@@ -0,0 +1,364 @@
+"""
+Local state database.
+
+Device details, RTSP configs, presets, JWTs, discovered stream paths and
+auto IP choices live in one SQLite file in WAL mode: lookups by device ID
+go through the primary key index, writes are crash-safe, and readers
+never block the writer. API credentials stay in .env.
+
+The schema is versioned with PRAGMA user_version. The first run imports
+the JSON files older versions used; those files are left on disk untouched.
+"""
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+STATE_DB_FILE = os.getenv("TAPO_STATE_DB", "tapo_state.db")
+
+# Files imported by the first migration
+LEGACY_RTSP_CONFIG_FILE = "rtsp_config.json"
+LEGACY_JWT_FILE = "device_jwts.json"
+LEGACY_DEVICE_CACHE_FILE = "device_cache.json"
+LEGACY_PRESET_CACHE_FILE = "preset_cache.json"
+
+DEFAULT_RTSP_CONFIG = {
+    "username": "",
+    "password": "",
+    "ip_type": "private",  # private, public, custom, or auto
+    "custom_ip": ""
+}
+
+
+def _read_legacy_json(path):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+            return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _import_legacy_files(conn):
+    """Copy the contents of the old JSON state files into the new tables"""
+    imported = []
+
+    rtsp = _read_legacy_json(LEGACY_RTSP_CONFIG_FILE)
+    for device_id, config in rtsp.items():
+        config = {**DEFAULT_RTSP_CONFIG, **config}
+        conn.execute(
+            "INSERT OR REPLACE INTO rtsp_configs (device_id, username, password, ip_type, custom_ip) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (device_id, config["username"], config["password"], config["ip_type"], config["custom_ip"])
+        )
+    if rtsp:
+        imported.append(LEGACY_RTSP_CONFIG_FILE)
+
+    tokens = _read_legacy_json(LEGACY_JWT_FILE)
+    for device_id, entry in tokens.items():
+        if entry.get("jwt"):
+            conn.execute(
+                "INSERT OR REPLACE INTO tokens (device_id, jwt, expires_at, refresh_at) VALUES (?, ?, ?, ?)",
+                (device_id, entry["jwt"], entry.get("expires_at", 0), entry.get("refresh_at"))
+            )
+    if tokens:
+        imported.append(LEGACY_JWT_FILE)
+
+    device_cache = _read_legacy_json(LEGACY_DEVICE_CACHE_FILE)
+    devices = device_cache.get("devices", {})
+    for position, device_id in enumerate(device_cache.get("order", [])):
+        entry = devices.get(device_id)
+        if entry:
+            conn.execute(
+                "INSERT OR REPLACE INTO devices (device_id, position, details, fetched_at) VALUES (?, ?, ?, ?)",
+                (device_id, position, json.dumps(entry.get("details", {})), entry.get("fetched_at", 0))
+            )
+    if devices:
+        imported.append(LEGACY_DEVICE_CACHE_FILE)
+
+    presets = _read_legacy_json(LEGACY_PRESET_CACHE_FILE)
+    for device_id, entry in presets.items():
+        conn.execute(
+            "INSERT OR REPLACE INTO presets (device_id, presets, fetched_at) VALUES (?, ?, ?)",
+            (device_id, json.dumps(entry.get("presets", {})), entry.get("fetched_at", 0))
+        )
+    if presets:
+        imported.append(LEGACY_PRESET_CACHE_FILE)
+
+    if imported:
+        print(f"Imported {', '.join(imported)} into {STATE_DB_FILE}")
+
+
+# (version, statements, optional callable(conn) run after the statements)
+MIGRATIONS = [
+    (1, [
+        """CREATE TABLE devices (
+            device_id TEXT PRIMARY KEY,
+            position INTEGER NOT NULL,
+            details TEXT NOT NULL,
+            fetched_at REAL NOT NULL
+        )""",
+        "CREATE INDEX devices_position ON devices (position)",
+        """CREATE TABLE rtsp_configs (
+            device_id TEXT PRIMARY KEY,
+            username TEXT NOT NULL DEFAULT '',
+            password TEXT NOT NULL DEFAULT '',
+            ip_type TEXT NOT NULL DEFAULT 'private',
+            custom_ip TEXT NOT NULL DEFAULT ''
+        )""",
+        """CREATE TABLE presets (
+            device_id TEXT PRIMARY KEY,
+            presets TEXT NOT NULL,
+            fetched_at REAL NOT NULL
+        )""",
+        """CREATE TABLE tokens (
+            device_id TEXT PRIMARY KEY,
+            jwt TEXT NOT NULL,
+            expires_at REAL NOT NULL,
+            refresh_at REAL
+        )""",
+        """CREATE TABLE stream_paths (
+            device_id TEXT NOT NULL,
+            ip TEXT NOT NULL,
+            path TEXT NOT NULL,
+            discovered_at REAL NOT NULL,
+            PRIMARY KEY (device_id, ip)
+        )""",
+    ], _import_legacy_files),
+    (2, [
+        """CREATE TABLE ip_choices (
+            network TEXT NOT NULL,
+            device_id TEXT NOT NULL,
+            ip TEXT NOT NULL,
+            chosen_at REAL NOT NULL,
+            PRIMARY KEY (network, device_id)
+        )""",
+    ], None),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+class StateDB:
+    """
+    Thread-safe access to the state database.
+
+    Each thread gets its own connection. Writes outside transaction() commit
+    on their own; inside it they are committed together (nested
+    transactions join the outermost one).
+    """
+
+    def __init__(self, path=STATE_DB_FILE):
+        self.path = path
+        self._local = threading.local()
+        self._migrate_lock = threading.Lock()
+        self._migrated = False
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode, transactions are started explicitly
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.depth = 0
+        if not self._migrated:
+            self._migrate(conn)
+        return conn
+
+    def _migrate(self, conn):
+        with self._migrate_lock:
+            if self._migrated:
+                return
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            for target, statements, upgrade in MIGRATIONS:
+                if target <= version:
+                    continue
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    for statement in statements:
+                        conn.execute(statement)
+                    if upgrade:
+                        upgrade(conn)
+                    conn.execute(f"PRAGMA user_version = {target}")
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+            self._migrated = True
+
+    @contextmanager
+    def transaction(self):
+        """Commit every write made inside the block at once, or none of them"""
+        conn = self._connection()
+        if self._local.depth:
+            self._local.depth += 1
+            try:
+                yield conn
+            finally:
+                self._local.depth -= 1
+            return
+
+        conn.execute("BEGIN IMMEDIATE")
+        self._local.depth = 1
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            self._local.depth = 0
+
+    def execute(self, sql, params=()):
+        return self._connection().execute(sql, params)
+
+    # Devices
+
+    def get_devices(self):
+        """Return [(device_id, details dict, fetched_at)] in account order"""
+        rows = self.execute("SELECT device_id, details, fetched_at FROM devices ORDER BY position").fetchall()
+        return [(row["device_id"], json.loads(row["details"]), row["fetched_at"]) for row in rows]
+
+    def get_device(self, device_id):
+        """Return (details dict, fetched_at) or None"""
+        row = self.execute("SELECT details, fetched_at FROM devices WHERE device_id = ?", (device_id,)).fetchone()
+        return (json.loads(row["details"]), row["fetched_at"]) if row else None
+
+    def update_devices(self, device_ids, details_by_id, fetched_at):
+        """
+        Store fresh details, set the account order and drop devices not in device_ids.
+
+        :param details_by_id: dict - {device_id: details dict} fetched just now
+        """
+        with self.transaction() as conn:
+            for device_id, details in details_by_id.items():
+                conn.execute(
+                    "INSERT INTO devices (device_id, position, details, fetched_at) VALUES (?, -1, ?, ?) "
+                    "ON CONFLICT (device_id) DO UPDATE SET details = excluded.details, fetched_at = excluded.fetched_at",
+                    (device_id, json.dumps(details), fetched_at)
+                )
+            conn.executemany("UPDATE devices SET position = ? WHERE device_id = ?",
+                             [(position, device_id) for position, device_id in enumerate(device_ids)])
+            conn.execute("DELETE FROM devices WHERE device_id NOT IN (SELECT value FROM json_each(?))",
+                         (json.dumps(list(device_ids)),))
+
+    # RTSP configs
+
+    def get_rtsp_config(self, device_id):
+        row = self.execute("SELECT username, password, ip_type, custom_ip FROM rtsp_configs WHERE device_id = ?",
+                           (device_id,)).fetchone()
+        return dict(row) if row else None
+
+    def get_all_rtsp_configs(self):
+        rows = self.execute("SELECT device_id, username, password, ip_type, custom_ip FROM rtsp_configs").fetchall()
+        return {row["device_id"]: {key: row[key] for key in DEFAULT_RTSP_CONFIG} for row in rows}
+
+    def set_rtsp_config(self, device_id, config):
+        config = {**DEFAULT_RTSP_CONFIG, **config}
+        self.execute(
+            "INSERT OR REPLACE INTO rtsp_configs (device_id, username, password, ip_type, custom_ip) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (device_id, config["username"], config["password"], config["ip_type"], config["custom_ip"])
+        )
+
+    def delete_rtsp_config(self, device_id):
+        """Return True if a config was deleted"""
+        return self.execute("DELETE FROM rtsp_configs WHERE device_id = ?", (device_id,)).rowcount > 0
+
+    def delete_rtsp_configs_except(self, device_ids):
+        return self.execute("DELETE FROM rtsp_configs WHERE device_id NOT IN (SELECT value FROM json_each(?))",
+                            (json.dumps(list(device_ids)),)).rowcount
+
+    # Presets
+
+    def get_presets(self, device_id):
+        """Return (presets dict, fetched_at) or None"""
+        row = self.execute("SELECT presets, fetched_at FROM presets WHERE device_id = ?", (device_id,)).fetchone()
+        return (json.loads(row["presets"]), row["fetched_at"]) if row else None
+
+    def set_presets(self, device_id, presets, fetched_at):
+        self.execute("INSERT OR REPLACE INTO presets (device_id, presets, fetched_at) VALUES (?, ?, ?)",
+                     (device_id, json.dumps(presets), fetched_at))
+
+    def delete_presets(self, device_id=None):
+        if device_id is None:
+            self.execute("DELETE FROM presets")
+        else:
+            self.execute("DELETE FROM presets WHERE device_id = ?", (device_id,))
+
+    # Tokens
+
+    def get_all_tokens(self):
+        rows = self.execute("SELECT device_id, jwt, expires_at, refresh_at FROM tokens").fetchall()
+        tokens = {}
+        for row in rows:
+            entry = {"jwt": row["jwt"], "expires_at": row["expires_at"]}
+            if row["refresh_at"] is not None:
+                entry["refresh_at"] = row["refresh_at"]
+            tokens[row["device_id"]] = entry
+        return tokens
+
+    def set_token(self, device_id, jwt, expires_at, refresh_at=None):
+        self.execute("INSERT OR REPLACE INTO tokens (device_id, jwt, expires_at, refresh_at) VALUES (?, ?, ?, ?)",
+                     (device_id, jwt, expires_at, refresh_at))
+
+    def delete_tokens(self):
+        self.execute("DELETE FROM tokens")
+
+    # Stream paths
+
+    def get_stream_paths(self, device_id):
+        """Return {ip: (path, discovered_at)}"""
+        rows = self.execute("SELECT ip, path, discovered_at FROM stream_paths WHERE device_id = ?",
+                            (device_id,)).fetchall()
+        return {row["ip"]: (row["path"], row["discovered_at"]) for row in rows}
+
+    def get_stream_path(self, device_id, ip):
+        row = self.execute("SELECT path FROM stream_paths WHERE device_id = ? AND ip = ?", (device_id, ip)).fetchone()
+        return row["path"] if row else None
+
+    def set_stream_path(self, device_id, ip, path, discovered_at):
+        self.execute("INSERT OR REPLACE INTO stream_paths (device_id, ip, path, discovered_at) VALUES (?, ?, ?, ?)",
+                     (device_id, ip, path, discovered_at))
+
+    def delete_stream_paths(self, device_id, ip=None):
+        if ip is None:
+            self.execute("DELETE FROM stream_paths WHERE device_id = ?", (device_id,))
+        else:
+            self.execute("DELETE FROM stream_paths WHERE device_id = ? AND ip = ?", (device_id, ip))
+
+
+    # Auto IP choices, per network the app runs on
+
+    def get_ip_choice(self, network, device_id):
+        """Return (ip, chosen_at) or None"""
+        row = self.execute("SELECT ip, chosen_at FROM ip_choices WHERE network = ? AND device_id = ?",
+                           (network, device_id)).fetchone()
+        return (row["ip"], row["chosen_at"]) if row else None
+
+    def set_ip_choice(self, network, device_id, ip, chosen_at):
+        self.execute("INSERT OR REPLACE INTO ip_choices (network, device_id, ip, chosen_at) VALUES (?, ?, ?, ?)",
+                     (network, device_id, ip, chosen_at))
+
+    def delete_ip_choice(self, network, device_id):
+        self.execute("DELETE FROM ip_choices WHERE network = ? AND device_id = ?", (network, device_id))
+
+
+_db = None
+_db_lock = threading.Lock()
+
+
+def get_state_db():
+    """Return the process-wide StateDB, creating it on first use"""
+    global _db
+    if _db is None:
+        with _db_lock:
+            if _db is None:
+                _db = StateDB()
+    return _db
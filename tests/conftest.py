@@ -0,0 +1,38 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep the tests away from the real state database; must be set before state_db is imported
+os.environ["TAPO_STATE_DB"] = os.path.join(tempfile.mkdtemp(prefix="tapo-tests-"), "state.db")
+
+
+@pytest.fixture(autouse=True)
+def fresh_shared_state():
+    """Unlimited rate limiter and closed circuits for every test"""
+    import http_client
+    from rate_limiter import configure_rate_limiter
+
+    http_client._breakers.clear()
+    configure_rate_limiter(global_rate=0, device_rate=0)
+    yield
+    http_client._breakers.clear()
+
+
+@pytest.fixture
+def cloud():
+    """A running MockTapoCloud with the API pointed at it"""
+    import api
+    import jwt_helper
+    from credentials import get_credential_provider
+    from mock_cloud import MockTapoCloud
+
+    get_credential_provider().set_credentials("test-token", "test-term")
+    mock = MockTapoCloud(fleet_size=5).start()
+    api.set_base_urls(mock.base_url, mock.base_url)
+    jwt_helper.set_security_server_url(mock.base_url)
+    yield mock
+    mock.stop()
@@ -0,0 +1,75 @@
+import asyncio
+
+import api
+from api_async import AsyncTapoClient
+from privacy_cache import get_privacy_state
+
+
+def test_device_details(cloud):
+    device_id = next(iter(cloud.cameras))
+    camera = cloud.cameras[device_id]
+
+    details = api.get_device_details(device_id)
+
+    assert details.name == camera.alias
+    assert details.device_name == camera.model
+    assert details.private_ip == camera.private_ip
+    assert details.public_ip == camera.public_ip
+    assert details.privacy_enabled is False
+
+
+def test_batched_methods_are_demultiplexed(cloud):
+    device_id = next(iter(cloud.cameras))
+    requests = api.PRESET_REQUESTS + [{"method": "noSuchMethod", "params": {}}]
+
+    responses = api.call_methods(device_id, requests)
+
+    assert [r.method for r in responses] == [r["method"] for r in requests]
+    assert [r.ok for r in responses] == [True, True, False]
+    assert cloud.request_count == 1
+
+
+def test_presets_and_preset_moves(cloud):
+    device_id = next(iter(cloud.cameras))
+
+    assert api.get_presets(device_id) == {"1": "Preset 1", "2": "Preset 2", "3": "Preset 3"}
+    assert api.move_to_preset(device_id, "2") is not None
+    assert api.move_to_preset(device_id, "9") is None
+
+
+def test_camera_moves_stop_at_the_end_of_range(cloud):
+    device_id = next(iter(cloud.cameras))
+
+    assert api.move_camera_xy(device_id, 100, 10) is not None
+    assert api.move_camera_xy(device_id, 100, 0) is None
+    assert (cloud.cameras[device_id].x, cloud.cameras[device_id].y) == (100, 10)
+
+
+def test_privacy_toggle_updates_camera_and_cache(cloud):
+    device_id = next(iter(cloud.cameras))
+
+    assert api.toggle_privacy_mode(device_id, True)
+    assert cloud.cameras[device_id].lens_mask == "on"
+    assert get_privacy_state(device_id) is True
+
+
+def test_unknown_device_fails_cleanly(cloud):
+    assert api.get_device_details("F" * 40) is None
+
+
+def test_async_client_matches_sync(cloud):
+    device_ids = list(cloud.cameras)
+
+    async def run():
+        async with AsyncTapoClient() as client:
+            details = await client.get_many_device_details(device_ids)
+            presets = await client.get_presets(device_ids[0])
+            toggled = await client.toggle_privacy_mode(device_ids[0], True)
+            return details, presets, toggled
+
+    details, presets, toggled = asyncio.run(run())
+
+    assert [d.device_id for d in details] == device_ids
+    assert [d.name for d in details] == [api.get_device_details(device_id).name for device_id in device_ids]
+    assert presets == api.get_presets(device_ids[0])
+    assert toggled and cloud.cameras[device_ids[0]].lens_mask == "on"
@@ -0,0 +1,28 @@
+import time
+
+from device_fetcher import fetch_all_device_details
+
+
+def test_details_come_back_in_device_order(cloud):
+    device_ids = list(reversed(cloud.cameras))
+
+    details = fetch_all_device_details(device_ids, max_in_flight=2)
+
+    assert [d.device_id for d in details] == device_ids
+
+
+def test_timeout_covers_retries(cloud):
+    cloud.latency = 2.0
+
+    start = time.monotonic()
+    assert fetch_all_device_details(list(cloud.cameras)[:1], timeout=0.5) == []
+    assert time.monotonic() - start < 1.5
+    assert cloud.request_count == 1
+
+
+def test_retries_still_happen_within_the_timeout(cloud):
+    cloud.retry_after = "0"
+    cloud.throttled = 1
+
+    assert len(fetch_all_device_details(list(cloud.cameras)[:1], timeout=5)) == 1
+    assert cloud.request_count == 2
@@ -0,0 +1,125 @@
+import threading
+import time
+
+import pytest
+
+import device_poller
+from device_poller import DevicePoller, _DeviceState
+from models import DeviceDetails
+
+
+@pytest.fixture(autouse=True)
+def no_jitter(monkeypatch):
+    monkeypatch.setattr(device_poller.random, "uniform", lambda low, high: 1.0)
+
+
+class FakeFetch:
+    """Serves details per device and records when each device was polled"""
+
+    def __init__(self, devices):
+        self.details = {device.device_id: device for device in devices}
+        self.polls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, device_id):
+        with self._lock:
+            self.polls.append((time.monotonic(), device_id))
+        return self.details.get(device_id)
+
+    def count(self, device_id):
+        return sum(1 for _, polled in self.polls if polled == device_id)
+
+
+def devices(*device_ids):
+    return [DeviceDetails(device_id, name=f"Camera {device_id}", privacy_enabled=False) for device_id in device_ids]
+
+
+def run_for(poller, seconds):
+    poller.start()
+    time.sleep(seconds)
+    poller.stop()
+    poller._thread.join(1)
+
+
+def test_interval_depends_on_selection_status_and_failures():
+    poller = DevicePoller(fetch=lambda device_id: None)
+    poller.selected_id = "selected"
+
+    assert poller.interval_for("selected", _DeviceState()) == device_poller.SELECTED_INTERVAL
+    assert poller.interval_for("idle", _DeviceState()) == device_poller.IDLE_INTERVAL
+    assert poller.interval_for("selected", _DeviceState(online=False)) == device_poller.OFFLINE_INTERVAL
+    assert poller.interval_for("idle", _DeviceState(failures=1)) == 2 * device_poller.IDLE_INTERVAL
+    assert poller.interval_for("idle", _DeviceState(failures=10)) == device_poller.MAX_BACKOFF
+
+
+def test_only_changed_fields_are_reported():
+    changes = []
+    fetch = FakeFetch(devices("a"))
+    poller = DevicePoller(on_change=lambda *change: changes.append(change), fetch=fetch)
+    poller.set_devices(devices("a"))
+
+    poller.poll("a")
+    assert changes == []
+
+    fetch.details["a"] = DeviceDetails("a", name="Camera a", privacy_enabled=True)
+    poller.poll("a")
+    assert changes == [("a", fetch.details["a"], {"privacy_enabled": True})]
+
+
+def test_device_goes_offline_after_consecutive_failures_and_comes_back():
+    statuses = []
+    fetch = FakeFetch([])
+    poller = DevicePoller(on_status=lambda *status: statuses.append(status), fetch=fetch)
+    poller.set_devices(devices("a"))
+
+    for _ in range(device_poller.OFFLINE_AFTER - 1):
+        poller.poll("a")
+    assert statuses == []
+    poller.poll("a")
+    assert statuses == [("a", False)]
+    assert not poller._states["a"].online
+
+    poller.poll("a")  # still offline, not reported again
+    fetch.details["a"] = devices("a")[0]
+    poller.poll("a")
+    assert statuses == [("a", False), ("a", True)]
+    assert poller._states["a"].failures == 0
+
+
+def test_failed_poll_backs_off():
+    poller = DevicePoller(fetch=FakeFetch([]))
+    poller.set_devices(devices("a"))
+
+    start = time.monotonic()
+    poller.poll("a")
+    assert poller._states["a"].due - start >= 2 * device_poller.IDLE_INTERVAL
+
+
+def test_selected_device_is_polled_more_often(monkeypatch):
+    monkeypatch.setattr(device_poller, "SELECTED_INTERVAL", 0.05)
+    monkeypatch.setattr(device_poller, "IDLE_INTERVAL", 0.5)
+    fetch = FakeFetch(devices("selected", "idle"))
+    poller = DevicePoller(fetch=fetch, budget_per_minute=0)
+    poller.set_devices(devices("selected", "idle"))
+    poller.set_selected("selected")
+
+    run_for(poller, 0.8)
+
+    assert fetch.count("idle") == 1
+    assert fetch.count("selected") >= 10
+
+
+def test_polls_stay_within_the_budget(monkeypatch):
+    monkeypatch.setattr(device_poller, "IDLE_INTERVAL", 0.01)
+    fleet = devices(*"abcdefghij")
+    fetch = FakeFetch(fleet)
+    poller = DevicePoller(fetch=fetch, budget_per_minute=600)  # one poll per 0.1 s
+    poller.set_devices(fleet)
+
+    run_for(poller, 0.75)
+
+    times = [polled_at for polled_at, _ in fetch.polls]
+    assert 5 <= len(times) <= 8
+    assert min(later - earlier for earlier, later in zip(times, times[1:])) >= 0.099
+    # Every device gets its turn before any is polled twice
+    assert len({device_id for _, device_id in fetch.polls[:5]}) == 5
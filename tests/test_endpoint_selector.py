@@ -0,0 +1,45 @@
+import pytest
+
+import api
+from endpoint_selector import EndpointSelector
+from http_client import CircuitBreaker, get_circuit_breaker
+from mock_cloud import MockTapoCloud
+
+
+@pytest.fixture
+def foreign_cloud():
+    """A fast host that answers but knows none of our devices"""
+    mock = MockTapoCloud(fleet_size=0).start()
+    yield mock
+    mock.stop()
+
+
+def test_host_rejecting_passthrough_calls_is_avoided(cloud, foreign_cloud, monkeypatch):
+    monkeypatch.setattr(api, "LATENCY_ROUTING", True)
+    cloud.latency = 0.05
+    api.set_base_urls(cloud.base_url, foreign_cloud.base_url)
+    assert api.endpoint_selector.evaluate() == foreign_cloud.base_url
+
+    device_id = next(iter(cloud.cameras))
+    assert api.get_device_details(device_id) is None  # 404 from the foreign host
+    assert api.get_device_details(device_id).name == "Camera 1"
+
+    # Still the fastest, but it must not be picked again
+    assert api.endpoint_selector.evaluate() == cloud.base_url
+    assert api.endpoint_selector.best() == cloud.base_url
+
+
+@pytest.mark.parametrize("state", [CircuitBreaker.OPEN, CircuitBreaker.HALF_OPEN])
+def test_best_skips_hosts_whose_circuit_is_not_closed(state):
+    selector = EndpointSelector(["http://first.test", "http://second.test"])
+    get_circuit_breaker("http://first.test").state = state
+
+    assert selector.best() == "http://second.test"
+
+
+def test_best_falls_back_to_default_when_nothing_is_usable():
+    selector = EndpointSelector(["http://first.test", "http://second.test"])
+    selector.report_rejected("http://first.test/v1/things/dev/services-sync")
+    get_circuit_breaker("http://second.test").state = CircuitBreaker.OPEN
+
+    assert selector.best() == "http://first.test"
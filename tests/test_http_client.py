@@ -0,0 +1,186 @@
+import asyncio
+import time
+
+import aiohttp
+import pytest
+import requests
+
+import api
+from api_async import AsyncTapoClient
+from http_client import CircuitBreaker, HttpClient, get_circuit_breaker, retry_after
+from rate_limiter import configure_rate_limiter
+
+URL = "http://breaker.test/v1/things/dev/services-sync"
+
+
+def cool_down(breaker):
+    """Open the circuit with its reset timeout already over"""
+    breaker.state = CircuitBreaker.OPEN
+    breaker.opened_at = time.monotonic() - breaker.reset_timeout - 1
+    return breaker
+
+
+class BrokenSession:
+    def __init__(self, error=requests.exceptions.ChunkedEncodingError("connection broken mid-body")):
+        self.error = error
+
+    def request(self, method, url, **kwargs):
+        raise self.error
+
+
+class BrokenAsyncResponse:
+    async def __aenter__(self):
+        raise aiohttp.ClientPayloadError("connection broken mid-body")
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+
+class BrokenAsyncSession:
+    def request(self, method, url, **kwargs):
+        return BrokenAsyncResponse()
+
+    async def close(self):
+        pass
+
+
+def test_circuit_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+
+def test_half_open_probe_success_closes_circuit():
+    breaker = cool_down(CircuitBreaker())
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()  # only one probe
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_unexpected_error_in_half_open_probe_reopens_circuit():
+    client = HttpClient()
+    client._session = BrokenSession()
+    breaker = cool_down(get_circuit_breaker(URL))
+
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        client.get(URL)
+
+    assert breaker.state == CircuitBreaker.OPEN
+    cool_down(breaker)
+    assert breaker.allow()
+
+
+def test_async_unexpected_error_in_half_open_probe_reopens_circuit(cloud):
+    device_id = next(iter(cloud.cameras))
+    breaker = cool_down(get_circuit_breaker(api.passthrough_url(device_id)))
+
+    async def run():
+        client = AsyncTapoClient()
+        client._session = BrokenAsyncSession()
+        with pytest.raises(aiohttp.ClientPayloadError):
+            await client.call_methods(device_id, api.DEVICE_DETAILS_REQUESTS)
+
+    asyncio.run(run())
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_unexpected_error_on_closed_circuit_is_not_a_host_failure():
+    client = HttpClient()
+    client._session = BrokenSession()
+
+    for _ in range(CircuitBreaker().failure_threshold):
+        with pytest.raises(requests.exceptions.ChunkedEncodingError):
+            client.get(URL)
+
+    assert get_circuit_breaker(URL).state == CircuitBreaker.CLOSED
+    assert get_circuit_breaker(URL).failures == 0
+
+
+def test_interrupted_probe_lets_the_next_request_probe():
+    client = HttpClient()
+    client._session = BrokenSession(KeyboardInterrupt())
+    breaker = cool_down(get_circuit_breaker(URL))
+
+    with pytest.raises(KeyboardInterrupt):
+        client.get(URL)
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.failures == 0
+    assert breaker.allow()
+
+
+def test_cancelled_async_calls_do_not_open_circuit(cloud):
+    device_id = next(iter(cloud.cameras))
+    cloud.latency = 1.0
+
+    async def run():
+        async with AsyncTapoClient() as client:
+            tasks = [asyncio.ensure_future(client.call_methods(device_id, api.DEVICE_DETAILS_REQUESTS))
+                     for _ in range(CircuitBreaker().failure_threshold)]
+            await asyncio.sleep(0.2)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(client.call_methods(device_id, api.DEVICE_DETAILS_REQUESTS), 0.2)
+
+    asyncio.run(run())
+    breaker = get_circuit_breaker(cloud.base_url)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.failures == 0
+    cloud.latency = 0
+    assert api.get_device_details(device_id).name == "Camera 1"
+
+
+def test_throttling_does_not_open_circuit(cloud):
+    device_id = next(iter(cloud.cameras))
+    cloud.retry_after = "0"
+    cloud.throttled = 6  # more 429s in a row than the failure threshold
+
+    assert api.get_device_details(device_id) is None
+    assert api.get_device_details(device_id) is None
+    assert get_circuit_breaker(cloud.base_url).state == CircuitBreaker.CLOSED
+    assert api.get_device_details(device_id).name == "Camera 1"
+
+
+def test_throttled_retries_go_through_rate_limiter(cloud):
+    device_id = next(iter(cloud.cameras))
+    limiter = configure_rate_limiter(global_rate=0, device_rate=0)
+    cloud.retry_after = "0"
+    cloud.throttled = 2
+
+    assert api.get_device_details(device_id).name == "Camera 1"
+    assert limiter.metrics()["normal"]["acquired"] == 3
+
+
+def test_retry_after_is_respected(cloud):
+    device_id = next(iter(cloud.cameras))
+    cloud.retry_after = "0.5"
+    cloud.throttled = 1
+
+    start = time.monotonic()
+    assert api.get_device_details(device_id).name == "Camera 1"
+    assert time.monotonic() - start >= 0.5
+
+
+def test_long_retry_after_is_not_waited_out(cloud):
+    device_id = next(iter(cloud.cameras))
+    cloud.retry_after = "120"
+    cloud.throttled = 1
+
+    start = time.monotonic()
+    assert api.get_device_details(device_id) is None
+    assert time.monotonic() - start < 5
+    assert cloud.request_count == 1
+
+
+def test_retry_after_header_formats():
+    assert retry_after({"Retry-After": "3"}) == 3.0
+    assert retry_after({}) is None
+    assert retry_after({"Retry-After": "soon"}) is None
+    assert retry_after({"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}) == 0.0
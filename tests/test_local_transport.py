@@ -0,0 +1,83 @@
+import socket
+import time
+
+import pytest
+
+import api
+from local_transport import LocalTransport
+from mock_cloud import MockLocalCamera
+
+
+@pytest.fixture
+def device_id(cloud):
+    return next(iter(cloud.cameras))
+
+
+@pytest.fixture
+def local_camera(cloud, device_id):
+    """The same simulated camera, reachable over the 'LAN' as well as the cloud"""
+    camera = MockLocalCamera(camera=cloud.cameras[device_id]).start()
+    yield camera
+    camera.stop()
+
+
+def use_transport(monkeypatch, device_id, port, password="password"):
+    transport = LocalTransport(password=password, scheme="http", port=port, timeout=0.3, enabled=True)
+    transport.register_device(device_id, "127.0.0.1")
+    monkeypatch.setattr(api, "local_transport", transport)
+    return transport
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_commands_go_over_the_lan(cloud, device_id, local_camera, monkeypatch):
+    use_transport(monkeypatch, device_id, local_camera.port)
+
+    assert api.move_camera(device_id, "x", 10) is not None
+    assert cloud.cameras[device_id].x == 10
+    assert local_camera.request_count == 2  # login + command
+    assert cloud.request_count == 0
+
+
+def test_unreachable_camera_falls_back_to_cloud(cloud, device_id, monkeypatch):
+    use_transport(monkeypatch, device_id, free_port())
+
+    assert api.move_camera(device_id, "x", 10) is not None
+    assert cloud.cameras[device_id].x == 10
+    assert cloud.request_count == 1
+
+
+def test_refused_login_falls_back_to_cloud(cloud, device_id, local_camera, monkeypatch):
+    use_transport(monkeypatch, device_id, local_camera.port, password="wrong")
+
+    assert api.toggle_privacy_mode(device_id, True)
+    assert cloud.cameras[device_id].lens_mask == "on"
+    assert cloud.request_count == 1
+
+
+def test_unanswered_command_is_not_resent_through_cloud(cloud, device_id, local_camera, monkeypatch):
+    transport = use_transport(monkeypatch, device_id, local_camera.port)
+    assert api.get_presets(device_id)  # logs in while the camera is fast
+
+    local_camera.latency = 1.0
+    assert api.move_camera(device_id, "x", 10) is None
+    time.sleep(1.2)  # the camera finishes the command after we gave up
+
+    assert cloud.cameras[device_id].x == 10  # moved once, not twice
+    assert cloud.request_count == 0
+    assert transport.call(device_id, api.motor_move_requests("x", 10)) is None  # LAN skipped for a while
+
+
+def test_unanswered_read_is_resent_through_cloud(cloud, device_id, local_camera, monkeypatch):
+    use_transport(monkeypatch, device_id, local_camera.port)
+    assert api.get_presets(device_id)
+
+    local_camera.latency = 1.0
+    presets = api.get_presets(device_id)
+
+    assert presets and len(presets) == 3
+    assert cloud.request_count == 1
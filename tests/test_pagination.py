@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+import requests
+
+import api
+from api_async import AsyncTapoClient
+
+FLEET_SIZE = 45  # three pages of 20
+
+
+def sync_device_ids():
+    return api.get_all_devices()
+
+
+def async_device_ids():
+    async def run():
+        async with AsyncTapoClient() as client:
+            return await asyncio.wait_for(client.get_all_devices(), timeout=10)
+
+    return asyncio.run(run())
+
+
+@pytest.fixture(params=[sync_device_ids, async_device_ids], ids=["sync", "async"])
+def get_all_devices(request):
+    return request.param
+
+
+@pytest.mark.parametrize("include_total", [True, False], ids=["total", "no-total"])
+def test_every_page_is_fetched(cloud, get_all_devices, include_total):
+    cloud.set_fleet_size(FLEET_SIZE)
+    cloud.include_total = include_total
+
+    assert get_all_devices() == list(cloud.cameras)
+
+
+def test_server_ignoring_page_parameter_stops_the_walk(cloud, get_all_devices):
+    cloud.set_fleet_size(FLEET_SIZE)
+    cloud.include_total = False
+    cloud.ignore_page = True
+
+    assert get_all_devices() == list(cloud.cameras)[:api.DEVICE_PAGE_SIZE]
+    assert cloud.request_count <= 2
+
+
+def test_exact_multiple_of_page_size(cloud, get_all_devices):
+    cloud.set_fleet_size(2 * api.DEVICE_PAGE_SIZE)
+    cloud.include_total = False
+
+    assert get_all_devices() == list(cloud.cameras)
+
+
+def fail_page(monkeypatch, failing_page):
+    """Make fetching failing_page raise in both clients"""
+    fetch_device_page = api.fetch_device_page
+    request = AsyncTapoClient._request
+
+    def flaky_fetch(headers, page, page_size=api.DEVICE_PAGE_SIZE):
+        if page == failing_page:
+            raise requests.exceptions.ConnectionError("connection reset")
+        return fetch_device_page(headers, page, page_size)
+
+    async def flaky_request(self, method, url, *args, params=None, **kwargs):
+        if params and params["page"] == failing_page:
+            raise asyncio.TimeoutError()
+        return await request(self, method, url, *args, params=params, **kwargs)
+
+    monkeypatch.setattr(api, "fetch_device_page", flaky_fetch)
+    monkeypatch.setattr(AsyncTapoClient, "_request", flaky_request)
+
+
+@pytest.mark.parametrize("include_total", [True, False], ids=["total", "no-total"])
+def test_page_raising_keeps_the_other_pages(cloud, get_all_devices, include_total, monkeypatch):
+    cloud.set_fleet_size(FLEET_SIZE)
+    cloud.include_total = include_total
+    fail_page(monkeypatch, 1)
+    device_ids = list(cloud.cameras)
+    page_size = api.DEVICE_PAGE_SIZE
+
+    expected = device_ids[:page_size] + (device_ids[2 * page_size:] if include_total else [])
+    assert get_all_devices() == expected
+
+
+def test_first_page_raising_returns_false(cloud, get_all_devices, monkeypatch):
+    fail_page(monkeypatch, 0)
+
+    assert get_all_devices() is False
+
+
+def test_failing_page_is_retried(cloud, get_all_devices):
+    cloud.set_fleet_size(FLEET_SIZE)
+    cloud.throttled = 1
+    cloud.retry_after = "0"
+
+    assert get_all_devices() == list(cloud.cameras)
@@ -0,0 +1,79 @@
+import threading
+import time
+
+import api
+from ptz_queue import PtzCommandQueue
+
+
+class GatedSend:
+    """Records every move; the first one blocks until released so clicks pile up behind it"""
+
+    def __init__(self, send=lambda device_id, x, y: True):
+        self.send = send
+        self.calls = []
+        self.entered = threading.Event()
+        self.released = threading.Event()
+
+    def __call__(self, device_id, x, y):
+        self.calls.append((x, y))
+        if len(self.calls) == 1:
+            self.entered.set()
+            self.released.wait(5)
+        return self.send(device_id, x, y)
+
+
+def click(queue, gate, clicks):
+    """Send the first click, then the rest while it is in flight, and wait for the queue to drain"""
+    (axis, value), *rest = clicks
+    queue.move(axis, value)
+    assert gate.entered.wait(5)
+    for axis, value in rest:
+        queue.move(axis, value)
+    gate.released.set()
+
+    deadline = time.monotonic() + 10
+    while queue.in_flight and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not queue.in_flight
+
+
+def test_burst_of_clicks_is_merged():
+    gate = GatedSend()
+    queue = PtzCommandQueue("dev", send=gate)
+
+    click(queue, gate, [("x", 10)] * 10 + [("y", -10)] * 3)
+
+    assert gate.calls == [(10, 0), (90, -30)]
+
+
+def test_opposite_clicks_cancel_out():
+    gate = GatedSend()
+    queue = PtzCommandQueue("dev", send=gate)
+
+    click(queue, gate, [("x", 10), ("x", 10), ("x", -10), ("y", 10), ("y", -10)])
+
+    assert gate.calls == [(10, 0)]
+
+
+def test_burst_costs_two_cloud_calls(cloud):
+    device_id = next(iter(cloud.cameras))
+    gate = GatedSend(api.move_camera_xy)
+    queue = PtzCommandQueue(device_id, send=gate)
+
+    click(queue, gate, [("x", 10)] * 15)
+
+    assert cloud.request_count == 2
+    assert cloud.cameras[device_id].x == 150
+
+
+def test_overshooting_burst_moves_up_to_the_end_of_range(cloud):
+    device_id = next(iter(cloud.cameras))
+    camera = cloud.cameras[device_id]
+    camera.x = 150
+    gate = GatedSend(api.move_camera_xy)
+    queue = PtzCommandQueue(device_id, send=gate)
+
+    click(queue, gate, [("x", 5)] + [("x", 5)] * 6 + [("y", 10)] * 2)
+
+    assert (camera.x, camera.y) == (170, 20)
+    assert gate.calls[:2] == [(5, 0), (30, 20)]
@@ -0,0 +1,31 @@
+import socket
+
+from mock_cloud import MockRtspCamera
+from rtsp_probe import race_connect
+
+
+def closed_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_first_listening_address_wins():
+    camera = MockRtspCamera(host="127.0.0.2").start()
+    try:
+        # Nothing listens on 127.0.0.1 at that port, so its refusal starts the next attempt at once
+        assert race_connect(["127.0.0.1", "127.0.0.2"], camera.port, delay=5) == "127.0.0.2"
+    finally:
+        camera.stop()
+
+
+def test_unresolvable_and_empty_candidates_are_skipped():
+    camera = MockRtspCamera().start()
+    try:
+        assert race_connect(["", "no-such-host.invalid", "127.0.0.1"], camera.port) == "127.0.0.1"
+    finally:
+        camera.stop()
+
+
+def test_nothing_listening():
+    assert race_connect(["127.0.0.1"], closed_port(), timeout=1) is None
@@ -0,0 +1,69 @@
+import threading
+import time
+
+from rate_limiter import BACKGROUND, INTERACTIVE, NORMAL, RateLimiter
+
+
+def start_waiter(limiter, order, name, **kwargs):
+    """Call acquire in a thread and wait until it is queued"""
+    queued = limiter.metrics()["queued"]
+    thread = threading.Thread(target=lambda: limiter.acquire(timeout=5, **kwargs) and order.append(name))
+    thread.start()
+    while limiter.metrics()["queued"] == queued:
+        time.sleep(0.005)
+    return thread
+
+
+def test_waiters_are_served_by_priority_then_arrival():
+    limiter = RateLimiter(global_rate=10, global_burst=1, device_rate=0, background_reserve=0)
+    assert limiter.acquire()  # empty the bucket
+    order = []
+
+    threads = [
+        start_waiter(limiter, order, "normal-1", priority=NORMAL),
+        start_waiter(limiter, order, "background", priority=BACKGROUND),
+        start_waiter(limiter, order, "normal-2", priority=NORMAL),
+        start_waiter(limiter, order, "interactive", priority=INTERACTIVE),
+    ]
+    for thread in threads:
+        thread.join()
+
+    assert order == ["interactive", "normal-1", "normal-2", "background"]
+
+
+def test_background_leaves_the_reserve_for_interactive():
+    limiter = RateLimiter(global_rate=0.1, global_burst=3, device_rate=0, background_reserve=2)
+
+    assert limiter.acquire(priority=BACKGROUND, timeout=0.05)
+    assert not limiter.acquire(priority=BACKGROUND, timeout=0.05)
+    assert limiter.acquire(priority=INTERACTIVE, timeout=0)
+    assert limiter.acquire(priority=INTERACTIVE, timeout=0)
+    assert not limiter.acquire(priority=INTERACTIVE, timeout=0)
+    assert limiter.metrics()["background"]["timed_out"] == 1
+
+
+def test_throttled_device_does_not_hold_up_others():
+    limiter = RateLimiter(global_rate=0, device_rate=0.5, device_burst=1)
+    assert limiter.acquire("camera-a")
+    order = []
+    thread = start_waiter(limiter, order, "camera-a", device_id="camera-a", priority=INTERACTIVE)
+
+    start = time.monotonic()
+    assert limiter.acquire("camera-b", timeout=1)
+    assert limiter.try_acquire("camera-c") == 0
+    assert time.monotonic() - start < 0.5
+    assert order == []
+
+    thread.join()
+    assert order == ["camera-a"]
+
+
+def test_try_acquire_yields_to_blocked_callers_of_higher_priority():
+    limiter = RateLimiter(global_rate=10, global_burst=1, device_rate=0)
+    assert limiter.try_acquire() == 0
+    order = []
+    thread = start_waiter(limiter, order, "interactive", priority=INTERACTIVE)
+
+    assert limiter.try_acquire(priority=NORMAL) > 0
+    thread.join()
+    assert order == ["interactive"]
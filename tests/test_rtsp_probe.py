@@ -0,0 +1,82 @@
+import pytest
+
+import rtsp_config
+import rtsp_probe
+from mock_cloud import MockRtspCamera
+from models import DeviceDetails
+from rtsp_probe import RtspProber
+
+PRIVATE_IP = "127.0.0.1"
+CUSTOM_IP = "127.0.0.2"
+
+
+@pytest.fixture
+def private_camera():
+    camera = MockRtspCamera(host=PRIVATE_IP).start()
+    yield camera
+    camera.stop()
+
+
+@pytest.fixture
+def prober(private_camera, monkeypatch):
+    prober = RtspProber(port=private_camera.port, timeout=1)
+    monkeypatch.setattr(rtsp_probe, "_prober", prober)
+    return prober
+
+
+def camera_on(ip, port, **kwargs):
+    return MockRtspCamera(host=ip, port=port, **kwargs).start()
+
+
+def test_describe_status_codes(private_camera, prober):
+    assert prober.describe(PRIVATE_IP, "/stream1", "admin", "password") == 200
+    assert prober.describe(PRIVATE_IP, "/h264", "admin", "password") == 404
+    assert prober.describe(PRIVATE_IP, "/stream1", "admin", "wrong") == 401
+
+
+def test_most_preferred_path_wins(prober):
+    camera = camera_on(CUSTOM_IP, prober.port, paths=("/stream2", "/h264"))
+    try:
+        assert prober.probe([CUSTOM_IP], "admin", "password") == (CUSTOM_IP, "/stream2")
+    finally:
+        camera.stop()
+
+
+def test_higher_ranked_ip_wins_even_when_slower(prober):
+    custom = camera_on(CUSTOM_IP, prober.port, latency=0.3)
+    try:
+        assert prober.probe([CUSTOM_IP, PRIVATE_IP], "admin", "password") == (CUSTOM_IP, "/stream1")
+    finally:
+        custom.stop()
+
+
+def test_lower_ranked_ip_wins_when_higher_fails(prober):
+    # Nothing listens on the custom IP
+    assert prober.probe([CUSTOM_IP, PRIVATE_IP], "admin", "password") == (PRIVATE_IP, "/stream1")
+
+
+def test_nothing_answers(prober):
+    assert prober.probe([PRIVATE_IP], "admin", "wrong") is None
+
+
+def test_custom_ip_type_prefers_custom_ip(prober):
+    custom = camera_on(CUSTOM_IP, prober.port, latency=0.3)
+    device = DeviceDetails("custom-dev", private_ip=PRIVATE_IP, public_ip="203.0.113.10")
+    config = {"username": "admin", "password": "password", "ip_type": "custom", "custom_ip": CUSTOM_IP}
+    try:
+        url = rtsp_config.build_rtsp_url("custom-dev", device, config)
+    finally:
+        custom.stop()
+    assert url == f"rtsp://admin:password@{CUSTOM_IP}:{prober.port}/stream1"
+
+
+def test_winner_is_cached_until_invalidated(private_camera, prober):
+    ips = [PRIVATE_IP]
+    assert prober.find_stream("cached-dev", ips, "admin", "password") == (PRIVATE_IP, "/stream1")
+    requests_sent = private_camera.request_count
+
+    assert prober.find_stream("cached-dev", ips, "admin", "password") == (PRIVATE_IP, "/stream1")
+    assert private_camera.request_count == requests_sent
+
+    prober.invalidate("cached-dev", PRIVATE_IP)
+    assert prober.cached("cached-dev", ips) is None
@@ -0,0 +1,49 @@
+import threading
+import time
+
+import api
+from rate_limiter import BACKGROUND, NORMAL
+from single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_result():
+    flights = SingleFlight()
+    calls = []
+
+    def slow(value):
+        calls.append(value)
+        time.sleep(0.2)
+        return value
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flights.do("key", slow, 1))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [1]
+    assert results == [1] * 5
+    assert flights.shared == 4
+
+
+def test_reads_only_share_a_flight_at_the_same_priority(monkeypatch):
+    priorities = []
+
+    def fake_fetch(device_id, priority):
+        priorities.append(priority)
+        time.sleep(0.2)
+        return {"1": "Preset 1"}
+
+    monkeypatch.setattr(api, "_fetch_presets", fake_fetch)
+    threads = [
+        threading.Thread(target=api.get_presets, args=("dev", priority))
+        for priority in (BACKGROUND, NORMAL, NORMAL)
+    ]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.02)
+    for thread in threads:
+        thread.join()
+
+    assert sorted(priorities) == [NORMAL, BACKGROUND]
@@ -4,8 +4,9 @@ import threading
 import sys
 import time
 import vlc
-from rtsp_config import get_rtsp_config, build_rtsp_url
+from rtsp_config import get_rtsp_config, build_rtsp_url, invalidate_rtsp_url
 from api import toggle_privacy_mode  # Import the new function
+from privacy_cache import get_privacy_state
 
 class VideoPlayer:
     def __init__(self, parent, bg_color="#0a0a0a"):
@@ -84,7 +85,7 @@ class VideoPlayer:
         if not self.current_device:
             return
 
-        device_id = self.current_device.get('device_id')
+        device_id = self.current_device.device_id
         new_state = not self.is_privacy_enabled
 
         # Optimistic UI update
@@ -101,25 +102,25 @@ class VideoPlayer:
 
         threading.Thread(target=send_privacy_request, daemon=True).start()
 
+    def show_privacy_state(self, device):
+        """Set the privacy button from the device's last known lens mask state"""
+        enabled = get_privacy_state(device.device_id)
+        if enabled is None:
+            enabled = bool(device.privacy_enabled)
+        self.is_privacy_enabled = enabled
+        self.privacy_button.config(text="🔒" if enabled else "🔓")
+
     def play_stream(self, device):
         """Start playing the RTSP stream"""
         self.stop_stream()
         self.stream_id += 1
         local_stream_id = self.stream_id
         self.current_device = device
-        device_id = device.get('device_id')
+        device_id = device.device_id
 
         rtsp_config = get_rtsp_config(device_id)
-        rtsp_url = build_rtsp_url(device_id, device, rtsp_config)
-
-        if not rtsp_url:
-            self.video_label.config(
-                text="RTSP not configured",
-                fg="#ff4444",
-                font=("Segoe UI", 14)
-            )
-            self.mute_button.place_forget()
-            self.privacy_button.place_forget()
+        if not rtsp_config.get("username", "").strip() or not rtsp_config.get("password", "").strip():
+            self._show_not_configured(local_stream_id)
             return
 
         self.video_label.config(
@@ -134,22 +135,42 @@ class VideoPlayer:
         self.mute_button.place(relx=1.0, rely=1.0, x=-80, y=-20, anchor="se")
         self.mute_button.lift()
 
-        # Default: assume privacy off (you can enhance this later by querying state)
-        self.is_privacy_enabled = False
-        self.privacy_button.config(text="🔓")
+        # Privacy state comes from the last details/presets fetch, no extra request here
+        self.show_privacy_state(device)
         self.privacy_button.place(relx=1.0, rely=1.0, x=-20, y=-20, anchor="se")
         self.privacy_button.lift()
 
         self.is_playing = True
 
+        # Probing for the stream endpoint can take a moment, keep it off the UI thread
         thread = threading.Thread(
-            target=self._start_vlc_player,
-            args=(rtsp_url, local_stream_id),
+            target=self._resolve_and_play,
+            args=(device, rtsp_config, local_stream_id),
             daemon=True
         )
         thread.start()
 
-    def _start_vlc_player(self, rtsp_url, stream_id):
+    def _resolve_and_play(self, device, rtsp_config, stream_id):
+        rtsp_url = build_rtsp_url(device.device_id, device, rtsp_config)
+        if stream_id != self.stream_id:
+            return
+        if not rtsp_url:
+            self.parent.after(0, lambda: self._show_not_configured(stream_id))
+            return
+        self._start_vlc_player(rtsp_url, stream_id, device.device_id)
+
+    def _show_not_configured(self, stream_id):
+        if stream_id != self.stream_id:
+            return
+        self.video_label.config(
+            text="RTSP not configured",
+            fg="#ff4444",
+            font=("Segoe UI", 14)
+        )
+        self.mute_button.place_forget()
+        self.privacy_button.place_forget()
+
+    def _start_vlc_player(self, rtsp_url, stream_id, device_id):
         """VLC playback logic (unchanged except safe volume)"""
         if stream_id != self.stream_id:
             return
@@ -198,8 +219,13 @@ class VideoPlayer:
             while stream_id == self.stream_id and self.player.is_playing():
                 time.sleep(0.2)
 
+            if stream_id == self.stream_id and self.player.get_state() == vlc.State.Error:
+                raise Exception("Could not open the stream")
+
         except Exception as e:
             print(f"[VLC Error] {e}")
+            # The probed endpoint may be stale (new IP, changed path), probe again next time
+            invalidate_rtsp_url(device_id, rtsp_url)
             if stream_id == self.stream_id:
                 self.parent.after(0, lambda: self._show_error(str(e), stream_id))
 